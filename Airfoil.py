@@ -2,34 +2,174 @@
 # Author: David Moeller Sztajnbok
 # Date:   July 2023
 
-from xfoil import singleAlpha, alphaRange, singleCL, CLRange
+import os
 
+import numpy as np
 
-def createDATFile(X, Y, name):
-    fileName = f"{name}.dat"
-    fid = open(fileName, "w")
+import Instrumentation
+from xfoil import singleAlpha, alphaRange, splitAlphaRange, singleCL, CLRange, scratchDir, conditionPolars, sweepCommand
+from PolarCache import polarKey
 
-    print(name, file=fid)
-    for i in range(len(X)):
-        print(f"{X[i].round(5)}     {Y[i].round(5)}", file=fid)
 
-    fid.close()
+def createDATFile(X, Y, name, workDir=None):
+    # Coordinates are formatted in a single operation rather than one print per point
+    fileName = os.path.join(workDir or '', f"{name}.dat")
+    coords = np.column_stack((X, Y)).round(5) + 0.0
+
+    with open(fileName, "w") as fid:
+        fid.write(f"{name}\n")
+        fid.write(("%.5f     %.5f\n" * len(coords)) % tuple(coords.ravel()))
 
     return
 
 
-def runAirfoil(X, Y, name, Re, iterStart, iterEnd, iterStep, iterative='alpha'):
+def runAirfoil(X, Y, name, Re, iterStart, iterEnd, iterStep, iterative='alpha', workDir=None, session=None, cache=None,
+               adaptive=False, refineStall=False, split=False, panels=None, maxIter=None):
     # X, Y      : foil coordinates
     # name      : name for .dat file
     # Re        : Reynold's number
     # iterList  : list of iterative parameters (AoA or CL depending on iterative parameter)
     # iterative : 'alpha' if iterList are AoAs or 'cl' if iterList are CLs
+    # workDir   : directory for the .dat and polar files (None for the process scratch directory, in RAM
+    #             where available); the .dat file is removed after the run
+    # session   : xfoil.XFOILSession to reuse (runs in its own workDir), None to spawn XFOIL for this run
+    # cache     : PolarCache.PolarCache to look the polar up in before running XFOIL
+    # adaptive  : for 'alpha', a coarse pass refined around L/D max (down to iterStep/2) instead of the full sweep;
+    #             the polar's LDpeak is the refined estimate. Every pass goes to one XFOIL process (the session's,
+    #             or one spawned for this run) and each refinement starts from the best converged angle
+    # refineStall : with adaptive, refine around CLmax as well
+    # split     : for 'alpha', sweep from zero up and from zero down in two concurrent XFOIL processes and
+    #             merge them (lower latency and better convergence; doubles the processes per candidate)
+    # panels    : panel nodes XFOIL repanels the foil with (None for its default, 160); fewer is faster and coarser
+    # maxIter   : viscous iteration limit per point (None for XFOIL's default); points not converged within it are dropped
+    #             (panels and maxIter need a spawned run; for a session, give them to XFOILSession instead)
+
+    if cache is not None:
+        with Instrumentation.stage('cacheLookup'):
+            mode = iterative
+            if adaptive and iterative == 'alpha':
+                mode += '-adaptive-stall' if refineStall else '-adaptive'
+            elif split and iterative == 'alpha':
+                mode += '-split'
+            if panels:
+                mode += f'-panels{panels}'
+            if maxIter:
+                mode += f'-iter{maxIter}'
+            key = polarKey(X, Y, Re, mode, iterStart, iterEnd, iterStep)
+            hit, foilPolar = cache.get(key)
+        if hit:
+            Instrumentation.count('cacheHits')
+            return foilPolar
+        foilPolar = runAirfoil(X, Y, name, Re, iterStart, iterEnd, iterStep, iterative, workDir, session,
+                               adaptive=adaptive, refineStall=refineStall, split=split, panels=panels, maxIter=maxIter)
+        cache.put(key, foilPolar)
+        return foilPolar
+
+    if session is not None and (panels or maxIter):
+        raise ValueError("panels and maxIter are not supported with an XFOILSession")
+    if session is not None:
+        workDir = session.workDir
+    elif workDir is None:
+        workDir = scratchDir()
+
+    with Instrumentation.stage('createDATFile'):
+        createDATFile(X, Y, name, workDir)
+    polarFiles = {'workDir': workDir, 'polarFile': f"{name}_polar.dat", 'dumpFile': f"{name}_polar.dump"}
 
-    createDATFile(X, Y, name)
+    try:
+        if session is not None:
+            if iterative == 'alpha':
+                foilPolar = session.alphaRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep, adaptive, refineStall, split)
+            elif iterative == 'cl':
+                foilPolar = session.CLRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep)
+        elif iterative == 'alpha' and split and not adaptive:
+            foilPolar = splitAlphaRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep, **polarFiles,
+                                        panels=panels, maxIter=maxIter)
+        elif iterative == 'alpha':
+            foilPolar = alphaRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep, **polarFiles,
+                                   adaptive=adaptive, refineStall=refineStall, panels=panels, maxIter=maxIter)
+        elif iterative == 'cl':
+            foilPolar = CLRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep, **polarFiles, panels=panels, maxIter=maxIter)
+    finally:
+        os.remove(os.path.join(workDir, f"{name}.dat"))
 
-    if iterative == 'alpha':
-        foilPolar = alphaRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep)
-    elif iterative == 'cl':
-        foilPolar = CLRange(f"{name}.dat", Re, iterStart, iterEnd, iterStep)
+    if Instrumentation.enabled:
+        if not (adaptive and iterative == 'alpha'):
+            # adaptiveAlpha counts the points it requests itself
+            Instrumentation.count('requestedPoints', int(round((iterEnd - iterStart) / iterStep)) + 1 if iterStep else 1)
+        Instrumentation.count('convergedPoints', len(foilPolar) if foilPolar is not None else 0)
 
     return foilPolar
+
+
+# Per-candidate values reported alongside the fitness by Evaluator batch evaluators
+# LDmax is the best sampled point, so fitness stays comparable between runs and cached polars;
+# LDpeak is the parabola-refined estimate
+POLAR_METRICS = ('CLmax', 'LDmax', 'LDmaxAlpha', 'LDpeak', 'CDmin', 'convergedPoints')
+
+
+def polarMetrics(polar):
+    # Summary of a polar for the run history, NaN where XFOIL wrote no polar
+    if polar is None or not len(polar):
+        return {name: np.nan for name in POLAR_METRICS}
+    return {'CLmax': float(polar.CLmax),
+            'LDmax': float(polar.LDmax),
+            'LDmaxAlpha': float(polar.LDmaxAlpha),
+            'LDpeak': float(polar.LDpeak),
+            'CDmin': float(polar.CDmin),
+            'convergedPoints': len(polar)}
+
+
+def runAirfoilConditions(X, Y, name, conditions, workDir=None, session=None, cache=None):
+    # Polars at several operating conditions from one XFOIL run on one loaded geometry
+    # (e.g. cruise and climb for a multi-point objective), one PACC polar per condition
+    #
+    # conditions : list of (Re, iterStart, iterEnd, iterStep) or (Re, iterStart, iterEnd, iterStep, iterative)
+    #              tuples, iterative 'alpha' (default) or 'cl'
+    # workDir, session, cache : as for runAirfoil; cached conditions are not rerun
+    # Returns a dict from each condition tuple to its AirfoilPolar (None where XFOIL wrote no polar)
+
+    polars = {}
+    keys = {}
+    for condition in conditions:
+        Re, iterStart, iterEnd, iterStep = condition[:4]
+        iterative = condition[4] if len(condition) > 4 else 'alpha'
+        if cache is not None:
+            with Instrumentation.stage('cacheLookup'):
+                keys[condition] = polarKey(X, Y, Re, iterative, iterStart, iterEnd, iterStep)
+                hit, foilPolar = cache.get(keys[condition])
+            if hit:
+                Instrumentation.count('cacheHits')
+                polars[condition] = foilPolar
+    toRun = [condition for condition in conditions if condition not in polars]
+    if not toRun:
+        return polars
+
+    if session is not None:
+        workDir = session.workDir
+    elif workDir is None:
+        workDir = scratchDir()
+
+    commands = [(condition[0], sweepCommand(condition[4] if len(condition) > 4 else 'alpha', *condition[1:4]))
+                for condition in toRun]
+
+    with Instrumentation.stage('createDATFile'):
+        createDATFile(X, Y, name, workDir)
+    try:
+        if session is not None:
+            results = session.runConditions(f"{name}.dat", commands)
+        else:
+            results = conditionPolars(f"{name}.dat", commands, workDir=workDir, prefix=f"{name}_polar")
+    finally:
+        os.remove(os.path.join(workDir, f"{name}.dat"))
+
+    for condition, foilPolar in zip(toRun, results):
+        polars[condition] = foilPolar
+        if cache is not None:
+            cache.put(keys[condition], foilPolar)
+        if Instrumentation.enabled:
+            iterStart, iterEnd, iterStep = condition[1:4]
+            Instrumentation.count('requestedPoints', int(round((iterEnd - iterStart) / iterStep)) + 1 if iterStep else 1)
+            Instrumentation.count('convergedPoints', len(foilPolar) if foilPolar is not None else 0)
+
+    return polars
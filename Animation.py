@@ -0,0 +1,196 @@
+"""GA ANIMATION"""
+# Renders the evolution of a GA run to a GIF or MP4. All frame geometries are built in
+# one batch call, frames are rasterised (and, for GIFs, compressed) by a pool of worker
+# processes, and each finished frame is written to the output as soon as it is its turn,
+# so only a bounded window of frames is ever held in memory.
+
+import os
+import shutil
+import subprocess
+import multiprocessing
+from collections import deque
+
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+from PARSEC.Parsec import PARSECbatch
+from BEZIER.Bezier import BEZIERbatch
+from History import loadHistory
+
+
+# Same axes as the original FuncAnimation version
+FIG_SIZE = (6.4, 4.8)
+DPI = 100
+
+_figure = None
+_line = None
+_canvas = None
+_background = None
+_palette = None
+
+
+def loadSolutions(gaName=None, historyDir=None):
+    # Returns genes (generations, pop, genes) and fitness (generations, pop), from a
+    # History.RunHistory directory if given, otherwise from the pygad file gaName
+    if historyDir is not None:
+        history = loadHistory(historyDir)
+        return history['genes'], history['fitness']
+
+    import pygad
+    ga_instance = pygad.load(gaName)
+    solutions = np.asarray(ga_instance.solutions, dtype=float)
+    fitness = np.asarray(ga_instance.solutions_fitness, dtype=float)
+    if not len(solutions):
+        raise ValueError(f"{gaName} was saved without its solutions; animate it from its history directory")
+    popSize = ga_instance.sol_per_pop
+    nGenerations = len(solutions) // popSize
+    return (solutions[:nGenerations * popSize].reshape(nGenerations, popSize, -1),
+            fitness[:nGenerations * popSize].reshape(nGenerations, popSize))
+
+
+def selectFrames(genes, fitness, policy='all', every=10):
+    # policy : 'all'   - every solution of every generation
+    #          'best'  - the best solution of each generation
+    #          'every' - every `every`-th solution
+    # Returns the (frames, genes) array to animate
+    if policy == 'best':
+        best = np.argmax(np.nan_to_num(fitness, nan=-np.inf), axis=1)
+        return genes[np.arange(len(genes)), best]
+
+    flat = genes.reshape(-1, genes.shape[-1])
+    if policy == 'all':
+        return flat
+    if policy == 'every':
+        return flat[::every]
+    raise ValueError(f"Unknown frame policy '{policy}' (expected 'all', 'best' or 'every')")
+
+
+def _initRenderer():
+    # One figure per worker, reused for every frame it draws: the axes are drawn once and
+    # each frame only restores that background and draws the foil line over it (blitting)
+    global _figure, _line, _canvas, _background
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    _figure = Figure(figsize=FIG_SIZE, dpi=DPI)
+    _canvas = FigureCanvasAgg(_figure)
+    ax = _figure.add_subplot()
+    ax.set_xlim((0, 1))
+    ax.set_ylim((-0.5, 0.5))
+    ax.set_aspect('equal')
+    _line, = ax.plot([], [], lw=2, animated=True)
+    _canvas.draw()
+    _background = _canvas.copy_from_bbox(_figure.bbox)
+
+
+def _rasterise(X, Y):
+    if _figure is None:
+        _initRenderer()
+    _canvas.restore_region(_background)
+    _line.set_data(X, Y)
+    _figure.axes[0].draw_artist(_line)
+    return np.asarray(_canvas.buffer_rgba())[..., :3]
+
+
+def _renderGIFFrame(task):
+    # Returns the frame as encoded GIF image data (local palette), ready to append to the file
+    # The palette is fitted once, to the worker's first frame, and reused for the rest
+    global _palette
+    X, Y, duration = task
+    frame = Image.fromarray(_rasterise(X, Y))
+    if _palette is None:
+        _palette = frame.quantize(colors=64, method=Image.Quantize.FASTOCTREE)
+    frame = frame.quantize(palette=_palette, dither=Image.Dither.NONE)
+    return b"".join(GifImagePlugin.getdata(frame, duration=duration, include_color_table=True))
+
+
+def _renderRawFrame(task):
+    # Returns the frame as raw RGB24 bytes, for ffmpeg
+    X, Y = task[:2]
+    return np.ascontiguousarray(_rasterise(X, Y)).tobytes()
+
+
+class GIFStream:
+    # Writes a looping GIF one pre-encoded frame at a time
+
+    def __init__(self, fileName, size):
+        self.file = open(fileName, 'wb')
+        header, _ = GifImagePlugin.getheader(Image.new('P', size), info={'loop': 0, 'duration': 1})
+        self.file.write(b"".join(header))
+
+    def write(self, frame):
+        self.file.write(frame)
+
+    def close(self):
+        self.file.write(b";")
+        self.file.close()
+
+
+class FFmpegStream:
+    # Pipes raw RGB frames into ffmpeg for H.264 MP4 output
+
+    def __init__(self, fileName, size, fps):
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise RuntimeError("MP4 output needs ffmpeg on the PATH")
+        self.process = subprocess.Popen([ffmpeg, '-y', '-loglevel', 'error',
+                                         '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{size[0]}x{size[1]}",
+                                         '-r', str(fps), '-i', '-',
+                                         '-c:v', 'libx264', '-pix_fmt', 'yuv420p', fileName],
+                                        stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(frame)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def renderAnimation(X, Y, fileName, fps=30, nWorkers=None, window=None):
+    # X, Y     : (frames, M) foil coordinates, one row per frame
+    # fileName : output file, .gif or .mp4
+    # nWorkers : rendering processes (None for one per core, 1 to render in this process)
+    # window   : frames in flight at once (None for 4 per worker)
+    size = (int(FIG_SIZE[0] * DPI), int(FIG_SIZE[1] * DPI))
+    nWorkers = nWorkers or os.cpu_count()
+    window = window or 4 * nWorkers
+
+    if fileName.endswith('.mp4'):
+        stream, render = FFmpegStream(fileName, size, fps), _renderRawFrame
+    else:
+        stream, render = GIFStream(fileName, size), _renderGIFFrame
+    tasks = ((X[i], Y[i], 1000 / fps) for i in range(len(X)))
+
+    try:
+        if nWorkers == 1:
+            for task in tasks:
+                stream.write(render(task))
+            return
+
+        with multiprocessing.Pool(nWorkers, initializer=_initRenderer) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.apply_async(render, (task,)))
+                if len(pending) >= window:
+                    stream.write(pending.popleft().get())
+            while pending:
+                stream.write(pending.popleft().get())
+    finally:
+        stream.close()
+
+
+def animateRun(gaName, fileName, method, historyDir=None, frames='all', every=10, fps=30, nWorkers=None, fileFormat='gif'):
+    # method     : 'PARSEC' or 'BEZIER' (16 points per segment)
+    # frames     : frame selection policy for selectFrames ('all', 'best' or 'every')
+    # fileFormat : 'gif' or 'mp4'
+    genes, fitness = loadSolutions(gaName, historyDir)
+    solutions = selectFrames(genes, fitness, frames, every)
+
+    if method == "PARSEC":
+        XFrames, YFrames = PARSECbatch(solutions)
+    else:
+        XFrames, YFrames = BEZIERbatch(solutions, 16)
+
+    renderAnimation(XFrames, YFrames, f"./{fileName}.{fileFormat}", fps, nWorkers)
+    return len(solutions)
@@ -2,52 +2,86 @@
 # Author:   N. Rooy, August 2015
 # Modified: David Moeller Sztajnbok, July 2023
 
-import matplotlib.pyplot as plt
 import numpy as np
 
+# pygad gene space of the Bezier GA: x, y of the 11 control points from the top trailing edge,
+# round the nose, to the bottom trailing edge; the edge x positions are fixed
+BEZIER_GENE_SPACE = [
+    [1], {'low': 0, 'high': 0.01},                              # Trailing Edge (TOP)
+
+    {'low': 0.76, 'high': 1}, {'low': 0.05, 'high': 0.2},
+    {'low': 0.52, 'high': 0.76}, {'low': 0.05, 'high': 0.2},
+    {'low': 0.25, 'high': 0.52}, {'low': 0.05, 'high': 0.2},
+    {'low': 0.1, 'high': 0.25}, {'low': 0.05, 'high': 0.2},
+
+    [0], {'low': 0.01, 'high': 0.1},                            # Leading Edge (TOP)
+    [0], {'low': -0.1, 'high': -0.01},                          # Leading Edge (BOTTOM)
+
+    {'low': 0.15, 'high': 0.37}, {'low': -0.2, 'high': -0.05},
+    {'low': 0.37, 'high': 0.69}, {'low': -0.2, 'high': -0.05},
+    {'low': 0.69, 'high': 1}, {'low': -0.2, 'high': -0.05},
+
+    [1], {'low': -0.01, 'high': 0},                             # Trailing Edge (BOTTOM)
+]
+
+
 def quadraticBezier(t, points):
     B_x = (1 - t) * ((1 - t) * points[0][0] + t * points[1][0]) + t * ((1 - t) * points[1][0] + t * points[2][0])
     B_y = (1 - t) * ((1 - t) * points[0][1] + t * points[1][1]) + t * ((1 - t) * points[1][1] + t * points[2][1])
     return B_x, B_y
 
 
-def BEZIERfoil(controlPoints, numPoints):
-    curve = []
-    t = np.array([i / numPoints for i in range(0, numPoints)])
+bernsteinCache = {}
 
-    # First points
-    midX = (controlPoints[1][0] + controlPoints[2][0]) / 2
-    midY = (controlPoints[1][1] + controlPoints[2][1]) / 2
-    B_x, B_y = quadraticBezier(t, [controlPoints[0], controlPoints[1], [midX, midY]])
-    curve = curve + list(zip(B_x, B_y))
+def bernsteinWeights(numPoints):
+    # (numPoints, 3) quadratic Bernstein weights at t = i/numPoints, computed once per numPoints
+    if numPoints not in bernsteinCache:
+        t = np.arange(numPoints) / numPoints
+        bernsteinCache[numPoints] = np.column_stack(((1 - t)**2, 2*t*(1 - t), t**2))
+    return bernsteinCache[numPoints]
 
-    # Middle Points
-    for i in range(1, len(controlPoints) - 3):
-        p0 = controlPoints[i]
-        p1 = controlPoints[i + 1]
-        p2 = controlPoints[i + 2]
-        midX_1 = (p0[0] + p1[0]) / 2
-        midY_1 = (p0[1] + p1[1]) / 2
-        midX_2 = (p1[0] + p2[0]) / 2
-        midY_2 = (p1[1] + p2[1]) / 2
 
-        B_x, B_y = quadraticBezier(t, [[midX_1, midY_1], p1, [midX_2, midY_2]])
-        curve = curve + list(zip(B_x, B_y))
+def segmentControlPoints(controlPoints):
+    # controlPoints : (N, n, 2) array
+    # Returns the (N, n-2, 3, 2) quadratic segments: each one runs between the midpoints of
+    # consecutive control-point pairs, except the first and last, which start/end on the trailing edge
+    midPoints = (controlPoints[:, :-1] + controlPoints[:, 1:]) / 2
 
-    # Last points
-    midX = (controlPoints[-3][0] + controlPoints[-2][0]) / 2
-    midY = (controlPoints[-3][1] + controlPoints[-2][1]) / 2
+    segments = np.empty((controlPoints.shape[0], controlPoints.shape[1] - 2, 3, 2))
+    segments[:, :, 0] = midPoints[:, :-1]
+    segments[:, :, 1] = controlPoints[:, 1:-1]
+    segments[:, :, 2] = midPoints[:, 1:]
+    segments[:, 0, 0] = controlPoints[:, 0]
+    segments[:, -1, 2] = controlPoints[:, -1]
 
-    B_x, B_y = quadraticBezier(t, [[midX, midY], controlPoints[-2], controlPoints[-1]])
-    curve = curve + list(zip(B_x, B_y))
-    curve.append(controlPoints[-1])
+    return segments
 
-    xAirfoil, yAirfoil = zip(*curve)
 
-    return xAirfoil, yAirfoil
+def BEZIERbatch(genes, numPoints):
+    # genes     : (N, 2n) array of flattened control points [x1, y1, x2, y2, ...]
+    # numPoints : points per quadratic segment
+    # Returns (N, (n-2)*numPoints + 1) X and Y arrays
+    controlPoints = np.asarray(genes, dtype=float).reshape(len(genes), -1, 2)
+    segments = segmentControlPoints(controlPoints)
+    nFoils, nSegments = segments.shape[:2]
+
+    curve = np.empty((nFoils, nSegments*numPoints + 1, 2))
+    np.matmul(bernsteinWeights(numPoints), segments, out=curve[:, :-1].reshape(nFoils, nSegments, numPoints, 2))
+    curve[:, -1] = controlPoints[:, -1]
+
+    return curve[:, :, 0], curve[:, :, 1]
+
+
+def BEZIERfoil(controlPoints, numPoints):
+    # controlPoints : list of [x, y] control points or the flattened gene list
+    X, Y = BEZIERbatch(np.reshape(controlPoints, (1, -1)), numPoints)
+
+    return X[0], Y[0]
 
 
 def plotBEZIER(X, Y, controlPoints):
+    import matplotlib.pyplot as plt
+
     xControl, yControl = zip(*controlPoints)
 
     # Airfoil
@@ -64,5 +98,4 @@ def plotBEZIER(X, Y, controlPoints):
 
 
 def listToCP(listCP):
-    it = iter(listCP)
-    return [list(coord) for coord in zip(it, it)]
+    return np.reshape(listCP, (-1, 2))
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy.interpolate import splprep, splev
 
 def loadAirfoil(file_path):
@@ -58,14 +57,17 @@ def BEZIERfoil(control_points, num_points=150):
     return x_fine, y_fine
 
 
-airfoil = '../clarky.dat'
-nCP = 10
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
 
-controlPoints = airfoilControlPoints(airfoil, nCP)
-x, y = BEZIERfoil(controlPoints, 1000)
-print(controlPoints)
-plt.figure()
-plt.plot(x, y)
-plt.axis('equal')
-plt.grid(True)
-plt.show()
+    airfoil = '../clarky.dat'
+    nCP = 10
+
+    controlPoints = airfoilControlPoints(airfoil, nCP)
+    x, y = BEZIERfoil(controlPoints, 1000)
+    print(controlPoints)
+    plt.figure()
+    plt.plot(x, y)
+    plt.axis('equal')
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,350 @@
+"""DISTRIBUTED EVALUATION"""
+# Spreads XFOIL runs over several machines. The GA process hosts a Coordinator behind a
+# multiprocessing.managers server; workers anywhere on the network connect to it, pull
+# tasks (a foil's coordinates and its sweep), run Airfoil.runAirfoil locally and send back
+# the polar as packed float64 columns (PolarCache.polarToBytes). Fitness is scored in the
+# GA process, so workers only need this repository and an XFOIL binary.
+#
+# Workers can join and leave at any time. Each task is leased to the worker that took it;
+# a worker that leaves, or stops sending heartbeats for leaseTimeout seconds, loses its
+# leases and those tasks go back to the front of the queue. A late result from a worker
+# that was given up on is still accepted if the task has not been finished elsewhere.
+#
+# Usage:
+#     GA machine : python main.py optimize --serve 0.0.0.0:50000 --authkey <key>
+#     each node  : python main.py worker <GA machine>:50000 --processes 8 --authkey <key>
+#
+# The manager server unpickles what its clients send, so anyone holding the key can run
+# code in the GA process. It binds to 127.0.0.1 unless told otherwise; without a key
+# (--authkey or $AIRFOIL_AUTHKEY) it generates a random one and prints it, and it refuses
+# a non-loopback address with a well-known key.
+
+import os
+import secrets
+import ipaddress
+import time
+import uuid
+import socket
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+import Airfoil
+import Instrumentation
+from Evaluator import BatchEvaluator
+from PolarCache import polarToBytes, polarFromBytes
+
+
+DEFAULT_AUTHKEY = os.environ.get('AIRFOIL_AUTHKEY') or None
+
+# Keys anyone could guess (the former built-in default included)
+WEAK_AUTHKEYS = ('', 'airfoil')
+
+
+def parseAddress(address):
+    # 'host:port' -> ('host', port)
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def isLoopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Coordinator:
+    # Task queue with worker leases, shared with the workers through a manager server
+    #
+    # leaseTimeout : seconds without a heartbeat after which a worker is presumed lost
+
+    def __init__(self, leaseTimeout=30):
+        self.leaseTimeout = leaseTimeout
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.tasks = {}
+        self.leases = {}
+        self.results = {}
+        self.workers = {}
+        self.requeued = 0
+
+    def register(self, name):
+        # Returns the id the worker uses in every other call
+        with self.condition:
+            workerId = f"{name}-{uuid.uuid4().hex[:8]}"
+            self.workers[workerId] = time.monotonic()
+            print(f"WORKER JOINED: {workerId} ({len(self.workers)} workers)")
+            return workerId
+
+    def heartbeat(self, workerId):
+        # False if the worker was given up on and has to register again
+        with self.condition:
+            if workerId not in self.workers:
+                return False
+            self.workers[workerId] = time.monotonic()
+            return True
+
+    def leave(self, workerId, reason="left"):
+        with self.condition:
+            self._drop(workerId, reason)
+
+    def _drop(self, workerId, reason):
+        if self.workers.pop(workerId, None) is None:
+            return
+        lost = [taskId for taskId, holder in self.leases.items() if holder == workerId]
+        for taskId in lost:
+            del self.leases[taskId]
+            self.pending.appendleft(taskId)
+        self.requeued += len(lost)
+        print(f"WORKER {reason.upper()}: {workerId}, {len(lost)} tasks re-queued ({len(self.workers)} workers)")
+        if lost:
+            self.condition.notify_all()
+
+    def reap(self):
+        # Drops workers whose heartbeats stopped
+        with self.condition:
+            now = time.monotonic()
+            for workerId, lastSeen in list(self.workers.items()):
+                if now - lastSeen > self.leaseTimeout:
+                    self._drop(workerId, "lost")
+
+    def getTask(self, workerId, timeout=1.0):
+        # Returns (taskId, task) leased to the worker, or None if nothing came up within timeout
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if workerId not in self.workers:
+                    return None
+                self.workers[workerId] = time.monotonic()
+                while self.pending:
+                    taskId = self.pending.popleft()
+                    if taskId in self.tasks and taskId not in self.results:
+                        self.leases[taskId] = workerId
+                        return taskId, self.tasks[taskId]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def putResult(self, workerId, taskId, result):
+        with self.condition:
+            if workerId in self.workers:
+                self.workers[workerId] = time.monotonic()
+            if taskId in self.tasks and taskId not in self.results:
+                self.results[taskId] = result
+                self.leases.pop(taskId, None)
+                self.condition.notify_all()
+
+    def submit(self, tasks):
+        # Queues tasks; returns their ids
+        with self.condition:
+            taskIds = []
+            for task in tasks:
+                taskId = uuid.uuid4().hex
+                self.tasks[taskId] = task
+                self.pending.append(taskId)
+                taskIds.append(taskId)
+            self.condition.notify_all()
+            return taskIds
+
+    def collect(self, taskIds, reportEvery=30):
+        # Waits for the tasks' results (re-queueing the work of lost workers meanwhile) and
+        # returns them in order, forgetting the tasks
+        lastReport = time.monotonic()
+        while True:
+            self.reap()
+            with self.condition:
+                done = sum(taskId in self.results for taskId in taskIds)
+                if done == len(taskIds):
+                    results = [self.results.pop(taskId) for taskId in taskIds]
+                    for taskId in taskIds:
+                        del self.tasks[taskId]
+                    return results
+                if time.monotonic() - lastReport > reportEvery:
+                    print(f"WAITING: {done}/{len(taskIds)} results, {len(self.workers)} workers")
+                    lastReport = time.monotonic()
+                self.condition.wait(min(1.0, self.leaseTimeout / 3))
+
+    def status(self):
+        with self.condition:
+            return {'workers': len(self.workers), 'pending': len(self.pending), 'leased': len(self.leases),
+                    'requeued': self.requeued}
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register('coordinator')
+
+
+def serve(coordinator, address, authkey):
+    # Serves coordinator from a background thread of this process; returns the bound (host, port)
+    if not isLoopback(address[0]) and authkey in WEAK_AUTHKEYS:
+        raise ValueError(f"refusing to serve on {address[0]} with a well-known authkey; pass a secret one")
+    _ServerManager.register('coordinator', callable=lambda: coordinator)
+    server = _ServerManager(address=address, authkey=authkey.encode()).get_server()
+    threading.Thread(target=server.serve_forever, name='coordinator', daemon=True).start()
+    return server.address
+
+
+def connect(address, authkey, retryFor=30):
+    # Proxy to a served Coordinator, retrying while the server comes up
+    if not authkey:
+        raise ValueError("connecting to a coordinator needs its authkey (--authkey or $AIRFOIL_AUTHKEY)")
+    deadline = time.monotonic() + retryFor
+    while True:
+        manager = _ClientManager(address=address, authkey=authkey.encode())
+        try:
+            manager.connect()
+            return manager.coordinator()
+        except (ConnectionRefusedError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+def solveTask(task, workDir):
+    # Runs one task on this machine; returns the packed polar (None if XFOIL wrote none)
+    X, Y, name, sweep = task
+    polar = Airfoil.runAirfoil(X, Y, name, sweep['Re'], sweep['iterStart'], sweep['iterEnd'], sweep['iterStep'],
+                               iterative=sweep.get('iterative', 'alpha'), workDir=workDir,
+                               adaptive=sweep.get('adaptive', False), panels=sweep.get('panels'),
+                               maxIter=sweep.get('maxIter'))
+    return polarToBytes(polar)
+
+
+def runWorker(address, authkey, name=None, heartbeatEvery=5, maxTasks=None):
+    # Pulls and solves tasks until the coordinator goes away (or maxTasks are done)
+    from xfoil import scratchDir
+
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    coordinator = connect(address, authkey)
+    workerId = coordinator.register(name)
+    workDir = scratchDir()
+    stop = threading.Event()
+
+    def beat():
+        # Own connection, so heartbeats go out while XFOIL runs
+        proxy = connect(address, authkey)
+        while not stop.wait(heartbeatEvery):
+            try:
+                proxy.heartbeat(workerId)
+            except (EOFError, OSError):
+                return
+
+    threading.Thread(target=beat, daemon=True).start()
+    done = 0
+    try:
+        while maxTasks is None or done < maxTasks:
+            leased = coordinator.getTask(workerId, 5.0)
+            if leased is None:
+                if not coordinator.heartbeat(workerId):
+                    workerId = coordinator.register(name)
+                continue
+            taskId, task = leased
+            try:
+                result = solveTask(task, workDir)
+            except Exception as ex:
+                print(f"{task[2]} Failed | {ex}")
+                result = None
+            coordinator.putResult(workerId, taskId, result)
+            done += 1
+    except (EOFError, ConnectionError, BrokenPipeError):
+        print(f"{name}: coordinator gone")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        try:
+            coordinator.leave(workerId)
+        except (EOFError, OSError):
+            pass
+    return done
+
+
+def runWorkers(address, authkey, processes=None):
+    # Runs one worker per process (default one per core) on this machine
+    processes = processes or os.cpu_count()
+    workers = [multiprocessing.Process(target=runWorker, args=(address, authkey)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+class DistributedEvaluator(BatchEvaluator):
+    # Batch evaluator sending the XFOIL runs to remote workers
+    #
+    # scorePolar  : function (polar, foilName) -> fitness or (fitness, metrics), run in this process
+    #               (polar is None where XFOIL wrote no polar)
+    # geometry    : batch geometry function (N, genes) -> X, Y, e.g. PARSECbatch
+    # sweep       : dict of Re, iterStart, iterEnd, iterStep and optionally iterative, adaptive, panels and
+    #               maxIter, as for Airfoil.runAirfoil
+    # address     : (host, port) to serve the coordinator on (port 0 for any free port); other machines
+    #               can only reach a non-loopback host such as '0.0.0.0'
+    # authkey     : key the workers must present, None to generate one (printed on start)
+    # screener, deduplicate : as for PoolEvaluator
+    # leaseTimeout: seconds without a heartbeat before a worker's tasks are re-queued
+
+    def __init__(self, scorePolar, geometry, sweep, address=('127.0.0.1', 50000), authkey=DEFAULT_AUTHKEY, screener=None,
+                 leaseTimeout=30, deduplicate=True):
+        super().__init__(None, geometry, screener, deduplicate)
+        self.scorePolar = scorePolar
+        self.sweep = sweep
+        self.coordinator = Coordinator(leaseTimeout)
+        self.requestedAddress = address
+        self.authkey = authkey
+        self.address = None
+
+    @property
+    def nWorkers(self):
+        return self.coordinator.status()['workers']
+
+    def start(self):
+        if self.address is None:
+            generated = not self.authkey
+            if generated:
+                self.authkey = secrets.token_urlsafe(24)
+            self.address = serve(self.coordinator, self.requestedAddress, self.authkey)
+            print(f"COORDINATOR: serving on {self.address[0]}:{self.address[1]}")
+            if generated:
+                print(f"COORDINATOR: generated authkey {self.authkey} (workers: --authkey {self.authkey})")
+
+    def run(self, tasks):
+        if not tasks:
+            return []
+        solutions = np.array([solution for _, solution, _ in tasks])
+        foilNames = [foilName for _, _, foilName in tasks]
+        X, Y = self.geometry(solutions)
+        taskIds = self.coordinator.submit([(X[i], Y[i], foilNames[i], self.sweep) for i in range(len(tasks))])
+        polars = self.coordinator.collect(taskIds)
+
+        results = []
+        for polar, foilName in zip(polars, foilNames):
+            Instrumentation.count('evaluations')
+            results.append((self.scorePolar(polarFromBytes(polar), foilName), None))
+        return results
+
+    def __getstate__(self):
+        # pygad pickles its fitness_func on save(); the coordinator and its server stay here
+        state = self.__dict__.copy()
+        state['coordinator'] = None
+        state['address'] = None
+        # Nor does the key belong in the save file
+        state['authkey'] = None
+        return state
@@ -0,0 +1,273 @@
+"""BATCH FITNESS EVALUATION"""
+# Evaluates a whole pygad population per fitness call (pygad's fitness_batch_size), so the
+# generation's geometry is built and screened in one batch and the XFOIL runs can be
+# dispatched together. PoolEvaluator runs them across a pool of worker processes, each
+# with its own scratch directory so that concurrent XFOIL runs never share .dat or polar
+# files; SerialEvaluator runs them one after another in this process.
+#
+# Candidate functions return the fitness, or (fitness, metrics) with metrics a dict of
+# per-candidate values such as Airfoil.polarMetrics(polar); the evaluators collect them
+# per population for History.RunHistory's summary.
+
+import os
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
+from collections import OrderedDict
+
+import numpy as np
+
+import Instrumentation
+from xfoil import scratchBase
+
+
+_workDir = None
+
+
+def _initWorker(scratchRoot):
+    global _workDir
+    _workDir = tempfile.mkdtemp(prefix=f"worker{os.getpid()}_", dir=scratchRoot)
+    Instrumentation.initWorker()
+
+
+def _evaluateCandidate(task):
+    # Returns the candidate's result and the worker's instrumentation since its previous task
+    candidateFitness, solution, foilName, profileTarget = task
+    result = Instrumentation.runProfiled(profileTarget, candidateFitness, solution, foilName, _workDir)
+    return result, Instrumentation.drain() if Instrumentation.enabled else None
+
+
+def geometryKeys(X, Y, decimals=5):
+    # One key per candidate from its coordinates as createDATFile writes them (5 decimals), so
+    # shapes giving byte-identical .dat files share a key
+    coords = np.round(np.concatenate((X, Y), axis=1).astype(np.float64), decimals) + 0.0    # + 0.0 folds -0.0 into 0.0
+    return [hashlib.sha1(row.tobytes()).hexdigest() for row in coords]
+
+
+class Deduplicator:
+    # Index of evaluated geometries, so that a shape is solved once however often the GA
+    # produces it: repeats within a batch share one solver call, and shapes solved in
+    # earlier generations reuse their result (BatchEvaluator only remembers successes)
+    #
+    # maxEntries : geometries remembered (least recently used dropped first)
+
+    def __init__(self, maxEntries=100000):
+        self.maxEntries = maxEntries
+        self.index = OrderedDict()
+        self.history = []
+
+    def lookup(self, key):
+        if key in self.index:
+            self.index.move_to_end(key)
+            return self.index[key]
+        return None
+
+    def remember(self, key, result):
+        self.index[key] = result
+        if len(self.index) > self.maxEntries:
+            self.index.popitem(last=False)
+
+    def plan(self, keys, indices):
+        # Splits the candidates at indices into the ones to solve (first of each new shape) and
+        # (candidate, known result) / (candidate, candidate solved in this batch) pairs for the rest
+        solve, known, repeats = [], [], []
+        firstOf = {}
+        for i in indices:
+            result = self.lookup(keys[i])
+            if result is not None:
+                known.append((i, result))
+            elif keys[i] in firstOf:
+                repeats.append((i, firstOf[keys[i]]))
+            else:
+                firstOf[keys[i]] = i
+                solve.append(i)
+        entry = {'candidates': len(indices), 'withinBatch': len(repeats), 'earlier': len(known)}
+        self.history.append(entry)
+        Instrumentation.count('duplicates', len(repeats) + len(known))
+        return solve, known, repeats
+
+    def report(self):
+        last = self.history[-1]
+        duplicates = last['withinBatch'] + last['earlier']
+        share = duplicates / last['candidates'] if last['candidates'] else 0.0
+        total = sum(entry['withinBatch'] + entry['earlier'] for entry in self.history)
+        return f"DEDUPLICATION: {duplicates}/{last['candidates']} duplicates ({share:.0%}) - {last['withinBatch']} within " \
+               f"the generation, {last['earlier']} seen before - XFOIL calls avoided: {duplicates} ({total} in total)"
+
+    def __getstate__(self):
+        # pygad saves its fitness_func with the run; the index is rebuilt on the next evaluations
+        state = self.__dict__.copy()
+        state['index'] = OrderedDict()
+        return state
+
+
+def splitResult(result):
+    # (fitness, metrics dict) from a candidate function's return value
+    if isinstance(result, tuple):
+        return result
+    return result, {}
+
+
+class BatchEvaluator:
+    # candidateFitness : module-level function (solution, foilName, workDir) -> fitness or (fitness, metrics)
+    # geometry         : batch geometry function (N, genes) -> X, Y, e.g. PARSECbatch; needed for screening
+    # screener         : Screening.Screener; rejected candidates get its penalty fitness without an XFOIL run
+    # deduplicate      : solve each distinct geometry once (Deduplicator; needs geometry), the fitness
+    #                    having to depend on the shape alone
+    #
+    # Pass an instance as pygad's fitness_func; GATools.runGA sets fitness_batch_size for it.
+    # Subclasses provide run(tasks) -> results, one (candidateFitness, solution, foilName) task each.
+
+    nWorkers = 1
+
+    def __init__(self, candidateFitness, geometry=None, screener=None, deduplicate=True):
+        self.candidateFitness = candidateFitness
+        self.geometry = geometry
+        self.screener = screener
+        self.deduplicator = Deduplicator() if deduplicate and geometry is not None else None
+        self.metrics = {}
+        self.metricNames = set()
+        self.generation = None
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def run(self, tasks):
+        raise NotImplementedError
+
+    def evaluate(self, solutions, foilNames):
+        # solutions : (N, genes) array
+        # Returns the (N,) fitness and a dict of (N,) metric arrays (NaN for screened-out candidates)
+        self.start()
+        solutions = np.asarray(solutions)
+        fitness = np.zeros(len(solutions))
+        valid = np.ones(len(solutions), dtype=bool)
+
+        if self.geometry is not None and (self.screener is not None or self.deduplicator is not None):
+            X, Y = self.geometry(solutions)
+        if self.screener is not None:
+            valid = self.screener.screen(X, Y, solutions)
+            fitness[~valid] = self.screener.penalty
+
+        indices = np.flatnonzero(valid)
+        known, repeats = [], []
+        if self.deduplicator is not None:
+            keys = geometryKeys(X, Y)
+            indices, known, repeats = self.deduplicator.plan(keys, indices)
+        results = self.run([(self.candidateFitness, solutions[i], foilNames[i]) for i in indices])
+
+        metrics = {}
+        solved = {}
+        for i, (result, instrumentation) in zip(indices, results):
+            result = splitResult(result)
+            solved[i] = result
+            if self.deduplicator is not None and result[0] > 0:
+                # A failure may be a timeout under load, so the shape is solved again when it comes back
+                self.deduplicator.remember(keys[i], result)
+            if instrumentation is not None:
+                Instrumentation.merge(instrumentation)
+        for i, j in repeats:
+            solved[i] = solved[j]
+        solved.update(known)
+
+        for i, (value, candidateMetrics) in solved.items():
+            fitness[i] = value
+            self.metricNames.update(candidateMetrics)
+            for name, value in candidateMetrics.items():
+                metrics.setdefault(name, np.full(len(solutions), np.nan))[i] = value
+
+        for i, solution in enumerate(solutions):
+            self.metrics[tuple(solution)] = {name: values[i] for name, values in metrics.items()}
+        return fitness, metrics
+
+    def populationMetrics(self, population):
+        # Metric arrays for a population, from the evaluations of its members (parents and
+        # elites carried over by pygad keep the metrics of their original evaluation)
+        rows = [self.metrics.get(tuple(solution), {}) for solution in population]
+        names = sorted(self.metricNames)
+        return {name: np.array([row.get(name, np.nan) for row in rows], dtype=float) for name in names}
+
+    def summary(self, ga_instance):
+        # History.RunHistory summary function
+        return self.populationMetrics(ga_instance.population)
+
+    def __call__(self, ga_instance, solutions, solutions_indices):
+        # pygad batch fitness hook (fitness_batch_size > 1)
+        generationNum = ga_instance.generations_completed
+        if solutions_indices is None:
+            solutions_indices = range(len(solutions))
+        foilNames = [f"Gen{generationNum}Sol{idx}" for idx in solutions_indices]
+        if generationNum != self.generation:
+            # Only members of the new population can still need their metrics
+            population = {tuple(solution) for solution in ga_instance.population}
+            self.metrics = {key: row for key, row in self.metrics.items() if key in population}
+            self.generation = generationNum
+
+        Instrumentation.report(f"GENERATION {generationNum}\nEVALUATING {len(solutions)} SOLUTIONS ON {self.nWorkers} WORKERS")
+
+        fitness, _ = self.evaluate(solutions, foilNames)
+        if self.screener is not None:
+            Instrumentation.report(self.screener.report())
+        if self.deduplicator is not None:
+            Instrumentation.report(self.deduplicator.report())
+
+        return list(fitness)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+class SerialEvaluator(BatchEvaluator):
+    # Runs the candidates one after another in this process
+
+    def run(self, tasks):
+        return [(candidateFitness(solution, foilName), None) for candidateFitness, solution, foilName in tasks]
+
+
+class PoolEvaluator(BatchEvaluator):
+    # Runs the candidates across a pool of worker processes
+    #
+    # nWorkers    : number of worker processes (None for one per core)
+    # scratchRoot : parent directory for the worker scratch directories (None for xfoil.scratchBase(), in RAM where available)
+    #
+    # e.g. GATools.runGA(gene_space, PoolEvaluator(candidateFitness, geometry=PARSECbatch, screener=Screener()), name)
+
+    def __init__(self, candidateFitness, nWorkers=None, scratchRoot=None, geometry=None, screener=None, deduplicate=True):
+        super().__init__(candidateFitness, geometry, screener, deduplicate)
+        self.nWorkers = nWorkers or os.cpu_count()
+        self.scratchRoot = scratchRoot
+        self.pool = None
+        self.poolDir = None
+
+    def start(self):
+        if self.pool is None:
+            self.poolDir = tempfile.mkdtemp(prefix="xfoilpool_", dir=self.scratchRoot or scratchBase())
+            self.pool = multiprocessing.Pool(self.nWorkers, initializer=_initWorker, initargs=(self.poolDir,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.poolDir is not None:
+            shutil.rmtree(self.poolDir, ignore_errors=True)
+            self.poolDir = None
+
+    def run(self, tasks):
+        profileTarget = Instrumentation.profileTarget()
+        return self.pool.map(_evaluateCandidate, [task + (profileTarget,) for task in tasks], chunksize=1)
+
+    def __getstate__(self):
+        # pygad pickles its fitness_func on save(); the pool itself is not picklable
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['poolDir'] = None
+        return state
@@ -1,101 +1,134 @@
-import pygad
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import animation, rc
-from IPython.display import HTML, Image
 
 import Airfoil
 from PARSEC.Parsec import PARSECfoil
-from BEZIER.Bezier import BEZIERfoil, listToCP
-
-
-def runGA(gene_space, fitnessFunction, name):
-    num_generations = 100
+from BEZIER.Bezier import BEZIERfoil
+
+# pygad, matplotlib and the animation pipeline are imported where they are used, so that
+# importing this module (e.g. in every pool worker) stays cheap and side-effect free
+
+
+def runGA(gene_space, fitnessFunction, name, fitnessBatchSize=None, numGenerations=100, solPerPop=50, onGeneration=None,
+          history=None, resume=False, plot=True, stallGenerations=None, refine=None, refineEvaluations=300):
+    # gene_space       : pygad gene space, one entry per gene (e.g. PARSEC.Parsec.PARSEC_GENE_SPACE)
+    # fitnessFunction  : batch evaluator (Evaluator.PoolEvaluator/SerialEvaluator, Surrogate.SurrogateEvaluator,
+    #                    MultiFidelity.MultiFidelityEvaluator) or
+    #                    per-solution pygad fitness function
+    # fitnessBatchSize : solutions per fitness call, None for the whole population with a batch evaluator (one call per
+    #                    solution otherwise)
+    # onGeneration     : pygad on_generation callback, e.g. Instrumentation.onGeneration
+    # history          : History.RunHistory streaming every generation to disk (instead of keeping all solutions in memory)
+    # resume           : continue from the history's last checkpoint, if there is one
+    # plot             : show pygad's fitness plot at the end
+    # stallGenerations : stop once the best fitness has not improved for this many generations (None to run them all)
+    # refine           : polish the best solution with LocalSearch ('L-BFGS-B' or 'SLSQP', needs a batch evaluator), None for none
+    # refineEvaluations: solver budget of the refinement
+    # Returns the pygad.GA instance (None if a resumed run had already finished)
+
+    num_generations = numGenerations
     num_parents_mating = 4
-    num_genes = 11
+    num_genes = len(gene_space)
     parent_selection_type = "sss"
     keep_parents = 2
     crossover_type = "single_point"
     mutation_type = "random"
     mutation_percent_genes = 10
 
-    gene_space = [
-        {'low': 0.01, 'high': 0.03},    # p1  - rLE Leading-edge radius
-        {'low': 0.1, 'high': 0.7},      # p2  - XS Upper crest position in horizontal coordinates
-        {'low': 0.03, 'high': 0.1},     # p3  - ZS Upper crest position in vertical coordinates
-        {'low': -0.6, 'high': -0.2},    # p4  - ZXX,S Upper crest curvature
-        {'low': 0.1, 'high': 0.7},      # p5  - XP Lower crest position in horizontal coordinates
-        {'low': -0.03, 'high': -0.1},   # p6  - ZP Lower crest position in vertical coordinates
-        {'low': 0.2, 'high': 0.6},      # p7  - ZXX,P Lower crest curvature
-        {'low': 0, 'high': 0.025},      # p8  - ZT E Trailing-edge offset
-        {'low': 0, 'high': 0.005},      # p9  - ∆ZT E Trailing-edge thickness
-        {'low': -5, 'high': 5},         # p10 - αT E Trailing-edge direction
-        {'low': 0, 'high': 5}           # p11 - βT E Trailing-edge wedge angle
-    ]
+    import pygad
+
+    # Batch evaluators see the whole generation at once and report per-candidate polar metrics
+    batchEvaluator = hasattr(fitnessFunction, 'summary')
+    if batchEvaluator and fitnessBatchSize is None:
+        fitnessBatchSize = solPerPop
+    if batchEvaluator and history is not None and history.summary is None:
+        history.summary = fitnessFunction.summary
+    if refine is not None and not batchEvaluator:
+        raise ValueError("refine needs a batch evaluator (Evaluator.PoolEvaluator or SerialEvaluator)")
+
+    checkpoint = None
+    if history is not None:
+        checkpoint = history.resumeFrom() if resume else None
+        if checkpoint is None:
+            history.clear()
+        elif checkpoint['finished']:
+            print(f"{name}: run already finished at generation {checkpoint['generation']}")
+            return
+        else:
+            num_generations -= checkpoint['generation']
+            print(f"{name}: resuming from generation {checkpoint['generation']}")
 
     ga_instance = pygad.GA(num_generations=num_generations,
                            num_parents_mating=num_parents_mating,
                            fitness_func=fitnessFunction,
                            num_genes=num_genes,
-                           sol_per_pop=50,
+                           sol_per_pop=solPerPop,
                            parent_selection_type=parent_selection_type,
                            keep_parents=keep_parents,
                            crossover_type=crossover_type,
                            mutation_type=mutation_type,
                            mutation_percent_genes=mutation_percent_genes,
                            gene_space=gene_space,
-                           save_solutions=True)
+                           fitness_batch_size=fitnessBatchSize,
+                           on_generation=onGeneration,
+                           initial_population=None if checkpoint is None else checkpoint['population'],
+                           on_fitness=None if history is None else history.record,
+                           on_stop=None if history is None else history.finish,
+                           save_solutions=history is None,
+                           stop_criteria=None if stallGenerations is None else f"saturate_{stallGenerations}")
+    if checkpoint is not None:
+        history.restore(ga_instance, checkpoint)
+    # Generation the run ends at; after a resume num_generations only counts the ones left
+    ga_instance.lastGeneration = numGenerations
 
     ga_instance.run()
+    solution, solution_fitness, solution_idx = ga_instance.best_solution(ga_instance.last_generation_fitness)
+    if refine is not None:
+        # Hybrid mode: gradient-based polishing of the GA's best shape (kept on the saved run)
+        from LocalSearch import refine as refineSolution
+        print(f"{name}: GA stopped after {ga_instance.generations_completed} generations, refining with {refine}")
+        evaluator = getattr(fitnessFunction, 'evaluator', fitnessFunction)
+        ga_instance.refinedSolution, ga_instance.refinedFitness, _ = refineSolution(
+            evaluator, gene_space, solution, solution_fitness, refine, maxEvaluations=refineEvaluations)
     ga_instance.save(name)
-    ga_instance.plot_fitness()
-    solution, solution_fitness, solution_idx = ga_instance.best_solution()
+    if plot:
+        ga_instance.plot_fitness()
     print("Parameters of the best solution : {solution}".format(solution=solution))
     print("Fitness value of the best solution = {solution_fitness}".format(solution_fitness=solution_fitness))
     print("Index of the best solution : {solution_idx}".format(solution_idx=solution_idx))
+    if refine is not None:
+        print("Parameters of the refined solution : {solution}".format(solution=ga_instance.refinedSolution))
+        print("Fitness value of the refined solution = {fitness}".format(fitness=ga_instance.refinedFitness))
 
+    return ga_instance
 
-def animateGA(gaName, fileName, method):
-    rc('animation', html='html5')
-
-    ga_instance = pygad.load(gaName)
 
-    solutionsArr = ga_instance.solutions
+def animateGA(gaName, fileName, method, historyDir=None, frames='all', every=10, nWorkers=None, fileFormat='gif'):
+    # historyDir : History.RunHistory directory to take the solutions from (for runs saved without them)
+    # frames     : 'all' solutions, the 'best' of each generation, or 'every' k-th solution (k = every)
+    # nWorkers   : rendering processes (None for one per core)
+    # fileFormat : 'gif' or 'mp4' (needs ffmpeg)
+    from Animation import animateRun
 
-    """ANIMATION"""
-    # Initial
-    X, Y = PARSECfoil(solutionsArr[0]) if method == "PARSEC" else BEZIERfoil(listToCP(solutionsArr[0]), 16)
-    fig, ax = plt.subplots()
-    ax.set_xlim(( 0, 1))
-    ax.set_ylim(( -0.5, 0.5))
-    plt.gca().set_aspect('equal')
-    line, = ax.plot([], [], lw=2)
+    nFrames = animateRun(gaName, fileName, method, historyDir, frames, every, fps=30, nWorkers=nWorkers, fileFormat=fileFormat)
+    print(f"{fileName}.{fileFormat}: {nFrames} frames")
 
 
-    def init():
-        line.set_data([], [])
-        return (line,)
-
-
-    def animate(i):
-        X, Y = PARSECfoil(solutionsArr[i]) if method == "PARSEC" else BEZIERfoil(listToCP(solutionsArr[i]), 16)
-        line.set_data(X, Y)
-        plt.gca().set_aspect('equal')
-        return (line,)
-
-
-    anim = animation.FuncAnimation(fig, animate, init_func=init,
-                                   frames=len(solutionsArr), interval=20, blit=True)
-
-    f = f"./{fileName}.gif"
-    writergif = animation.PillowWriter(fps=30)
-    anim.save(f, writer=writergif)
+def bestSolution(ga_instance):
+    # Best (solution, fitness) of a run, the refined one for hybrid runs; stored fitness is
+    # used so that loading a run never re-evaluates it
+    if getattr(ga_instance, 'refinedSolution', None) is not None:
+        return ga_instance.refinedSolution, ga_instance.refinedFitness
+    solution, solution_fitness, _ = ga_instance.best_solution(ga_instance.last_generation_fitness)
+    return solution, solution_fitness
 
 
 def plotBestGA(gaName, parametrization):
+    import pygad
+    import matplotlib.pyplot as plt
+
     ga_instance = pygad.load(gaName)
 
-    solution, solution_fitness, solution_idx = ga_instance.best_solution()
+    solution, solution_fitness = bestSolution(ga_instance)
 
     if parametrization=="PARSEC":
         X, Y = PARSECfoil(solution)
@@ -106,12 +139,14 @@ def plotBestGA(gaName, parametrization):
 
 
 def createDAT(gaName, parametrization, foilName):
+    import pygad
+
     ga_instance = pygad.load(gaName)
 
-    solution, solution_fitness, solution_idx = ga_instance.best_solution()
+    solution, solution_fitness = bestSolution(ga_instance)
 
     if parametrization=="PARSEC":
         X, Y = PARSECfoil(solution)
-        Airfoil.createDATFile(X, Y, foilName)
-
-createDAT('Single CL GA PARSEC', 'PARSEC', '014CL')
+    else:
+        X, Y = BEZIERfoil(solution, 16)
+    Airfoil.createDATFile(X, Y, foilName)
@@ -0,0 +1,158 @@
+"""OPTIMISATION HISTORY"""
+# Append-only, on-disk record of every evaluated generation plus periodic GA checkpoints.
+# Generations are buffered in memory only until the next checkpoint, then written as one
+# chunk file (chunk_<first generation>.npz holding generation, genes, fitness and any
+# summary arrays), so memory use stays flat however long the run is. Chunks and the
+# checkpoint are written to a temporary name and renamed into place, so a crash leaves
+# either the old or the new file, never a partial one.
+#
+# Usage:
+#     GATools.runGA(..., history=RunHistory('LDmax run_history'), resume=True)
+
+import os
+import glob
+import pickle
+import random
+
+import numpy as np
+
+
+CHECKPOINT = 'checkpoint.pkl'
+
+
+def _atomicWrite(fileName, write):
+    # write(f) fills a temporary file that then replaces fileName
+    tmpName = fileName + '.tmp'
+    with open(tmpName, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpName, fileName)
+
+
+def chunkFiles(directory):
+    # Chunk files in generation order
+    return sorted(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+
+
+def chunkStart(fileName):
+    return int(os.path.basename(fileName)[len('chunk_'):-len('.npz')])
+
+
+def iterHistory(directory):
+    # Yields one dict per chunk (generation (n,), genes (n, pop, genes), fitness (n, pop), summaries...)
+    for fileName in chunkFiles(directory):
+        with np.load(fileName) as chunk:
+            yield {key: chunk[key] for key in chunk.files}
+
+
+def loadHistory(directory):
+    # The whole history as one dict of arrays concatenated over generations
+    chunks = list(iterHistory(directory))
+    if not chunks:
+        return {}
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def loadCheckpoint(directory):
+    fileName = os.path.join(directory, CHECKPOINT)
+    if not os.path.exists(fileName):
+        return None
+    with open(fileName, 'rb') as f:
+        return pickle.load(f)
+
+
+class RunHistory:
+    # directory       : where the chunks and the checkpoint are kept (created if missing)
+    # checkpointEvery : generations buffered between writes; each write also checkpoints the GA
+    # summary         : optional function (ga_instance) -> dict of per-candidate arrays for the
+    #                   population just evaluated (e.g. CLmax, LDmax), stored next to the fitness
+    #
+    # Hook record() into pygad's on_fitness and finish() into on_stop; runGA does both.
+
+    def __init__(self, directory, checkpointEvery=5, summary=None):
+        self.directory = directory
+        self.checkpointEvery = checkpointEvery
+        self.summary = summary
+        self.buffer = []
+        self.lastGeneration = -1
+        os.makedirs(directory, exist_ok=True)
+
+    def clear(self):
+        # Forgets a previous run kept in the same directory
+        for fileName in chunkFiles(self.directory) + glob.glob(os.path.join(self.directory, CHECKPOINT)):
+            os.remove(fileName)
+        self.buffer = []
+        self.lastGeneration = -1
+
+    def resumeFrom(self):
+        # Returns the last checkpoint (None if there is none) and drops any chunk written after it
+        checkpoint = loadCheckpoint(self.directory)
+        if checkpoint is None:
+            self.clear()
+            return None
+
+        for fileName in chunkFiles(self.directory):
+            if chunkStart(fileName) > checkpoint['generation']:
+                os.remove(fileName)
+        self.buffer = []
+        self.lastGeneration = checkpoint['generation']
+        return checkpoint
+
+    def record(self, ga_instance, fitness):
+        # pygad on_fitness callback: the population has just been evaluated
+        generation = ga_instance.generations_completed
+        if generation <= self.lastGeneration:
+            return None
+
+        entry = {'generation': generation,
+                 'genes': np.array(ga_instance.population, dtype=float),
+                 'fitness': np.array(fitness, dtype=float)}
+        if self.summary is not None:
+            entry.update({key: np.asarray(value) for key, value in self.summary(ga_instance).items()})
+        self.buffer.append(entry)
+        self.lastGeneration = generation
+
+        if len(self.buffer) >= self.checkpointEvery:
+            self.flush()
+            self.checkpoint(ga_instance)
+        return None
+
+    def finish(self, ga_instance, fitness):
+        # pygad on_stop callback: records the final population and marks the run finished
+        self.record(ga_instance, fitness)
+        self.flush()
+        self.checkpoint(ga_instance, finished=True)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk = {key: np.stack([entry[key] for entry in self.buffer]) for key in self.buffer[0]}
+        fileName = os.path.join(self.directory, f"chunk_{self.buffer[0]['generation']:06d}.npz")
+        _atomicWrite(fileName, lambda f: np.savez(f, **chunk))
+        self.buffer = []
+
+    def checkpoint(self, ga_instance, finished=False):
+        # Everything needed to carry on from the population evaluated last
+        state = {'generation': ga_instance.generations_completed,
+                 'population': np.array(ga_instance.population),
+                 'finished': finished,
+                 'best_solutions_fitness': list(ga_instance.best_solutions_fitness),
+                 'best_solutions_generations': list(getattr(ga_instance, 'best_solutions_generations', [])),
+                 'numpy_random_generator': getattr(ga_instance, 'numpy_random_generator', None),
+                 'python_random_generator': getattr(ga_instance, 'python_random_generator', None),
+                 'numpyGlobalState': np.random.get_state(),
+                 'pythonGlobalState': random.getstate()}
+        _atomicWrite(os.path.join(self.directory, CHECKPOINT), lambda f: pickle.dump(state, f))
+
+    def restore(self, ga_instance, checkpoint):
+        # Puts a checkpoint's counters and random state back on a freshly built pygad.GA
+        ga_instance.generations_completed = checkpoint['generation']
+        ga_instance.best_solutions_fitness = list(checkpoint['best_solutions_fitness'])
+        if hasattr(ga_instance, 'best_solutions_generations'):
+            ga_instance.best_solutions_generations = list(checkpoint['best_solutions_generations'])
+        for name in ('numpy_random_generator', 'python_random_generator'):
+            if checkpoint[name] is not None:
+                setattr(ga_instance, name, checkpoint[name])
+        np.random.set_state(checkpoint['numpyGlobalState'])
+        random.setstate(checkpoint['pythonGlobalState'])
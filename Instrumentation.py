@@ -0,0 +1,223 @@
+"""EVALUATION INSTRUMENTATION"""
+# Per-stage timers and solver outcome counters for fitness evaluations, aggregated per
+# generation into a JSONL (or CSV) metrics file. While disabled, stage() hands back one
+# shared no-op context manager and count() returns immediately, so the hooks left in
+# runAirfoil/runXFOIL cost a function call each.
+#
+# Usage:
+#     Instrumentation.enable('metrics.jsonl', profile=10)
+#     GATools.runGA(..., onGeneration=Instrumentation.onGeneration)
+#
+# Enable before the first evaluation so that pool workers, forked on first use, inherit it.
+# The profiled generation covers the pool workers too: Evaluator.PoolEvaluator sends them
+# profileTarget() with their tasks, each worker dumps its own profile next to this process'
+# and they are merged into one profile_gen<N>.prof at the end of the generation. Work done
+# on Distributed remote workers is not profiled.
+#
+# The evaluators' per-generation progress lines go through report(), shown while
+# instrumentation is enabled or with verbose set (main.py optimize --verbose).
+
+import os
+import glob
+import json
+import time
+import pstats
+import cProfile
+
+
+enabled = False
+verbose = False
+metricsFile = None
+profileGeneration = None
+
+# Always present in the metrics rows (and the only columns of a CSV file)
+STAGES = ('geometry', 'cacheLookup', 'createDATFile', 'spawn', 'solve', 'parse', 'cleanup')
+COUNTERS = ('evaluations', 'cacheHits', 'duplicates', 'requestedPoints', 'convergedPoints', 'timeouts', 'parseFailures')
+
+stageTotals = {}
+counters = {}
+
+_profiler = None
+_workerProfiler = None
+_workerProfileTarget = None
+_generationStart = None
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        total = stageTotals.get(self.name)
+        elapsed = time.perf_counter() - self.start
+        if total is None:
+            stageTotals[self.name] = [elapsed, 1]
+        else:
+            total[0] += elapsed
+            total[1] += 1
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    # Context manager timing one evaluation stage
+    return _Stage(name) if enabled else _NO_STAGE
+
+
+def count(name, n=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def report(line):
+    # Per-generation progress line
+    if enabled or verbose:
+        print(line)
+
+
+def enable(fileName='metrics.jsonl', profile=None):
+    # fileName : metrics file, one line per generation (.csv for CSV, anything else for JSONL)
+    # profile  : generation to run under cProfile (written to profile_gen<N>.prof), None for none
+    global enabled, metricsFile, profileGeneration, _generationStart
+    enabled = True
+    metricsFile = fileName
+    profileGeneration = profile
+    _generationStart = time.perf_counter()
+    if profile == 0:
+        _startProfile()
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def drain():
+    # Returns and resets this process' stage totals and counters
+    snapshot = {'stages': dict(stageTotals), 'counters': dict(counters)}
+    stageTotals.clear()
+    counters.clear()
+    return snapshot
+
+
+def merge(snapshot):
+    # Adds a drained snapshot (e.g. from a pool worker) into this process' totals
+    for name, (seconds, calls) in snapshot['stages'].items():
+        total = stageTotals.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += calls
+    for name, n in snapshot['counters'].items():
+        counters[name] = counters.get(name, 0) + n
+
+
+def _startProfile():
+    global _profiler
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+
+def _stopProfile(generation):
+    # Dumps this process' profile merged with those of the pool workers
+    global _profiler
+    _profiler.disable()
+    fileName = f"profile_gen{generation}.prof"
+    _profiler.dump_stats(fileName)
+    _profiler = None
+
+    workerFiles = sorted(glob.glob(os.path.abspath(f"profile_gen{generation}_worker*.prof")))
+    if workerFiles:
+        stats = pstats.Stats(fileName)
+        for workerFile in workerFiles:
+            stats.add(workerFile)
+            os.remove(workerFile)
+        stats.dump_stats(fileName)
+
+
+def profileTarget():
+    # Worker profile file prefix while a generation is profiled, else None (see runProfiled)
+    if _profiler is None:
+        return None
+    return os.path.abspath(f"profile_gen{profileGeneration}")
+
+
+def runProfiled(target, function, *args):
+    # Pool worker side: runs function(*args), under this worker's profiler if target is set;
+    # the profile accumulates over the worker's tasks and is dumped to <target>_worker<pid>.prof
+    global _workerProfiler, _workerProfileTarget
+    if target is None:
+        return function(*args)
+    if target != _workerProfileTarget:
+        _workerProfiler = cProfile.Profile()
+        _workerProfileTarget = target
+    try:
+        return _workerProfiler.runcall(function, *args)
+    finally:
+        _workerProfiler.dump_stats(f"{target}_worker{os.getpid()}.prof")
+
+
+def initWorker():
+    # Forked pool workers start with a copy of the parent's totals, which the parent reports
+    # itself, and of its running profiler
+    drain()
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def writeGeneration(generation):
+    # Appends the aggregates since the previous generation to the metrics file and resets them
+    global _generationStart
+    now = time.perf_counter()
+    snapshot = drain()
+
+    row = {'generation': generation, 'wallTime': now - _generationStart}
+    for name in STAGES + tuple(sorted(set(snapshot['stages']) - set(STAGES))):
+        seconds, calls = snapshot['stages'].get(name, (0.0, 0))
+        row[f"{name}Time"] = seconds
+        row[f"{name}Calls"] = calls
+    for name in COUNTERS + tuple(sorted(set(snapshot['counters']) - set(COUNTERS))):
+        row[name] = snapshot['counters'].get(name, 0)
+    _generationStart = now
+
+    if metricsFile.endswith('.csv'):
+        columns = ['generation', 'wallTime'] + [f"{name}{kind}" for name in STAGES for kind in ('Time', 'Calls')] + list(COUNTERS)
+        newFile = not os.path.exists(metricsFile)
+        with open(metricsFile, 'a') as f:
+            if newFile:
+                f.write(",".join(columns) + "\n")
+            f.write(",".join(str(row[column]) for column in columns) + "\n")
+    else:
+        with open(metricsFile, 'a') as f:
+            f.write(json.dumps(row) + "\n")
+
+    return row
+
+
+def onGeneration(ga_instance):
+    # pygad on_generation callback
+    if not enabled:
+        return
+    generation = ga_instance.generations_completed
+
+    if _profiler is not None and generation >= profileGeneration:
+        _stopProfile(profileGeneration)
+    writeGeneration(generation)
+    if profileGeneration is not None and generation + 1 == profileGeneration:
+        _startProfile()
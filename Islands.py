@@ -0,0 +1,226 @@
+"""ISLAND-MODEL GA"""
+# Several independent pygad populations (islands), each run by GATools.runGA in its own
+# process with its own pool of evaluation workers, so that the number of XFOIL runs in
+# flight is no longer capped by one population's size. Every migrateEvery generations
+# each island sends copies of its best individuals to its neighbours, which take them in
+# place of their worst. Islands keep exploring different regions of the PARSEC landscape
+# in between, which also holds off premature convergence.
+#
+# Output, under the run directory:
+#     island<i>/        RunHistory chunks and checkpoint, pygad file and log of island i
+#     merged/           all islands side by side (History.loadHistory, GATools.animateGA historyDir)
+#     report.json       best solution of each island and overall
+#
+# Usage:
+#     Islands.runIslands(PARSEC_GENE_SPACE, candidateFitness, 'LDmax islands', nIslands=8, geometry=PARSECbatch)
+
+import os
+import sys
+import json
+import time
+import random
+import multiprocessing
+from queue import Empty
+
+import numpy as np
+
+import GATools
+from Evaluator import PoolEvaluator
+from History import RunHistory, loadHistory, loadCheckpoint, _atomicWrite
+
+
+TOPOLOGIES = ('ring', 'full')
+
+
+def neighbours(island, nIslands, topology):
+    # Islands that island sends its migrants to
+    if topology == 'ring':
+        return [(island + 1) % nIslands] if nIslands > 1 else []
+    if topology == 'full':
+        return [other for other in range(nIslands) if other != island]
+    raise ValueError(f"Unknown topology '{topology}' (expected one of {TOPOLOGIES})")
+
+
+class Migration:
+    # pygad on_generation callback exchanging migrants with the neighbouring islands
+    #
+    # inboxes      : one multiprocessing.Queue per island
+    # migrateEvery : generations between migrations
+    # migrants     : individuals sent to each neighbour
+    # timeout      : seconds to wait for a neighbour's migrants (a finished or failed island sends none);
+    #                None for twice this island's time since its previous migration or start, at least 30 s
+    #
+    # Nothing is exchanged at the run's last generation (GATools.runGA sets ga_instance.lastGeneration,
+    # which a resumed run's num_generations no longer is), where the migrants would never be used.
+
+    def __init__(self, island, inboxes, topology='ring', migrateEvery=5, migrants=2, timeout=None):
+        self.island = island
+        self.inboxes = inboxes
+        self.targets = neighbours(island, len(inboxes), topology)
+        self.sources = sum(island in neighbours(other, len(inboxes), topology) for other in range(len(inboxes)))
+        self.migrateEvery = migrateEvery
+        self.migrants = migrants
+        self.timeout = timeout
+        self.received = 0
+        # Created just before the island process starts
+        self.lastMigration = time.monotonic()
+
+    def __call__(self, ga_instance):
+        generation = ga_instance.generations_completed
+        lastGeneration = getattr(ga_instance, 'lastGeneration', ga_instance.num_generations)
+        if generation % self.migrateEvery or not self.targets or generation >= lastGeneration:
+            return
+        timeout = self.timeout
+        if timeout is None:
+            timeout = max(30, 2 * (time.monotonic() - self.lastMigration))
+
+        fitness = np.asarray(ga_instance.last_generation_fitness, dtype=float)
+        best = np.argsort(fitness)[::-1][:self.migrants]
+        message = (self.island, generation, np.array(ga_instance.population[best]), fitness[best])
+        for target in self.targets:
+            self.inboxes[target].put(message)
+
+        genes, values = [], []
+        for _ in range(self.sources):
+            try:
+                _, _, immigrantGenes, immigrantFitness = self.inboxes[self.island].get(timeout=timeout)
+            except Empty:
+                print(f"MIGRATION: generation {generation}, no migrants within {timeout:.0f} s")
+                break
+            genes.extend(immigrantGenes)
+            values.extend(immigrantFitness)
+        self.lastMigration = time.monotonic()
+        if not genes:
+            return
+
+        # The best immigrants take the places of the worst residents they beat, fitness included,
+        # so that they are selected on their merit without being evaluated again
+        genes, values = np.array(genes), np.array(values)
+        incoming = np.argsort(values)[::-1][:len(fitness) // 2]
+        worst = np.argsort(fitness)[:len(incoming)]
+        better = values[incoming] > fitness[worst]
+        incoming, worst = incoming[better], worst[better]
+        ga_instance.population[worst] = genes[incoming]
+        ga_instance.last_generation_fitness[worst] = values[incoming]
+        self.received += len(incoming)
+        print(f"MIGRATION: generation {generation}, {len(incoming)} immigrants in, best {np.max(ga_instance.last_generation_fitness):.6g}")
+
+    def __getstate__(self):
+        # pygad pickles its callbacks on save(); queues only pass to child processes
+        state = self.__dict__.copy()
+        state['inboxes'] = None
+        return state
+
+
+def islandDir(directory, island):
+    return os.path.join(directory, f"island{island}")
+
+
+def runIsland(island, directory, gene_space, candidateFitness, migration, workers, geometry, screener, gaOptions):
+    # Body of one island process
+    outputDir = islandDir(directory, island)
+    os.makedirs(outputDir, exist_ok=True)
+    log = open(os.path.join(outputDir, 'log.txt'), 'a', buffering=1)
+    sys.stdout = sys.stderr = log
+    # Forked islands would otherwise share their parent's random state
+    np.random.seed()
+    random.seed()
+
+    with PoolEvaluator(candidateFitness, nWorkers=workers, geometry=geometry, screener=screener) as evaluator:
+        GATools.runGA(gene_space, evaluator, os.path.join(outputDir, f"island{island}"), onGeneration=migration,
+                      history=RunHistory(outputDir), plot=False, **gaOptions)
+    log.close()
+
+
+def mergeHistories(directory, nIslands):
+    # Writes every island's history side by side as one History chunk under <directory>/merged:
+    # genes (generations, islands * pop, genes) and fitness, plus the island of each column
+    histories = [loadHistory(islandDir(directory, island)) for island in range(nIslands)]
+    histories = [history for history in histories if history]
+    if not histories:
+        return None
+    nGenerations = min(len(history['generation']) for history in histories)
+    merged = {key: np.concatenate([history[key][:nGenerations] for history in histories], axis=1)
+              for key in histories[0] if key != 'generation' and all(key in history for history in histories)}
+    merged['generation'] = histories[0]['generation'][:nGenerations]
+    merged['island'] = np.repeat(np.arange(len(histories)), [history['fitness'].shape[1] for history in histories])
+
+    mergedDir = os.path.join(directory, 'merged')
+    os.makedirs(mergedDir, exist_ok=True)
+    _atomicWrite(os.path.join(mergedDir, 'chunk_000000.npz'), lambda f: np.savez(f, **merged))
+    return merged
+
+
+def islandReport(directory, nIslands):
+    # Best solution of each island (over its whole history) and overall
+    islands = []
+    for island in range(nIslands):
+        checkpoint = loadCheckpoint(islandDir(directory, island))
+        history = loadHistory(islandDir(directory, island))
+        if not history:
+            islands.append({'island': island, 'finished': False})
+            continue
+        fitness = np.nan_to_num(history['fitness'], nan=-np.inf)
+        generation, index = np.unravel_index(np.argmax(fitness), fitness.shape)
+        islands.append({'island': island,
+                        'finished': bool(checkpoint and checkpoint['finished']),
+                        'generations': int(history['generation'][-1]),
+                        'bestFitness': float(fitness[generation, index]),
+                        'bestGeneration': int(history['generation'][generation]),
+                        'bestSolution': [float(gene) for gene in history['genes'][generation, index]]})
+
+    ranked = [entry for entry in islands if 'bestFitness' in entry]
+    best = max(ranked, key=lambda entry: entry['bestFitness']) if ranked else None
+    report = {'islands': islands, 'best': best}
+    with open(os.path.join(directory, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def runIslands(gene_space, candidateFitness, directory, nIslands=4, topology='ring', migrateEvery=5, migrants=2,
+               workersPerIsland=None, geometry=None, screener=None, migrationTimeout=None, **gaOptions):
+    # gene_space       : pygad gene space
+    # candidateFitness : module-level candidate function, as for Evaluator.PoolEvaluator
+    # directory        : run directory (see the top of this module)
+    # nIslands         : populations evolved side by side, each in its own process
+    # topology         : 'ring' (to the next island) or 'full' (to every other island)
+    # migrateEvery     : generations between migrations
+    # migrants         : best individuals each island sends to each of its neighbours
+    # workersPerIsland : evaluation processes per island (None for an equal share of the cores)
+    # geometry, screener : as for Evaluator.PoolEvaluator
+    # migrationTimeout : seconds an island waits for its neighbours' migrants (None to scale with the
+    #                    islands' generation time, see Migration)
+    # gaOptions        : passed on to GATools.runGA (numGenerations, solPerPop, resume, ...); options that
+    #                    end islands early (stallGenerations) make the others wait out the migration timeout
+    # Returns the report (best solution per island and overall)
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology '{topology}' (expected one of {TOPOLOGIES})")
+    workersPerIsland = workersPerIsland or max(1, os.cpu_count() // nIslands)
+    os.makedirs(directory, exist_ok=True)
+
+    inboxes = [multiprocessing.Queue() for _ in range(nIslands)]
+    islands = []
+    for island in range(nIslands):
+        migration = Migration(island, inboxes, topology, migrateEvery, migrants, migrationTimeout)
+        process = multiprocessing.Process(target=runIsland, name=f"island{island}",
+                                          args=(island, directory, gene_space, candidateFitness, migration,
+                                                workersPerIsland, geometry, screener, gaOptions))
+        process.start()
+        islands.append(process)
+    print(f"{directory}: {nIslands} islands ({topology}, {migrants} migrants every {migrateEvery} generations), "
+          f"{workersPerIsland} workers each")
+
+    for island, process in enumerate(islands):
+        process.join()
+        if process.exitcode != 0:
+            print(f"island{island} failed (exit code {process.exitcode}), see {islandDir(directory, island)}/log.txt")
+
+    mergeHistories(directory, nIslands)
+    report = islandReport(directory, nIslands)
+    for entry in report['islands']:
+        if 'bestFitness' in entry:
+            print(f"island{entry['island']}: best fitness {entry['bestFitness']:.6g} (generation {entry['bestGeneration']})")
+    if report['best'] is not None:
+        print(f"Best solution : island{report['best']['island']}, fitness {report['best']['bestFitness']}")
+        print(f"Parameters of the best solution : {report['best']['bestSolution']}")
+    return report
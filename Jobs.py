@@ -0,0 +1,269 @@
+"""OPTIMISATION STUDIES"""
+# Runs many GA studies from one job spec (JSON, or TOML on Python 3.11+), sharing a fixed
+# core budget between them. Each study runs in its own process with its own pool of
+# evaluation workers and writes everything into its own output directory:
+#
+#     <output>/<job name>/
+#         <job name>.pkl   pygad run          history/     RunHistory chunks and checkpoints
+#         progress.json    live progress      result.json  best genes, fitness and polar metrics
+#         log.txt          study output       best.dat     best foil coordinates
+#
+# Spec:
+#     {"output": "studies", "cores": 16, "cache": "polarCache.sqlite",
+#      "defaults": {"generations": 100, "population": 50, "Re": 1e6, "alpha": [-5, 15, 1]},
+#      "jobs": [{"name": "cruise", "objective": "LDmax", "Re": 3e6},
+#               {"name": "climb", "objective": "LDatCL", "targetCL": 0.8, "parametrization": "BEZIER", "workers": 4}]}
+#
+# Job keys (any of them may also go in "defaults"):
+#     name            output directory name (required)
+#     parametrization 'PARSEC' (default) or 'BEZIER'
+#     objective       'LDmax' (default), 'CLmax', 'CDmin' (fitness 1/CDmin) or 'LDatCL' (needs targetCL)
+#     Re, alpha       Reynolds number and [start, end, step] alpha sweep
+#     gene_space      pygad gene space (default: the parametrization's standard space)
+#     generations, population, workers (evaluation processes, default an equal share of the cores)
+#     resume          continue from the study's last checkpoint
+#     stall, refine   stop after `stall` generations without improvement and polish the best shape
+#                     with LocalSearch ('L-BFGS-B' or 'SLSQP'), as GATools.runGA's hybrid mode
+#     adaptive        adaptive alpha sweep (Airfoil.runAirfoil), off by default
+
+import os
+import sys
+import json
+import time
+import multiprocessing
+from collections import deque
+from functools import partial
+
+import numpy as np
+
+import Airfoil
+import GATools
+from PARSEC.Parsec import PARSECfoil, PARSECbatch, PARSEC_GENE_SPACE
+from BEZIER.Bezier import BEZIERfoil, BEZIERbatch, BEZIER_GENE_SPACE
+from Evaluator import PoolEvaluator
+from History import RunHistory
+from PolarCache import PolarCache
+from Screening import Screener
+
+
+OBJECTIVES = ('LDmax', 'CLmax', 'CDmin', 'LDatCL')
+
+JOB_DEFAULTS = {'parametrization': 'PARSEC', 'objective': 'LDmax', 'Re': 1e6, 'alpha': [-5, 15, 1],
+                'generations': 100, 'population': 50, 'workers': None, 'targetCL': None, 'resume': False,
+                'stall': None, 'refine': None, 'adaptive': False}
+
+
+def loadSpec(fileName):
+    # Returns the spec dict from a .json or .toml file
+    if fileName.endswith('.toml'):
+        import tomllib
+        with open(fileName, 'rb') as f:
+            return tomllib.load(f)
+    with open(fileName) as f:
+        return json.load(f)
+
+
+def resolveJobs(spec):
+    # Returns the spec's jobs with defaults filled in and their gene spaces set
+    jobs = []
+    for job in spec['jobs']:
+        job = {**JOB_DEFAULTS, **spec.get('defaults', {}), **job}
+        if job['objective'] not in OBJECTIVES:
+            raise ValueError(f"{job['name']}: unknown objective '{job['objective']}' (expected one of {OBJECTIVES})")
+        if job['objective'] == 'LDatCL' and job['targetCL'] is None:
+            raise ValueError(f"{job['name']}: objective 'LDatCL' needs a targetCL")
+        if 'gene_space' not in job:
+            job['gene_space'] = PARSEC_GENE_SPACE if job['parametrization'] == 'PARSEC' else BEZIER_GENE_SPACE
+        jobs.append(job)
+    return jobs
+
+
+def LDatCL(polar, targetCL):
+    # L/D at targetCL, interpolated along the polar's pre-stall branch (NaN outside it)
+    if polar is None or not len(polar):
+        return np.nan
+    branch = slice(0, int(np.argmax(polar.CL)) + 1)
+    CL, CLCD = polar.CL[branch], polar.CLCD[branch]
+    if not CL[0] <= targetCL <= CL[-1] or np.any(np.diff(CL) <= 0):
+        return np.nan
+    return float(np.interp(targetCL, CL, CLCD))
+
+
+class StudyFitness:
+    # Per-candidate fitness for a study, picklable for Evaluator.PoolEvaluator workers
+    # (solution, foilName, workDir) -> (fitness, polar metrics), fitness 0 for failed or non-converged candidates
+
+    def __init__(self, parametrization, objective, Re, alpha, targetCL=None, cache=None, adaptive=False):
+        self.parametrization = parametrization
+        self.objective = objective
+        self.Re = Re
+        self.alpha = alpha
+        self.targetCL = targetCL
+        self.cache = cache
+        self.adaptive = adaptive
+
+    def geometry(self, solution):
+        if self.parametrization == 'PARSEC':
+            return PARSECfoil(solution)
+        return BEZIERfoil(solution, 16)
+
+    def polar(self, solution, foilName, workDir=None):
+        X, Y = self.geometry(solution)
+        return Airfoil.runAirfoil(X, Y, foilName, self.Re, *self.alpha, iterative='alpha', workDir=workDir,
+                                  cache=self.cache, adaptive=self.adaptive)
+
+    def metrics(self, polar):
+        metrics = Airfoil.polarMetrics(polar)
+        if self.targetCL is not None:
+            metrics['LDatCL'] = LDatCL(polar, self.targetCL)
+        return metrics
+
+    def __call__(self, solution, foilName, workDir=None):
+        try:
+            metrics = self.metrics(self.polar(solution, foilName, workDir))
+        except Exception as ex:
+            print(f"{foilName} Failed | {ex} | FITNESS = 0")
+            return 0, self.metrics(None)
+
+        fitness = metrics[self.objective]
+        if self.objective == 'CDmin':
+            fitness = 1 / fitness
+        return (float(fitness) if np.isfinite(fitness) else 0), metrics
+
+
+def _writeJSON(fileName, data):
+    tmpName = fileName + '.tmp'
+    with open(tmpName, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmpName, fileName)
+
+
+class ProgressWriter:
+    # pygad on_generation callback keeping <output>/progress.json up to date
+
+    def __init__(self, fileName, numGenerations):
+        self.fileName = fileName
+        self.numGenerations = numGenerations
+        self.start = time.time()
+
+    def __call__(self, ga_instance):
+        _writeJSON(self.fileName, {'generation': ga_instance.generations_completed,
+                                   'generations': self.numGenerations,
+                                   'bestFitness': float(np.max(ga_instance.last_generation_fitness)),
+                                   'elapsed': time.time() - self.start})
+
+
+def runStudy(job, outputDir, workers, cachePath):
+    # Runs one study (in its own process, see Scheduler) and writes its result files
+    os.makedirs(outputDir, exist_ok=True)
+    log = open(os.path.join(outputDir, 'log.txt'), 'a', buffering=1)
+    sys.stdout = sys.stderr = log
+
+    name = os.path.join(outputDir, job['name'])
+    fitness = StudyFitness(job['parametrization'], job['objective'], job['Re'], job['alpha'], job['targetCL'],
+                           PolarCache(cachePath), job['adaptive'])
+    if job['parametrization'] == 'PARSEC':
+        geometry, screener = PARSECbatch, Screener(rLEGene=0)
+    else:
+        geometry, screener = partial(BEZIERbatch, numPoints=16), Screener()
+
+    with PoolEvaluator(fitness, nWorkers=workers, geometry=geometry, screener=screener) as evaluator:
+        ga_instance = GATools.runGA(job['gene_space'], evaluator, name, fitnessBatchSize=job['population'],
+                                    numGenerations=job['generations'], solPerPop=job['population'],
+                                    onGeneration=ProgressWriter(os.path.join(outputDir, 'progress.json'), job['generations']),
+                                    history=RunHistory(os.path.join(outputDir, 'history')), resume=job['resume'], plot=False,
+                                    stallGenerations=job['stall'], refine=job['refine'])
+    if ga_instance is None:
+        import pygad
+        ga_instance = pygad.load(name)
+
+    solution, solutionFitness = GATools.bestSolution(ga_instance)
+    X, Y = fitness.geometry(solution)
+    Airfoil.createDATFile(X, Y, 'best', outputDir)
+    result = {'job': job,
+              'bestSolution': [float(gene) for gene in solution],
+              'bestFitness': float(solutionFitness),
+              'metrics': evaluator.metrics.get(tuple(solution))}
+    if not result['metrics']:
+        # Refined or already finished runs: the best foil is solved again, and a failure is
+        # recorded rather than losing the finished study
+        try:
+            result['metrics'] = fitness.metrics(fitness.polar(solution, 'best'))
+        except Exception as ex:
+            print(f"best Failed | {ex}")
+            result['metrics'] = fitness.metrics(None)
+            result['error'] = f"{type(ex).__name__}: {ex}"
+    _writeJSON(os.path.join(outputDir, 'result.json'), result)
+    log.close()
+
+
+class Scheduler:
+    # Starts studies while their evaluation workers fit in the core budget (a study asking for
+    # more than the whole budget is capped to it and runs alone), and reports their progress
+    #
+    # spec         : job spec dict (see the top of this module)
+    # cores        : core budget (None for the spec's "cores", else every core)
+    # pollInterval : seconds between progress reports
+
+    def __init__(self, spec, cores=None, pollInterval=10):
+        self.output = spec.get('output', 'studies')
+        self.cores = cores or spec.get('cores') or os.cpu_count()
+        self.cachePath = spec.get('cache', os.path.join(self.output, 'polarCache.sqlite'))
+        self.pollInterval = pollInterval
+        self.jobs = resolveJobs(spec)
+
+        share = max(1, self.cores // len(self.jobs)) if self.jobs else 1
+        for job in self.jobs:
+            job['workers'] = min(job['workers'] or share, self.cores)
+        self.status = {job['name']: {'state': 'pending'} for job in self.jobs}
+
+    def progress(self, job):
+        fileName = os.path.join(self.output, job['name'], 'progress.json')
+        try:
+            with open(fileName) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def report(self):
+        lines = []
+        for job in self.jobs:
+            status = self.status[job['name']]
+            line = f"{job['name']}: {status['state']}"
+            progress = self.progress(job) if status['state'] in ('running', 'done') else None
+            if progress:
+                line += f" - generation {progress['generation']}/{progress['generations']}, best {progress['bestFitness']:.4g}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def run(self):
+        os.makedirs(self.output, exist_ok=True)
+        pending = deque(self.jobs)
+        running = {}
+        free = self.cores
+
+        while pending or running:
+            while pending and (not running or pending[0]['workers'] <= free):
+                job = pending.popleft()
+                process = multiprocessing.Process(target=runStudy, name=job['name'],
+                                                  args=(job, os.path.join(self.output, job['name']), job['workers'], self.cachePath))
+                process.start()
+                running[job['name']] = (process, job)
+                free -= job['workers']
+                self.status[job['name']] = {'state': 'running', 'workers': job['workers'], 'start': time.time()}
+
+            time.sleep(self.pollInterval if running else 0)
+            for jobName, (process, job) in list(running.items()):
+                if process.exitcode is None:
+                    continue
+                process.join()
+                del running[jobName]
+                free += job['workers']
+                status = self.status[jobName]
+                status['state'] = 'done' if process.exitcode == 0 else f"failed (exit code {process.exitcode})"
+                status['elapsed'] = time.time() - status['start']
+
+            print(f"--- {time.strftime('%H:%M:%S')} | {len(running)} running, {len(pending)} pending\n{self.report()}", flush=True)
+
+        _writeJSON(os.path.join(self.output, 'summary.json'), self.status)
+        return self.status
@@ -0,0 +1,143 @@
+"""LOCAL REFINEMENT"""
+# Gradient-based polishing of a GA result. Once the GA has stalled, its best gene vector
+# is handed to a bounded scipy optimiser (L-BFGS-B or SLSQP) working in genes normalised
+# to their gene_space ranges. Each optimiser step asks for the fitness and its forward
+# finite-difference gradient together: the point is solved first, and only if it succeeds
+# do the n steps along each free gene go to the batch evaluator, as a single batch, so on a
+# PoolEvaluator the whole gradient costs about two XFOIL runs of wall time. Steps that land
+# on a failed shape are retried on the other side in a third, smaller batch. The optimiser
+# is bounded by its function-evaluation limit and stopped from its callback; the best shape
+# seen is kept here rather than taken from its result.
+#
+# Usage:
+#     GATools.runGA(..., stallGenerations=10, refine='L-BFGS-B')
+
+import numpy as np
+from scipy.optimize import minimize
+
+from Surrogate import geneBounds
+
+
+METHODS = ('L-BFGS-B', 'SLSQP')
+
+
+class Refinement:
+    # evaluator      : Evaluator batch evaluator (evaluate(solutions, foilNames) -> fitness, metrics)
+    # gene_space     : pygad gene space; genes with a single allowed value are held fixed
+    # step           : finite-difference step as a share of each gene's range; XFOIL results are
+    #                  only converged to a few digits, so much smaller steps give noise, not slopes
+    # maxEvaluations : solver budget (candidate evaluations) for the refinement
+    # patience       : optimiser iterations without a better shape before giving up
+    #
+    # Shapes closer than step / 100 (normalised) to one already solved reuse its fitness, so that a
+    # line search shrinking its step below the noise floor stops costing XFOIL runs.
+
+    def __init__(self, evaluator, gene_space, step=0.01, maxEvaluations=300, patience=3):
+        self.evaluator = evaluator
+        self.low, self.high = geneBounds(gene_space)
+        self.free = self.high > self.low
+        self.step = step
+        self.maxEvaluations = maxEvaluations
+        self.patience = patience
+        self.stalled = 0
+        self.lastBest = -np.inf
+        self.evaluations = 0
+        self.steps = 0
+        self.bestGenes = None
+        self.bestFitness = -np.inf
+        self.seen = {}
+
+    def genes(self, u, base):
+        # Gene vector from the normalised free genes u
+        genes = base.copy()
+        genes[self.free] = self.low[self.free] + u * (self.high[self.free] - self.low[self.free])
+        return genes
+
+    def key(self, genes):
+        span = np.where(self.free, self.high - self.low, 1.0)
+        return tuple(np.round((genes - self.low) / span / (self.step / 100)).astype(int))
+
+    def evaluateBatch(self, batch):
+        # Fitness of each row of batch, solving only rows not evaluated before
+        keys = [self.key(genes) for genes in batch]
+        new = [i for i, key in enumerate(keys) if key not in self.seen]
+        if new:
+            names = [f"Refine{self.steps}Sol{i}" for i in range(len(new))]
+            fitness, _ = self.evaluator.evaluate(batch[new], names)
+            self.evaluations += len(new)
+            for i, value in zip(new, fitness):
+                self.seen[keys[i]] = float(value)
+                if value > self.bestFitness:
+                    self.bestGenes, self.bestFitness = batch[i].copy(), float(value)
+        return np.array([self.seen[key] for key in keys])
+
+    def objective(self, u, base):
+        # Negative fitness and its gradient in normalised genes
+        self.steps += 1
+        n = len(u)
+        gradient = np.zeros(n)
+        genes = self.genes(u, base)
+        if self.evaluations >= self.maxEvaluations and self.key(genes) not in self.seen:
+            # Out of budget: reported as a failed shape, so the line search backs off until
+            # the callback stops the optimiser
+            return 0.0, gradient
+        fitness = self.evaluateBatch(genes[None])[0]
+
+        # A failed or rejected point (fitness 0) has no slope worth n solves; the line search
+        # backs away from it. Past the budget, a zero gradient ends the optimiser's search
+        if fitness > 0 and self.evaluations + n <= self.maxEvaluations:
+            # Step backwards where a forward step would leave the bounds
+            h = np.where(u + self.step <= 1, self.step, -self.step)
+            steps = self.evaluateBatch(np.array([self.genes(point, base) for point in u + np.diag(h)]))
+            gradient = (steps - fitness) / h
+
+            # A step onto a failed shape says nothing about the slope: retry those genes on the
+            # other side, and hold a gene still if both sides fail
+            failed = np.flatnonzero(steps <= 0)
+            if len(failed):
+                points = u + np.diag(-h)[failed]
+                retry = self.evaluateBatch(np.array([self.genes(point, base) for point in points]))
+                gradient[failed] = np.where(retry > 0, (retry - fitness) / -h[failed], 0)
+        print(f"REFINE step {self.steps}: fitness {fitness:.6g}, |gradient| {np.linalg.norm(gradient):.3g}, "
+              f"{self.evaluations} evaluations")
+        return -fitness, -gradient
+
+    def callback(self, intermediate_result):
+        # Stops the optimiser (scipy ends minimize on StopIteration from its callback) once the
+        # budget is spent or the best shape has not improved for patience iterations
+        self.stalled = self.stalled + 1 if self.bestFitness <= self.lastBest else 0
+        self.lastBest = self.bestFitness
+        if self.stalled >= self.patience:
+            print(f"REFINE: no improvement in {self.patience} iterations")
+            raise StopIteration
+        if self.evaluations + self.free.sum() + 1 > self.maxEvaluations:
+            print(f"REFINE: evaluation budget of {self.maxEvaluations} reached")
+            raise StopIteration
+
+    def run(self, solution, fitness=None, method='L-BFGS-B'):
+        # solution : starting gene vector (e.g. the GA's best solution)
+        # fitness  : its known fitness, so that the result is never worse than the start
+        # Returns the best (genes, fitness) found
+        if method not in METHODS:
+            raise ValueError(f"Unknown refinement method '{method}' (expected one of {METHODS})")
+        base = np.asarray(solution, dtype=float)
+        if fitness is not None:
+            self.seen[self.key(base)] = float(fitness)
+            self.bestGenes, self.bestFitness = base.copy(), float(fitness)
+
+        span = self.high[self.free] - self.low[self.free]
+        u0 = np.clip((base[self.free] - self.low[self.free]) / span, 0, 1)
+        self.lastBest = self.bestFitness
+        # Every objective call solves at least one shape, so the budget also bounds the calls
+        options = {'maxfun': self.maxEvaluations} if method == 'L-BFGS-B' else {'maxiter': self.maxEvaluations}
+        minimize(self.objective, u0, args=(base,), jac=True, method=method, bounds=[(0, 1)] * len(u0),
+                 callback=self.callback, options=options)
+        return self.bestGenes, self.bestFitness
+
+
+def refine(evaluator, gene_space, solution, fitness=None, method='L-BFGS-B', step=0.01, maxEvaluations=300, patience=3):
+    # Runs a Refinement from solution; returns (genes, fitness, solver evaluations used)
+    refinement = Refinement(evaluator, gene_space, step, maxEvaluations, patience)
+    genes, bestFitness = refinement.run(solution, fitness, method)
+    print(f"REFINE: fitness {fitness} -> {bestFitness} in {refinement.steps} steps, {refinement.evaluations} evaluations")
+    return genes, bestFitness, refinement.evaluations
@@ -0,0 +1,149 @@
+"""MULTI-FIDELITY EVALUATION"""
+# Two XFOIL resolutions per generation. Every candidate is first solved cheaply (a few
+# angles of attack, a coarse panelling and a low iteration limit, see main.CHEAP_SWEEP),
+# and only the best share of that ranking is solved again at full fidelity. Candidates
+# that stay cheap get their cheap fitness mapped onto the full-fidelity scale by a linear
+# fit over every candidate solved both ways, capped at the lowest full-fidelity fitness of
+# the batch so that they never outrank a fully solved candidate (a batch with no successful
+# full-fidelity run keeps the previous fit and cap). Each batch reports how well the two
+# fidelities agree on the ranking of the candidates solved both ways.
+#
+# Usage:
+#     python main.py optimize --multi-fidelity 0.2
+
+import time
+
+import numpy as np
+
+import Instrumentation
+from Surrogate import rankCorrelation
+
+
+class MultiFidelityEvaluator:
+    # Wraps two batch evaluators (Evaluator.PoolEvaluator/SerialEvaluator) for pygad's fitness_batch_size hook.
+    #
+    # cheap        : batch evaluator solving every candidate at low fidelity
+    # full         : batch evaluator for the promoted candidates, at full fidelity (no screener needed,
+    #                the cheap pass has screened them)
+    # fullFraction : share of each batch promoted to full fidelity, best cheap fitness first
+    # minFull      : candidates promoted per batch at least
+    # maxPairs     : (cheap, full) fitness pairs kept for the calibration (the most recent)
+
+    def __init__(self, cheap, full, fullFraction=0.2, minFull=2, maxPairs=1000):
+        self.cheap = cheap
+        self.full = full
+        self.fullFraction = fullFraction
+        self.minFull = minFull
+        self.maxPairs = maxPairs
+        self.cheapFitness = np.empty(0)
+        self.fullFitness = np.empty(0)
+        self.cap = None
+        self.history = []
+
+    @property
+    def nWorkers(self):
+        return self.cheap.nWorkers
+
+    def start(self):
+        self.cheap.start()
+        self.full.start()
+
+    def close(self):
+        self.cheap.close()
+        self.full.close()
+
+    def calibration(self):
+        # (slope, intercept) mapping cheap onto full fitness, identity until there are enough pairs
+        if len(self.cheapFitness) < 3 or np.ptp(self.cheapFitness) == 0:
+            return 1.0, 0.0
+        slope, intercept = np.polyfit(self.cheapFitness, self.fullFitness, 1)
+        if slope <= 0:
+            # No usable relation yet, keep the cheap ranking
+            return 1.0, 0.0
+        return slope, intercept
+
+    def evaluate(self, solutions, foilNames):
+        # Full-fidelity evaluation, for LocalSearch refinement
+        return self.full.evaluate(solutions, foilNames)
+
+    def __call__(self, ga_instance, solutions, solutions_indices):
+        solutions = np.asarray(solutions)
+        if solutions_indices is None:
+            solutions_indices = list(range(len(solutions)))
+
+        start = time.perf_counter()
+        cheapFitness = np.asarray(self.cheap(ga_instance, solutions, solutions_indices), dtype=float)
+        cheapTime = time.perf_counter() - start
+
+        # Failed and screened-out candidates (fitness <= 0) are not worth a full-fidelity run
+        nFull = max(self.minFull, int(round(self.fullFraction * len(solutions))))
+        ranked = [i for i in np.argsort(cheapFitness)[::-1] if cheapFitness[i] > 0]
+        chosen = np.array(sorted(ranked[:nFull]), dtype=int)
+
+        start = time.perf_counter()
+        fullFitness = np.empty(0)
+        if len(chosen):
+            Instrumentation.report(f"FULL FIDELITY: {len(chosen)} of {len(solutions)} candidates")
+            fullFitness = np.asarray(self.full(ga_instance, solutions[chosen], [solutions_indices[i] for i in chosen]),
+                                     dtype=float)
+        fullTime = time.perf_counter() - start
+
+        solved = fullFitness > 0
+        self.cheapFitness = np.concatenate((self.cheapFitness, cheapFitness[chosen][solved]))[-self.maxPairs:]
+        self.fullFitness = np.concatenate((self.fullFitness, fullFitness[solved]))[-self.maxPairs:]
+        if solved.any():
+            self.cap = fullFitness[solved].min()
+
+        slope, intercept = self.calibration()
+        cheapOnly = cheapFitness > 0
+        cheapOnly[chosen] = False
+        fitness = cheapFitness.copy()
+        fitness[cheapOnly] = np.maximum(slope * cheapFitness[cheapOnly] + intercept, 0)
+        if self.cap is not None:
+            fitness[cheapOnly] = np.minimum(fitness[cheapOnly], self.cap)
+        fitness[chosen] = fullFitness
+        self.forgetFullMetrics(ga_instance, solutions[cheapOnly], solutions[chosen])
+
+        self.history.append({'generation': ga_instance.generations_completed,
+                             'candidates': len(solutions),
+                             'full': len(chosen),
+                             'cheapTime': cheapTime,
+                             'fullTime': fullTime,
+                             'rankCorrelation': float(rankCorrelation(cheapFitness[chosen][solved], fullFitness[solved])),
+                             'overallRankCorrelation': float(rankCorrelation(self.cheapFitness, self.fullFitness))})
+        Instrumentation.report(self.report())
+        return list(fitness)
+
+    def forgetFullMetrics(self, ga_instance, cheapSolutions, fullSolutions):
+        # Keeps the full evaluator's metrics to the population, and drops those of shapes that were
+        # solved at full fidelity before but only cheaply this time (their fitness now comes from the
+        # cheap run); the full evaluator only prunes them itself in generations it is called in
+        population = {tuple(solution) for solution in ga_instance.population}
+        promoted = {tuple(solution) for solution in fullSolutions}
+        stale = {tuple(solution) for solution in cheapSolutions} - promoted
+        self.full.metrics = {key: row for key, row in self.full.metrics.items()
+                             if (key in population or key in promoted) and key not in stale}
+
+    def summary(self, ga_instance):
+        # Polar metrics of the full-fidelity run where there was one, else of the cheap run, and
+        # a fullFidelity flag (1 or 0) per candidate
+        population = ga_instance.population
+        cheap = self.cheap.populationMetrics(population)
+        full = self.full.populationMetrics(population)
+        fullFidelity = np.array([tuple(solution) in self.full.metrics for solution in population])
+        metrics = {name: np.where(fullFidelity, full.get(name, np.nan), values) for name, values in cheap.items()}
+        metrics['fullFidelity'] = fullFidelity.astype(float)
+        return metrics
+
+    def report(self):
+        last = self.history[-1]
+        return f"MULTI-FIDELITY: {last['full']}/{last['candidates']} candidates at full fidelity - cheap pass " \
+               f"{last['cheapTime']:.1f} s, full pass {last['fullTime']:.1f} s - rank correlation {last['rankCorrelation']:.2f} " \
+               f"this batch, {last['overallRankCorrelation']:.2f} over {len(self.cheapFitness)} pairs"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -5,6 +5,22 @@
 import numpy as np
 from math import tan, sqrt, pi
 
+# pygad gene space of the PARSEC GA, one {'low', 'high'} range per parameter
+PARSEC_GENE_SPACE = [
+    {'low': 0.01, 'high': 0.03},    # p1  - rLE Leading-edge radius
+    {'low': 0.1, 'high': 0.7},      # p2  - XS Upper crest position in horizontal coordinates
+    {'low': 0.03, 'high': 0.1},     # p3  - ZS Upper crest position in vertical coordinates
+    {'low': -0.6, 'high': -0.2},    # p4  - ZXX,S Upper crest curvature
+    {'low': 0.1, 'high': 0.7},      # p5  - XP Lower crest position in horizontal coordinates
+    {'low': -0.03, 'high': -0.1},   # p6  - ZP Lower crest position in vertical coordinates
+    {'low': 0.2, 'high': 0.6},      # p7  - ZXX,P Lower crest curvature
+    {'low': 0, 'high': 0.025},      # p8  - ZT E Trailing-edge offset
+    {'low': 0, 'high': 0.005},      # p9  - ∆ZT E Trailing-edge thickness
+    {'low': -5, 'high': 5},         # p10 - αT E Trailing-edge direction
+    {'low': 0, 'high': 5}           # p11 - βT E Trailing-edge wedge angle
+]
+
+
 def createPMatrix(pArr):
     # pArr = [p1, p2, p3... p10, p11]
     # p1  - rLE Leading-edge radius
@@ -115,26 +131,64 @@ def asuct(pMatrix):
 
 """CURVE GENERATION"""
 def PARSECfoil(pMatrix, xArr=np.linspace(0, 1, 75)):
-    asuction = asuct(pMatrix)
-    apressure = apress(pMatrix)
+    X, Y = PARSECbatch(np.reshape(pMatrix, (1, -1)), xArr)
+
+    return X[0], Y[0]
+
+
+"""BATCH CURVE GENERATION"""
+# Exponents of the six PARSEC polynomial terms in the Csuction/Cpressure systems
+halfPowers = np.arange(1, 12, 2) / 2
+
+# Exponents (i+1)/2 the surfaces have always been evaluated with
+basisPowers = np.arange(1, 7) / 2
+
+# Row 4 of Csuction/Cpressure uses p**(11/2) in its last column; the batch system keeps it
+# so that batch and single-foil geometry (and saved GA runs) stay identical
+slopePowers = np.array([-1/2, 1/2, 3/2, 5/2, 7/2, 11/2])
+
+basisCache = {}
+
+def cosineSpacing(nPoints):
+    # x-grid clustered at the leading and trailing edges
+    return 0.5 * (1 - np.cos(np.linspace(0, pi, nPoints)))
+
+def halfPowerBasis(xArr):
+    # (M, 6) matrix of xArr**((i+1)/2), computed once per x-grid
+    xArr = np.asarray(xArr, dtype=float)
+    key = xArr.tobytes()
+    if key not in basisCache:
+        basisCache[key] = xArr[:, None] ** basisPowers
+    return basisCache[key]
+
+def PARSECbatch(pMatrix, xArr=np.linspace(0, 1, 75)):
+    # pMatrix : (N, 11) array of PARSEC vectors
+    # xArr    : chordwise grid shared by both surfaces (see cosineSpacing)
+    # Returns (N, 2M) X and Y arrays, from the trailing edge over the upper surface to the leading edge and back
+    pMatrix = np.asarray(pMatrix, dtype=float)
+    p1, p3, p4, p6, p7, p8, p9, p10, p11 = pMatrix[:, [0, 2, 3, 5, 6, 7, 8, 9, 10]].T
+    nFoils = len(pMatrix)
 
-    # Upper (suction) surface
-    upperSurface = np.zeros_like(xArr)
-    for i, coeff in enumerate(asuction):
-        upperSurface += coeff * xArr**((i+1)/2)
+    # Stacked suction/pressure systems, shape (N, 2, 6, 6)
+    xCrest = pMatrix[:, [1, 4]][:, :, None]
+    C = np.zeros((nFoils, 2, 6, 6))
+    C[:, :, 0, :] = 1
+    C[:, :, 1, :] = xCrest**halfPowers
+    C[:, :, 2, :] = halfPowers
+    C[:, :, 3, :] = halfPowers * xCrest**slopePowers
+    C[:, :, 4, :] = halfPowers * (halfPowers - 1) * xCrest**(halfPowers - 2)
+    C[:, :, 5, 0] = 1
 
-    # Lower (pressure) surface
-    lowerSurface = np.zeros_like(xArr)
-    for i, coeff in enumerate(apressure):
-        lowerSurface += coeff * xArr**((i+1)/2)
+    b = np.zeros((nFoils, 2, 6))
+    b[:, 0] = np.column_stack((p8 + p9/2, p3, np.tan((p10 - p11/2) * pi/180), np.zeros(nFoils), p4, np.sqrt(2*p1)))
+    b[:, 1] = np.column_stack((p8 - p9/2, p6, np.tan((p10 + p11/2) * pi/180), np.zeros(nFoils), p7, -np.sqrt(p1)))
 
-    # Adjust for x, y coordinates
-    upperSurface = np.flip(upperSurface)
+    a = np.linalg.solve(C, b[..., None])[..., 0]
 
-    yAirfoil = np.concatenate((upperSurface, lowerSurface))
+    # Surfaces on the shared grid, shape (N, 2, M)
+    surfaces = a @ halfPowerBasis(xArr).T
 
-    xTE = np.linspace(1, 0, len(upperSurface))
-    xLE = np.linspace(0, 1, len(lowerSurface))
-    xAirfoil = np.concatenate((xTE, xLE))
+    yAirfoil = np.concatenate((np.flip(surfaces[:, 0], axis=1), surfaces[:, 1]), axis=1)
+    xAirfoil = np.tile(np.concatenate((np.flip(xArr), xArr)), (nFoils, 1))
 
     return xAirfoil, yAirfoil
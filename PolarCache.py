@@ -0,0 +1,159 @@
+"""POLAR CACHE"""
+# Content-addressed cache for XFOIL polars. Keys hash the coordinates (quantised to the
+# precision written to the .dat file) together with Re and the sweep. Polars are kept in
+# an SQLite store on disk with an in-memory LRU in front of it; both are size bounded.
+# Failed runs are kept apart, on disk only and for failureTTL seconds: a failure may be a
+# timeout on a busy machine rather than a shape that cannot converge.
+
+import os
+import time
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from xfoil import AirfoilPolar
+
+
+def polarKey(X, Y, Re, iterative, iterStart, iterEnd, iterStep, decimals=5):
+    # X, Y      : foil coordinates
+    # decimals  : coordinate quantisation (createDATFile writes 5 decimals)
+    coords = np.round(np.column_stack((X, Y)).astype(np.float64), decimals) + 0.0    # + 0.0 folds -0.0 into 0.0
+    key = hashlib.sha1(coords.tobytes())
+    key.update(repr((float(Re), iterative, float(iterStart), float(iterEnd), float(iterStep))).encode())
+    return key.hexdigest()
+
+
+def polarToBytes(polar):
+    # Columns stored one after the other: (7, n) float64
+    if polar is None:
+        return None
+    return np.ascontiguousarray(polar.data.T).tobytes()
+
+
+def polarFromBytes(data):
+    if data is None:
+        return None
+    return AirfoilPolar.fromArray(np.frombuffer(data, dtype=np.float64).reshape(7, -1).T)
+
+
+class PolarCache:
+    # path          : SQLite file for the persistent store
+    # memoryEntries : polars kept in the in-memory LRU
+    # maxEntries    : polars kept on disk; the least recently used are evicted beyond this
+    # failureTTL    : seconds a failed run (polar None) is remembered, so that a non-converging shape
+    #                 is not retried straight away; None to never cache failures
+    #
+    # The row count is read once per connection and tracked from this process's inserts, and only
+    # recounted when the tracked count passes maxEntries; with several writing processes the bound
+    # is therefore approximate between recounts.
+
+    def __init__(self, path='polarCache.sqlite', memoryEntries=1024, maxEntries=100000, failureTTL=3600):
+        self.path = path
+        self.memoryEntries = memoryEntries
+        self.maxEntries = maxEntries
+        self.failureTTL = failureTTL
+        self.rows = 0
+        self.memory = OrderedDict()
+        self.memoryHits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = None
+        self.connectionPid = None
+
+    def connect(self):
+        # One connection per process, so that forked pool workers never share a handle
+        if self.connection is None or self.connectionPid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS polars (key TEXT PRIMARY KEY, data BLOB, lastUsed REAL, failedAt REAL)")
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(polars)")]
+            if 'failedAt' not in columns:
+                # Store from before failures expired: drop its failures rather than keep them forever
+                self.connection.execute("ALTER TABLE polars ADD COLUMN failedAt REAL")
+                self.connection.execute("DELETE FROM polars WHERE data IS NULL")
+            self.connection.commit()
+            self.connectionPid = os.getpid()
+            self.rows = self.connection.execute("SELECT COUNT(*) FROM polars").fetchone()[0]
+        return self.connection
+
+    def close(self):
+        if self.connection is not None and self.connectionPid == os.getpid():
+            self.connection.close()
+        self.connection = None
+
+    def remember(self, key, polar):
+        self.memory[key] = polar
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memoryEntries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        # Returns (hit, polar)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memoryHits += 1
+            return True, self.memory[key]
+
+        connection = self.connect()
+        row = connection.execute("SELECT data, failedAt FROM polars WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and not self.failureValid(row[1])):
+            self.misses += 1
+            return False, None
+        if row[1] is not None:
+            self.diskHits += 1
+            return True, None
+
+        connection.execute("UPDATE polars SET lastUsed = ? WHERE key = ?", (time.time(), key))
+        connection.commit()
+        polar = polarFromBytes(row[0])
+        self.remember(key, polar)
+        self.diskHits += 1
+        return True, polar
+
+    def failureValid(self, failedAt):
+        return self.failureTTL is not None and time.time() - failedAt < self.failureTTL
+
+    def put(self, key, polar):
+        if polar is None and self.failureTTL is None:
+            return
+        if polar is not None:
+            self.remember(key, polar)
+
+        connection = self.connect()
+        now = time.time()
+        connection.execute("INSERT OR REPLACE INTO polars (key, data, lastUsed, failedAt) VALUES (?, ?, ?, ?)",
+                           (key, polarToBytes(polar), now, None if polar is not None else now))
+        connection.commit()
+        self.rows += 1
+
+        if self.rows > self.maxEntries:
+            # Replaced keys and other processes' inserts make the tracked count approximate
+            self.rows = connection.execute("SELECT COUNT(*) FROM polars").fetchone()[0]
+        if self.rows > self.maxEntries:
+            # Expired failures first, then the least recently used, down to 90 % of the bound so
+            # that this is not repeated on the next inserts
+            if self.failureTTL is not None:
+                connection.execute("DELETE FROM polars WHERE failedAt < ?", (now - self.failureTTL,))
+            excess = connection.execute("SELECT COUNT(*) FROM polars").fetchone()[0] - int(0.9 * self.maxEntries)
+            if excess > 0:
+                connection.execute("DELETE FROM polars WHERE key IN (SELECT key FROM polars ORDER BY lastUsed LIMIT ?)", (excess,))
+            connection.commit()
+            self.rows = connection.execute("SELECT COUNT(*) FROM polars").fetchone()[0]
+            self.evictions += max(excess, 0)
+
+    def stats(self):
+        lookups = self.memoryHits + self.diskHits + self.misses
+        return {'memoryHits': self.memoryHits,
+                'diskHits': self.diskHits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': (self.memoryHits + self.diskHits) / lookups if lookups else 0.0}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['connectionPid'] = None
+        return state
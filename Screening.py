@@ -0,0 +1,185 @@
+"""GEOMETRIC PRE-SCREENING"""
+# Cheap validity checks on foil coordinates, run before a candidate is sent to XFOIL.
+# Shapes that fail get a penalty fitness straight away instead of a full viscous sweep
+# that would not converge anyway.
+
+import numpy as np
+
+
+def batchInterp(xq, xp, fp):
+    # Row-wise np.interp: xq (N, G) query points, xp (N, K) ascending sample points, fp (N, K)
+    # values; clamped to the end values outside each row's range like np.interp. The rows are
+    # shifted apart so that one searchsorted over the flattened samples serves them all
+    nRows, K = xp.shape
+    low = np.minimum(xp.min(), xq.min())
+    shift = (np.maximum(xp.max(), xq.max()) - low + 1) * np.arange(nRows)[:, None]
+    flat = (xp - low + shift).ravel()
+    index = np.searchsorted(flat, (xq - low + shift).ravel(), side='right').reshape(xq.shape) - 1
+    index = np.clip(index - K * np.arange(nRows)[:, None], 0, K - 2)
+    x0, x1 = np.take_along_axis(xp, index, axis=1), np.take_along_axis(xp, index + 1, axis=1)
+    f0, f1 = np.take_along_axis(fp, index, axis=1), np.take_along_axis(fp, index + 1, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.where(x1 > x0, (xq - x0) / (x1 - x0), 0), 0, 1)
+    return f0 + t * (f1 - f0)
+
+
+def leadingEdgeGroups(X):
+    # (leading-edge index, rows) pairs; PARSECbatch/BEZIERbatch output has a single group
+    le = np.argmin(X, axis=1)
+    return [(index, np.flatnonzero(le == index)) for index in np.unique(le)]
+
+
+def splitSurfaces(X, Y, nGrid=101):
+    # X, Y  : (N, M) coordinates from the trailing edge over the upper surface to the
+    #         leading edge and back (PARSECbatch/BEZIERbatch layout)
+    # Returns the cosine-spaced grid, upper and lower surfaces on it (N, nGrid), and
+    # whether each surface's x runs monotonically from the leading to the trailing edge
+    xGrid = 0.5 * (1 - np.cos(np.linspace(0, np.pi, nGrid)))
+    upper = np.empty((len(X), nGrid))
+    lower = np.empty((len(X), nGrid))
+    monotonic = np.ones(len(X), dtype=bool)
+
+    for le, rows in leadingEdgeGroups(X):
+        x, y = X[rows], Y[rows]
+        xUpper, yUpper = x[:, le::-1], y[:, le::-1]
+        xLower, yLower = x[:, le:], y[:, le:]
+        monotonic[rows] = (np.diff(xUpper, axis=1) >= 0).all(axis=1) & (np.diff(xLower, axis=1) >= 0).all(axis=1)
+
+        xLE = x[:, le:le + 1]
+        query = xLE + (x.max(axis=1, keepdims=True) - xLE) * xGrid
+        upper[rows] = batchInterp(query, xUpper, yUpper) if xUpper.shape[1] > 1 else yUpper
+        lower[rows] = batchInterp(query, xLower, yLower) if xLower.shape[1] > 1 else yLower
+
+    return xGrid, upper, lower, monotonic
+
+
+def leadingEdgeRadius(X, Y):
+    # Radius of the circle through the leading-edge point and its nearest neighbours
+    # (with x past the leading edge) on each surface
+    radius = np.full(len(X), np.nan)
+
+    for le, rows in leadingEdgeGroups(X):
+        x, y = X[rows], Y[rows]
+        ahead = x > x[:, le:le + 1] + 1e-9
+        columns = np.arange(x.shape[1])
+        upperIdx = np.where(ahead & (columns < le), columns, -1).max(axis=1)
+        lowerIdx = np.where(ahead & (columns > le), columns, x.shape[1]).min(axis=1)
+        found = (upperIdx >= 0) & (lowerIdx < x.shape[1])
+        rows, upperIdx, lowerIdx = rows[found], upperIdx[found], lowerIdx[found]
+        x, y = x[found], y[found]
+
+        ax, ay = x[np.arange(len(x)), upperIdx], y[np.arange(len(x)), upperIdx]
+        bx, by = x[:, le], y[:, le]
+        cx, cy = x[np.arange(len(x)), lowerIdx], y[np.arange(len(x)), lowerIdx]
+        area = np.abs((bx - ax)*(cy - ay) - (by - ay)*(cx - ax)) / 2
+        sides = np.hypot(ax - bx, ay - by) * np.hypot(bx - cx, by - cy) * np.hypot(cx - ax, cy - ay)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            radius[rows] = np.where(area > 0, sides / (4*area), np.nan)
+
+    return radius
+
+
+def selfIntersecting(X, Y, chunk=64):
+    # True where two non-adjacent segments of the coordinate polyline properly cross
+    # The first and last segments meet at the trailing edge by construction; a crossed
+    # trailing edge is caught by the trailing-edge gap check instead
+    nFoils, nPoints = X.shape
+    i, j = np.triu_indices(nPoints - 1, k=2)
+    keep = ~((i == 0) & (j == nPoints - 2))
+    i, j = i[keep], j[keep]
+    result = np.zeros(nFoils, dtype=bool)
+
+    for start in range(0, nFoils, chunk):
+        x, y = X[start:start + chunk], Y[start:start + chunk]
+        x0, y0, x1, y1 = x[:, :-1], y[:, :-1], x[:, 1:], y[:, 1:]
+
+        def orientation(s, px, py):
+            return (x1[:, s] - x0[:, s])*(py - y0[:, s]) - (y1[:, s] - y0[:, s])*(px - x0[:, s])
+
+        crossesJ = orientation(i, x0[:, j], y0[:, j]) * orientation(i, x1[:, j], y1[:, j]) < 0
+        crossesI = orientation(j, x0[:, i], y0[:, i]) * orientation(j, x1[:, i], y1[:, i]) < 0
+        result[start:start + chunk] = (crossesJ & crossesI).any(axis=1)
+
+    return result
+
+
+def screenGeometry(X, Y, rLE=None, minThickness=None, maxThickness=None, maxTEGap=0.02,
+                   minLERadius=None, maxLERadius=None, leRadiusTolerance=3, tolerance=1e-5):
+    # X, Y              : (N, M) foil coordinates
+    # rLE               : requested leading-edge radii (N,), e.g. PARSEC p1, to check the geometry against
+    # minThickness, maxThickness, minLERadius, maxLERadius : design limits, None to leave unchecked. They
+    #                     reject shapes XFOIL can solve, so they are opt-in (e.g. Screener(maxThickness=0.2))
+    # leRadiusTolerance : allowed ratio between the measured and requested leading-edge radius
+    # Returns the (N,) validity mask and a dict of (N,) failure masks per check
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+
+    xGrid, upper, lower, monotonic = splitSurfaces(X, Y)
+    thickness = upper - lower
+    maxThick = thickness.max(axis=1)
+    teGap = thickness[:, -1]
+    radius = leadingEdgeRadius(X, Y)
+
+    failures = {
+        'nonFinite': ~(np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)),
+        'nonMonotonic': ~monotonic,
+        'negativeThickness': (thickness[:, 1:-1] < -tolerance).any(axis=1),
+        'selfIntersection': selfIntersecting(X, Y),
+        'leadingEdge': ~np.isfinite(radius),
+        'trailingEdge': (teGap < -tolerance) | (teGap > maxTEGap),
+        'thickness': np.zeros(len(X), dtype=bool),
+    }
+    if minLERadius is not None:
+        failures['leadingEdge'] |= ~(radius >= minLERadius)
+    if maxLERadius is not None:
+        failures['leadingEdge'] |= ~(radius <= maxLERadius)
+    if minThickness is not None:
+        failures['thickness'] |= maxThick < minThickness
+    if maxThickness is not None:
+        failures['thickness'] |= maxThick > maxThickness
+    if rLE is not None:
+        ratio = radius / np.asarray(rLE, dtype=float)
+        failures['leadingEdge'] |= ~((ratio >= 1/leRadiusTolerance) & (ratio <= leRadiusTolerance))
+
+    valid = ~np.any(list(failures.values()), axis=0)
+
+    return valid, failures
+
+
+class Screener:
+    # Screens batches of candidates and keeps count of the solver calls it saved
+    #
+    # penalty : fitness given to rejected candidates
+    # rLEGene : gene holding the requested leading-edge radius (0 for PARSEC), None to skip that check
+    # limits  : keyword limits passed on to screenGeometry
+
+    def __init__(self, penalty=0, rLEGene=None, **limits):
+        self.penalty = penalty
+        self.rLEGene = rLEGene
+        self.limits = limits
+        self.checked = 0
+        self.rejected = 0
+        self.failureCounts = {}
+
+    def screen(self, X, Y, genes=None):
+        # X, Y  : (N, M) coordinates of the candidates
+        # genes : (N, g) genes the coordinates were built from
+        rLE = None
+        if self.rLEGene is not None and genes is not None:
+            rLE = np.atleast_2d(genes)[:, self.rLEGene]
+        valid, failures = screenGeometry(X, Y, rLE=rLE, **self.limits)
+
+        self.checked += len(valid)
+        self.rejected += int((~valid).sum())
+        for name, failed in failures.items():
+            self.failureCounts[name] = self.failureCounts.get(name, 0) + int(failed.sum())
+
+        return valid
+
+    def report(self):
+        # Overall rejections, then the share of candidates failing each check (a candidate can fail several)
+        share = self.rejected / self.checked if self.checked else 0.0
+        reasons = ", ".join(f"{name}: {count} ({count / self.checked:.0%})"
+                            for name, count in self.failureCounts.items() if count)
+        return f"SCREENING: {self.rejected}/{self.checked} candidates rejected ({share:.0%}) - XFOIL calls avoided: {self.rejected}" \
+               + (f" [{reasons}]" if reasons else "")
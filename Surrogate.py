@@ -0,0 +1,172 @@
+"""SURROGATE-ASSISTED EVALUATION"""
+# A Gaussian-process model of fitness over the genes, trained on every successful XFOIL
+# result so far (failures are fitness cliffs the model would smooth into valleys). It ranks each offspring batch so that only the most promising (and the most
+# uncertain) candidates are sent to the solver.
+
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+
+import Instrumentation
+
+
+class GaussianProcess:
+    # lengthScale : RBF kernel length in normalised gene space (None for half the median pairwise distance)
+    # noise       : kernel diagonal jitter, relative to the normalised fitness variance
+
+    def __init__(self, lengthScale=None, noise=1e-2):
+        self.lengthScale = lengthScale
+        self.noise = noise
+
+    def kernel(self, A, B):
+        sqDist = (A**2).sum(axis=1)[:, None] + (B**2).sum(axis=1)[None, :] - 2 * A @ B.T
+        return np.exp(-np.maximum(sqDist, 0) / (2 * self.scale**2))
+
+    def fit(self, X, y):
+        self.X = X
+        self.yMean = y.mean()
+        self.yStd = y.std() or 1.0
+
+        self.scale = self.lengthScale
+        if self.scale is None:
+            sample = X[:200]
+            dist = np.sqrt(((sample[:, None] - sample[None]) ** 2).sum(axis=2))
+            self.scale = np.median(dist[np.triu_indices(len(sample), k=1)]) / 2 or 1.0
+
+        K = self.kernel(X, X) + self.noise * np.eye(len(X))
+        self.factor = cho_factor(K, lower=True)
+        self.weights = cho_solve(self.factor, (y - self.yMean) / self.yStd)
+
+    def predict(self, X):
+        # Returns the predicted mean and standard deviation
+        Ks = self.kernel(X, self.X)
+        mean = Ks @ self.weights
+        v = solve_triangular(self.factor[0], Ks.T, lower=True)
+        var = np.maximum(1 - (v**2).sum(axis=0), 0)
+        return self.yMean + self.yStd * mean, self.yStd * np.sqrt(var)
+
+
+def geneBounds(gene_space):
+    # Lower/upper bound per gene from a pygad gene_space of {'low', 'high'} dicts or value lists
+    low, high = [], []
+    for space in gene_space:
+        values = [space['low'], space['high']] if isinstance(space, dict) else list(space)
+        low.append(min(values))
+        high.append(max(values))
+    return np.array(low, dtype=float), np.array(high, dtype=float)
+
+
+def rankCorrelation(a, b):
+    # Spearman rank correlation (ties broken by order)
+    if len(a) < 2:
+        return np.nan
+    rankA = np.argsort(np.argsort(a))
+    rankB = np.argsort(np.argsort(b))
+    if rankA.std() == 0 or rankB.std() == 0:
+        return np.nan
+    return np.corrcoef(rankA, rankB)[0, 1]
+
+
+class SurrogateEvaluator:
+    # Wraps a batch fitness function (e.g. Evaluator.PoolEvaluator) for pygad's fitness_batch_size hook.
+    #
+    # evaluator        : Evaluator batch evaluator (ga_instance, solutions, solutions_indices) -> fitness
+    # gene_space       : pygad gene_space, used to normalise genes
+    # evaluateFraction : share of each batch sent to the real solver, best predictions first
+    # exploreFraction  : share of each batch sent to the solver because the prediction is most uncertain
+    # minTrain         : real evaluations collected before the surrogate is used
+    # maxTrain         : training points kept (the best half and the most recent half)
+    #
+    # Candidates that are not solved get their predicted fitness, capped at the lowest successful
+    # real fitness of the batch so that they never outrank a solved candidate (a batch with no
+    # successful solve keeps the previous cap).
+
+    def __init__(self, evaluator, gene_space, evaluateFraction=0.3, exploreFraction=0.1, minTrain=50, maxTrain=1000):
+        self.evaluator = evaluator
+        self.low, self.high = geneBounds(gene_space)
+        self.evaluateFraction = evaluateFraction
+        self.exploreFraction = exploreFraction
+        self.minTrain = minTrain
+        self.maxTrain = maxTrain
+        self.model = GaussianProcess()
+        self.genes = np.empty((0, len(self.low)))
+        self.fitness = np.empty(0)
+        self.cap = None
+        self.solverCalls = 0
+        self.candidates = 0
+        self.history = []
+
+    def normalise(self, solutions):
+        span = np.where(self.high > self.low, self.high - self.low, 1.0)
+        return (np.asarray(solutions, dtype=float) - self.low) / span
+
+    def train(self, solutions, fitness):
+        # Learns from the successful solves (fitness > 0) only
+        solved = fitness > 0
+        if not solved.any():
+            return
+        self.cap = fitness[solved].min()
+        self.genes = np.vstack((self.genes, self.normalise(solutions[solved])))
+        self.fitness = np.concatenate((self.fitness, fitness[solved]))
+
+        if len(self.fitness) > self.maxTrain:
+            best = np.argsort(self.fitness)[-self.maxTrain // 2:]
+            recent = np.arange(len(self.fitness) - self.maxTrain // 2, len(self.fitness))
+            keep = np.union1d(best, recent)
+            self.genes, self.fitness = self.genes[keep], self.fitness[keep]
+
+        self.model.fit(self.genes, self.fitness)
+
+    def __call__(self, ga_instance, solutions, solutions_indices):
+        solutions = np.asarray(solutions)
+        if solutions_indices is None:
+            solutions_indices = list(range(len(solutions)))
+        self.candidates += len(solutions)
+
+        if len(self.fitness) < self.minTrain:
+            fitness = np.asarray(self.evaluator(ga_instance, solutions, solutions_indices), dtype=float)
+            self.solverCalls += len(solutions)
+            self.train(solutions, fitness)
+            return list(fitness)
+
+        mean, std = self.model.predict(self.normalise(solutions))
+
+        nExploit = max(1, int(round(self.evaluateFraction * len(solutions))))
+        nExplore = int(round(self.exploreFraction * len(solutions)))
+        chosen = list(np.argsort(mean)[::-1][:nExploit])
+        for i in np.argsort(std)[::-1]:
+            if nExplore == 0:
+                break
+            if i not in chosen:
+                chosen.append(i)
+                nExplore -= 1
+        chosen = np.array(sorted(chosen))
+
+        realFitness = np.asarray(self.evaluator(ga_instance, solutions[chosen], [solutions_indices[i] for i in chosen]),
+                                 dtype=float)
+        self.solverCalls += len(chosen)
+
+        self.train(solutions[chosen], realFitness)
+        fitness = np.minimum(np.maximum(mean, 0), self.cap)
+        fitness[chosen] = realFitness
+
+        # Prediction quality over the successful solves
+        solved = realFitness > 0
+        predicted = mean[chosen][solved]
+        self.history.append({'generation': ga_instance.generations_completed,
+                             'solved': len(chosen),
+                             'candidates': len(solutions),
+                             'rmse': float(np.sqrt(np.mean((predicted - realFitness[solved])**2))) if solved.any() else np.nan,
+                             'rankCorrelation': float(rankCorrelation(predicted, realFitness[solved]))})
+        Instrumentation.report(self.report())
+        return list(fitness)
+
+    def summary(self, ga_instance):
+        # Polar metrics of the solved candidates (NaN for predicted ones)
+        return self.evaluator.summary(ga_instance)
+
+    def report(self):
+        line = f"SURROGATE: {self.solverCalls}/{self.candidates} candidates solved"
+        if self.history:
+            last = self.history[-1]
+            line += f" - last batch RMSE {last['rmse']:.3g}, rank correlation {last['rankCorrelation']:.2f}"
+        return line
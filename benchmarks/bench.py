@@ -0,0 +1,239 @@
+"""
+Benchmarks for the geometry, I/O and solver-dispatch hot paths
+
+usage: python benchmarks/bench.py [--quick] [--output FILE] [--baseline FILE] [--save-baseline] [--tolerance RATIO]
+
+Every benchmark reports the best-of-N wall-clock seconds per call. Solver benchmarks run
+against benchmarks/fakeXfoil.py, with its start-up latency set per case, so they measure the
+dispatch overhead around XFOIL rather than XFOIL itself. Results are written as JSON; with a
+baseline file, any benchmark slower than baseline * tolerance is flagged and the exit code is 1.
+A benchmark stage that raises, or a baseline case (of the same --quick mode) missing from the
+results, fails the run as well.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np
+
+import Airfoil
+from PARSEC.Parsec import PARSECfoil, PARSECbatch
+from BEZIER.Bezier import BEZIERfoil, BEZIERbatch
+from xfoil import parsePolar, XFOILSession
+
+FAKE_XFOIL = os.path.join(BENCH_DIR, 'fakeXfoil.py')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# main.py PARSEC gene_space bounds
+PARSEC_LOW = np.array([0.01, 0.1, 0.03, -0.6, 0.1, -0.1, 0.2, 0, 0, -5, 0])
+PARSEC_HIGH = np.array([0.03, 0.7, 0.1, -0.2, 0.7, -0.03, 0.6, 0.025, 0.005, 5, 5])
+
+# main.py Bezier example control points
+BEZIER_GENES = np.array([1, 0.001, 0.76, 0.08, 0.52, 0.125, 0.25, 0.12, 0.1, 0.08, 0, 0.03,
+                         0, -0.03, 0.15, -0.08, 0.37, -0.01, 0.69, 0.04, 1, -0.001])
+
+
+def bestTime(function, repeat=5, number=1):
+    # Best of `repeat` runs, in seconds per call
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def randomPARSEC(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return PARSEC_LOW + (PARSEC_HIGH - PARSEC_LOW) * rng.random((n, 11))
+
+
+def randomBezier(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return BEZIER_GENES + 0.01 * rng.standard_normal((n, 22))
+
+
+def syntheticPolar(fileName, nRows):
+    alpha = np.linspace(-5, 15, nRows)
+    CL = 0.11 * alpha + 0.3
+    CD = 0.006 + 0.0004 * (alpha - 3)**2
+    rows = np.column_stack((alpha, CL, CD, CD / 3, np.full(nRows, -0.05), np.full(nRows, 0.5), np.full(nRows, 0.9)))
+
+    with open(fileName, 'w') as f:
+        f.write("\n       XFOIL         Version 6.99\n\n Calculated polar for: bench\n\n"
+                " 1 1 Reynolds number fixed          Mach number fixed\n\n"
+                " xtrf =   1.000 (top)        1.000 (bottom)\n"
+                " Mach =   0.000     Re =     1.000 e 6     Ncrit =   9.000\n\n"
+                "   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr\n"
+                "  ------ -------- --------- --------- -------- -------- --------\n")
+        for row in rows:
+            f.write("  %6.3f  %7.4f  %8.5f  %8.5f  %7.4f  %7.4f  %7.4f\n" % tuple(row))
+
+
+def benchCandidate(solution, foilName, workDir=None):
+    # Module level so that pool workers can unpickle it
+    X, Y = PARSECfoil(solution)
+    polar = Airfoil.runAirfoil(X, Y, foilName, 1e6, -5, 15, 1, workDir=workDir)
+    return 0.0 if polar is None or not np.isfinite(polar.LDmax) else float(polar.LDmax)
+
+
+def benchGeometry(results, sizes):
+    for n in sizes:
+        genes = randomPARSEC(n)
+        results[f"PARSECfoil/loop/N={n}"] = bestTime(lambda: [PARSECfoil(p) for p in genes], repeat=3)
+        results[f"PARSECbatch/N={n}"] = bestTime(lambda: PARSECbatch(genes))
+
+        genes = randomBezier(n)
+        for numPoints in (16, 64):
+            results[f"BEZIERfoil/loop/N={n}/points={numPoints}"] = bestTime(lambda: [BEZIERfoil(g, numPoints) for g in genes], repeat=3)
+            results[f"BEZIERbatch/N={n}/points={numPoints}"] = bestTime(lambda: BEZIERbatch(genes, numPoints))
+
+
+def benchDATFile(results, workDir):
+    for nPoints in (75, 500):
+        X, Y = PARSECfoil(randomPARSEC(1)[0], np.linspace(0, 1, nPoints))
+        results[f"createDATFile/points={2*nPoints}"] = bestTime(lambda: Airfoil.createDATFile(X, Y, 'bench', workDir), number=100)
+
+
+def benchParsePolar(results, workDir):
+    for nRows in (21, 201, 2001, 20001):
+        fileName = os.path.join(workDir, f"polar{nRows}.dat")
+        syntheticPolar(fileName, nRows)
+        results[f"parsePolar/rows={nRows}"] = bestTime(lambda: parsePolar(fileName), number=20)
+
+
+def benchSolver(results, latencies, nRuns):
+    X, Y = PARSECfoil(randomPARSEC(1)[0])
+
+    for latency in latencies:
+        os.environ['FAKE_XFOIL_LATENCY'] = str(latency)
+        results[f"runAirfoil/latency={latency}"] = bestTime(
+            lambda: Airfoil.runAirfoil(X, Y, 'bench', 1e6, -5, 15, 1), repeat=3, number=nRuns)
+
+        with XFOILSession(maxRequests=nRuns) as session:
+            results[f"runAirfoil/session/latency={latency}"] = bestTime(
+                lambda: Airfoil.runAirfoil(X, Y, 'bench', 1e6, -5, 15, 1, session=session), repeat=3, number=nRuns)
+
+    os.environ['FAKE_XFOIL_LATENCY'] = '0'
+
+
+def benchGeneration(results, popSize, workDir):
+    import GATools
+    from Evaluator import PoolEvaluator
+
+    gene_space = [{'low': low, 'high': high} for low, high in zip(PARSEC_LOW, PARSEC_HIGH)]
+    with PoolEvaluator(benchCandidate) as evaluator:
+        evaluator.start()
+        results[f"runGA/generation/pop={popSize}"] = bestTime(
+            lambda: GATools.runGA(gene_space, evaluator, os.path.join(workDir, 'benchGA'), fitnessBatchSize=popSize,
+                                  numGenerations=1, solPerPop=popSize, plot=False), repeat=1)
+
+
+def compare(results, baseline, tolerance):
+    # Returns the (name, baseline, current) entries slower than baseline * tolerance and the
+    # baseline cases with no result
+    regressions = []
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if reference and seconds > reference * tolerance:
+            regressions.append((name, reference, seconds))
+    missing = [name for name in baseline if name not in results]
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AirfoilOptimizer hot-path benchmarks")
+    parser.add_argument('--quick', action='store_true', help="smaller populations and fewer solver runs")
+    parser.add_argument('--output', default='bench_results.json', help="JSON file for the results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="stored baseline to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = (50, 500) if args.quick else (50, 500, 5000)
+    latencies = (0, 0.05) if args.quick else (0, 0.05, 0.2)
+    nRuns = 3 if args.quick else 10
+    popSize = 8 if args.quick else 32
+
+    results, errors = {}, {}
+    workDir = tempfile.mkdtemp(prefix='airfoilbench_')
+    cwd = os.getcwd()
+    os.symlink(FAKE_XFOIL, os.path.join(workDir, 'xfoil'))
+    os.chdir(workDir)
+
+    stages = [('geometry', lambda: benchGeometry(results, sizes)),
+              ('createDATFile', lambda: benchDATFile(results, workDir)),
+              ('parsePolar', lambda: benchParsePolar(results, workDir)),
+              ('solver', lambda: benchSolver(results, latencies, nRuns)),
+              ('generation', lambda: benchGeneration(results, popSize, workDir))]
+    try:
+        for stage, run in stages:
+            print(f"Running {stage} benchmarks...", flush=True)
+            try:
+                run()
+            except BaseException as ex:
+                if isinstance(ex, KeyboardInterrupt):
+                    raise
+                errors[stage] = f"{type(ex).__name__}: {ex}"
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    report = {'meta': {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'platform': platform.platform(),
+                       'cpus': os.cpu_count(),
+                       'quick': args.quick},
+              'results': results,
+              'errors': errors}
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    width = max(len(name) for name in results) if results else 0
+    for name, seconds in results.items():
+        print(f"{name:<{width}}  {seconds * 1e3:12.3f} ms")
+    for stage, error in errors.items():
+        print(f"FAILED {stage}: {error}")
+    if errors:
+        # A broken stage would otherwise pass as having no regressions (and poison a saved baseline)
+        return 1
+
+    if args.save_baseline:
+        shutil.copy(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        regressions, missing = compare(results, stored['results'], args.tolerance)
+        for name, reference, seconds in regressions:
+            print(f"REGRESSION {name}: {reference * 1e3:.3f} ms -> {seconds * 1e3:.3f} ms ({seconds / reference:.2f}x)")
+        # --quick and full runs cover different sizes, so missing cases only count within one mode
+        if stored.get('meta', {}).get('quick') != args.quick:
+            missing = []
+        for name in missing:
+            print(f"MISSING {name}: in the baseline but not in these results")
+        if regressions or missing:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.2f}x)")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the XFOIL executable, used by the benchmarks
+
+Understands the subset of XFOIL's command stream this project sends (LOAD, OPER, VISC/RE,
+PACC, ASEQ/CSEQ/A/CL, ITER, PANE/PPAR, PDEL, INIT, QUIT) and writes polar files in XFOIL's
+format from an analytic thin-airfoil/drag-bucket model. Unknown top-level commands are
+echoed back the way XFOIL reports them.
+
+Environment:
+    FAKE_XFOIL_LATENCY        seconds slept when the process starts
+    FAKE_XFOIL_POINT_LATENCY  seconds slept per operating point
+    FAKE_XFOIL_MIN_ALPHA      points below this angle of attack do not converge (default -4)
+    FAKE_XFOIL_MAX_POLARS     polars kept in memory (default 12, XFOIL's NPX); with all of them
+                              taken PACC refuses new ones without reading the file names, as XFOIL does
+"""
+
+import math
+import os
+import sys
+import time
+
+startLatency = float(os.environ.get('FAKE_XFOIL_LATENCY', '0'))
+pointLatency = float(os.environ.get('FAKE_XFOIL_POINT_LATENCY', '0'))
+minAlpha = float(os.environ.get('FAKE_XFOIL_MIN_ALPHA', '-4'))
+maxPolars = int(os.environ.get('FAKE_XFOIL_MAX_POLARS', '12'))
+
+HEADER = """
+       XFOIL         Version 6.99
+
+ Calculated polar for: {name}
+
+ 1 1 Reynolds number fixed          Mach number fixed
+
+ xtrf =   1.000 (top)        1.000 (bottom)
+ Mach =   0.000     Re =     {re:.3f} e 6     Ncrit =   9.000
+
+   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr
+  ------ -------- --------- --------- -------- -------- --------
+"""
+
+state = {'name': 'foil', 'camber': 0.0, 'thickness': 0.12, 're': 1e6, 'polar': None, 'stored': 0}
+
+
+def readLine():
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.strip()
+
+
+def loadFoil(fileName):
+    with open(fileName) as f:
+        state['name'] = f.readline().strip()
+        coords = [tuple(map(float, line.split()[:2])) for line in f if line.strip()]
+    y = [c[1] for c in coords]
+    state['thickness'] = max(y) - min(y)
+    state['camber'] = (max(y) + min(y)) / 2
+
+
+def operatingPoint(alpha):
+    # Lift slope 2*pi with a soft stall at 14 deg, drag bucket around 3 deg
+    CL0 = 2 * math.pi * 2 * state['camber']
+    CL = (2 * math.pi * math.radians(alpha) + CL0) * (1 - max(alpha - 10, 0) / 20)
+    CD = 0.0055 + 0.05 * state['thickness']**2 + 0.0004 * (alpha - 3)**2 + 1 / math.sqrt(state['re']) * 2
+    return alpha, CL, CD, CD / 3, -0.25 * CL0, max(0.05, 0.6 - alpha / 30), min(1.0, 0.7 + alpha / 40)
+
+
+def solve(alphas):
+    for alpha in alphas:
+        time.sleep(pointLatency)
+        if alpha < minAlpha or state['polar'] is None:
+            continue
+        with open(state['polar'], 'a') as f:
+            f.write("  %6.3f  %7.4f  %8.5f  %8.5f  %7.4f  %7.4f  %7.4f\n" % operatingPoint(alpha))
+
+
+def sequence(start, end, step):
+    if step == 0:
+        return [start]
+    n = int(round((end - start) / step))
+    return [start + i * step for i in range(max(n, 0) + 1)]
+
+
+def alphaForCL(CL):
+    CL0 = 2 * math.pi * 2 * state['camber']
+    return math.degrees((CL - CL0) / (2 * math.pi))
+
+
+def oper():
+    while True:
+        words = readLine().split()
+        if not words:
+            return
+        command = words[0].upper()
+        args = [float(w) for w in words[1:]]
+
+        if command in ('VISC', 'RE') and args:
+            state['re'] = args[0]
+        elif command == 'PACC':
+            if state['polar'] is not None:
+                state['polar'] = None
+            elif state['stored'] >= maxPolars:
+                print(" Polar storage arrays full.  Delete some polars (PDEL).", flush=True)
+            else:
+                state['stored'] += 1
+                polarFile = readLine()
+                readLine()
+                state['polar'] = polarFile
+                if not os.path.exists(polarFile):
+                    with open(polarFile, 'w') as f:
+                        f.write(HEADER.format(name=state['name'], re=state['re'] / 1e6))
+        elif command == 'ASEQ':
+            solve(sequence(*args[:3]))
+        elif command == 'A':
+            solve(args[:1])
+        elif command == 'CSEQ':
+            solve([alphaForCL(CL) for CL in sequence(*args[:3])])
+        elif command == 'CL':
+            solve([alphaForCL(args[0])])
+        elif command == 'PDEL':
+            # PDEL 0 deletes every stored polar
+            if args and args[0] == 0:
+                state['stored'] = 0
+            elif state['stored']:
+                state['stored'] -= 1
+
+
+def main():
+    time.sleep(startLatency)
+    try:
+        while True:
+            words = readLine().split()
+            if not words:
+                continue
+            command = words[0].upper()
+            if command == 'LOAD':
+                loadFoil(words[1] if len(words) > 1 else readLine())
+            elif command == 'OPER':
+                oper()
+            elif command == 'QUIT':
+                return
+            elif command in ('PANE', 'PPAR', 'GDES', 'N'):
+                pass
+            else:
+                print(f" {command[:4]} command not recognized.  Type a \"?\" for command list", flush=True)
+    except EOFError:
+        return
+
+
+if __name__ == '__main__':
+    main()
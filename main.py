@@ -2,16 +2,22 @@
 # Author: David Moeller Sztajnbok
 # Date:   July 2023
 
-from PARSEC.Parsec import createPMatrix, PARSECfoil
-from BEZIER.Bezier import BEZIERfoil, plotBEZIER, listToCP
+# usage: python main.py {optimize,animate,export-dat,jobs,worker,bench} [options]   (-h for the options)
+#
+# Importing this module only defines the fitness functions; pool workers import it without
+# running anything (nor opening the polar cache, which optimize does). Plotting, pygad and
+# the modules of the other subcommands are imported by the commands that need them.
+
+from PARSEC.Parsec import PARSECfoil, PARSECbatch, PARSEC_GENE_SPACE
+from BEZIER.Bezier import BEZIERfoil, BEZIERbatch, BEZIER_GENE_SPACE
 import Airfoil
 import GATools
-import matplotlib.pyplot as plt
-import numpy as np
-import math
+import Instrumentation
+import argparse
 import os
-
-import pygad
+from functools import partial
+import math
+import sys
 
 """PARSEC EXAMPLE"""
 # pArr = [
@@ -83,164 +89,234 @@ import pygad
 #     ]
 
 
-def fitnessFunction(ga_instance, solution, solution_idx):
-    # Run airfoil with solution and get aerodynamic parameters
+# Polars of already evaluated shapes (parents, elites, repeated runs at the same Re), opened
+# by optimize before its evaluation workers fork so that they inherit it; None for no cache
+polarCache = None
+
+
+# Sweep every candidate is evaluated with: one continuous ASEQ per candidate, or with adaptive set
+# a coarse pass refined around L/D max (see Airfoil.runAirfoil)
+SWEEP = {'Re': 1e6, 'iterStart': -5, 'iterEnd': 15, 'iterStep': 1, 'iterative': 'alpha', 'adaptive': False}
 
-    X, Y = PARSECfoil(solution)
-    Re = 1e6
-    alphaStart = -5
-    alphaEnd = 15
-    alphaStep = 1
-    generationNum = ga_instance.generations_completed
-    foilName = f"Gen{generationNum}Sol{solution_idx}"
+# Low-fidelity sweep of the --multi-fidelity cheap pass: 4 angles, half of XFOIL's default
+# 160 panels and a low iteration limit (points that need more are dropped)
+CHEAP_SWEEP = {'Re': 1e6, 'iterStart': 0, 'iterEnd': 12, 'iterStep': 4, 'iterative': 'alpha', 'adaptive': False,
+               'panels': 80, 'maxIter': 20}
 
-    print(f"GENERATION {generationNum}\nSOLUTION: {solution_idx}")
 
+def scorePolar(polar, foilName):
+    # Returns the fitness (L/D max) and the polar metrics kept in the run history
+    metrics = Airfoil.polarMetrics(polar)
+    fitness = metrics['LDmax']
+
+    print(f"{foilName} FITNESS: {fitness}\n\n")
+
+    if not math.isnan(fitness):
+        return fitness, metrics
+    else:
+        return 0, metrics
+
+
+def polarFitness(X, Y, foilName, workDir=None, sweep=SWEEP):
+    # Run airfoil and get aerodynamic parameters
     try:
-        polar = Airfoil.runAirfoil(X, Y, foilName, Re, alphaStart, alphaEnd, alphaStep, iterative='alpha')
-        os.remove(f"./{foilName}.dat")
+        polar = Airfoil.runAirfoil(X, Y, foilName, sweep['Re'], sweep['iterStart'], sweep['iterEnd'], sweep['iterStep'],
+                                   iterative=sweep['iterative'], workDir=workDir, cache=polarCache, adaptive=sweep['adaptive'],
+                                   panels=sweep.get('panels'), maxIter=sweep.get('maxIter'))
     except Exception as ex:
         print(ex)
-        os.remove(f"./{foilName}.dat")
-        return 0
+        return 0, Airfoil.polarMetrics(None)
+
+    return scorePolar(polar, foilName)
 
-    try:
-        CLmax = max(polar.CL)
-        LDmax = max(polar.CLCD)
-        CDmin = min(polar.CD)
-        LDmaxLOC = polar.CL[polar.CLCD.index(LDmax)]
-        CDminLOC = polar.CL[polar.CD.index(CDmin)]
 
-        fitness = LDmax
+def candidateFitness(solution, foilName, workDir=None, sweep=SWEEP):
+    # PARSEC candidate
+    Instrumentation.count('evaluations')
+    with Instrumentation.stage('geometry'):
+        X, Y = PARSECfoil(solution)
+    return polarFitness(X, Y, foilName, workDir, sweep)
 
-        print(f"FITNESS: {fitness}\n\n")
 
-        if not math.isnan(fitness):
-            return fitness
+def bezierCandidateFitness(solution, foilName, workDir=None, sweep=SWEEP):
+    # Bezier candidate, 16 points per segment
+    Instrumentation.count('evaluations')
+    with Instrumentation.stage('geometry'):
+        X, Y = BEZIERfoil(solution, 16)
+    return polarFitness(X, Y, foilName, workDir, sweep)
+
+
+# Candidate function, batch geometry, Screening.Screener options and gene space of each
+# parametrization. The screener rejects crossed and negative-thickness shapes before they reach XFOIL.
+SETUPS = {'PARSEC': (candidateFitness, PARSECbatch, {'rLEGene': 0}, PARSEC_GENE_SPACE),
+          'BEZIER': (bezierCandidateFitness, partial(BEZIERbatch, numPoints=16), {}, BEZIER_GENE_SPACE)}
+
+
+def optimize(args):
+    global polarCache
+    from History import RunHistory
+    from Evaluator import PoolEvaluator, SerialEvaluator
+    from Screening import Screener
+
+    if args.cache:
+        from PolarCache import PolarCache
+        polarCache = PolarCache(args.cache)
+    if args.metrics:
+        # Per-stage timings and solver outcomes, one line per generation
+        Instrumentation.enable(args.metrics, profile=args.profile)
+    Instrumentation.verbose = args.verbose
+    # Streaming history with checkpoints; rerun with --resume to continue after a crash
+    history = RunHistory(args.history) if args.history else None
+    options = {'numGenerations': args.generations,
+               'solPerPop': args.population,
+               'onGeneration': Instrumentation.onGeneration if args.metrics else None,
+               'history': history,
+               'resume': args.resume,
+               'stallGenerations': args.stall,
+               'refine': args.refine,
+               'refineEvaluations': args.refine_evaluations}
+
+    candidate, geometry, screenerOptions, gene_space = SETUPS[args.method]
+    screener = Screener(**screenerOptions)
+    if args.islands:
+        import Islands
+        # Island model, one process and evaluation pool per population
+        if args.serial or args.serve or args.surrogate or args.multi_fidelity or args.stall or args.refine or history is not None:
+            sys.exit("--islands keeps its own histories and cannot be combined with --serial, --serve, --surrogate, "
+                     "--multi-fidelity, --stall, --refine or --history")
+        Islands.runIslands(gene_space, candidate, args.name, nIslands=args.islands, topology=args.topology,
+                           migrateEvery=args.migrate_every, migrants=args.migrants, workersPerIsland=args.workers,
+                           migrationTimeout=args.migration_timeout,
+                           geometry=geometry, screener=screener, numGenerations=args.generations, solPerPop=args.population,
+                           resume=args.resume)
+        if args.animate:
+            GATools.animateGA(args.name, f"{args.name} Anim", args.method, historyDir=os.path.join(args.name, 'merged'))
+        return
+
+    if args.multi_fidelity:
+        # Every candidate solved with CHEAP_SWEEP, the best share of them again with SWEEP
+        from MultiFidelity import MultiFidelityEvaluator
+        if args.serve:
+            sys.exit("--multi-fidelity cannot be combined with --serve")
+        if args.serial:
+            cheap = SerialEvaluator(partial(candidate, sweep=CHEAP_SWEEP), geometry=geometry, screener=screener)
+            full = SerialEvaluator(candidate, geometry=geometry)
         else:
-            return 0
+            # The two pools take turns, so they can share the cores
+            cheap = PoolEvaluator(partial(candidate, sweep=CHEAP_SWEEP), nWorkers=args.workers, geometry=geometry,
+                                  screener=screener)
+            full = PoolEvaluator(candidate, nWorkers=args.workers, geometry=geometry)
+        evaluator = MultiFidelityEvaluator(cheap, full, fullFraction=args.multi_fidelity)
+    elif args.serial:
+        # Whole generations evaluated one solution after another in this process
+        evaluator = SerialEvaluator(candidate, geometry=geometry, screener=screener)
+    elif args.serve:
+        # XFOIL runs on the workers that connect (python main.py worker HOST:PORT)
+        from Distributed import DistributedEvaluator, parseAddress, DEFAULT_AUTHKEY
+        evaluator = DistributedEvaluator(scorePolar, geometry, SWEEP, parseAddress(args.serve),
+                                         args.authkey or DEFAULT_AUTHKEY, screener=screener)
+    else:
+        # Parallel evaluation, one isolated XFOIL worker per core
+        evaluator = PoolEvaluator(candidate, nWorkers=args.workers, geometry=geometry, screener=screener)
 
-    except Exception as ex:
-        print(f"Failed | {ex} | FITNESS = 0")
-        print()
-        return 0
-
-gene_space = [
-    {'low': 0.01, 'high': 0.03},    # p1  - rLE Leading-edge radius
-    {'low': 0.1, 'high': 0.7},      # p2  - XS Upper crest position in horizontal coordinates
-    {'low': 0.03, 'high': 0.1},     # p3  - ZS Upper crest position in vertical coordinates
-    {'low': -0.6, 'high': -0.2},    # p4  - ZXX,S Upper crest curvature
-    {'low': 0.1, 'high': 0.7},      # p5  - XP Lower crest position in horizontal coordinates
-    {'low': -0.03, 'high': -0.1},   # p6  - ZP Lower crest position in vertical coordinates
-    {'low': 0.2, 'high': 0.6},      # p7  - ZXX,P Lower crest curvature
-    {'low': 0, 'high': 0.025},      # p8  - ZT E Trailing-edge offset
-    {'low': 0, 'high': 0.005},      # p9  - ∆ZT E Trailing-edge thickness
-    {'low': -5, 'high': 5},         # p10 - αT E Trailing-edge direction
-    {'low': 0, 'high': 5}           # p11 - βT E Trailing-edge wedge angle
-]
-
-GATools.runGA(gene_space, fitnessFunction, 'New XFOIL test')
-GATools.animateGA('New XFOIL test', 'New XFOIL test Anim', 'PARSEC')
-
-"""GENETIC ALGORITHM IMPLEMENTATION - GA BEZIER"""
-# def fitnessFunction(ga_instance, solution, solution_idx):
-#     # Run airfoil with solution and get aerodynamic parameters
-#     controlPoints = listToCP(solution)
-#     X, Y = BEZIERfoil(controlPoints, 16)
-#     Re = 1e6
-#     alphaArray = np.linspace(-5, 15, 21)
-#     generationNum = ga_instance.generations_completed
-#     foilName = f"Gen{generationNum}Sol{solution_idx}"
-#
-#     print(f"GENERATION {generationNum}\nSOLUTION: {solution_idx}")
-#
-#     try:
-#         polar = Airfoil.runAirfoil(X, Y, foilName, Re, alphaArray)
-#         os.remove(f"./{foilName}.dat")
-#     except Exception as ex:
-#         print("EXCEPTION!")
-#         os.remove(f"./{foilName}.dat")
-#         return 0
-#
-#     if len(polar['a']) < 0.25*len(alphaArray):
-#         print("TOO SHORT CONVERGENCE!!")
-#         return 0
-#
-#     foilPolar = Airfoil.createPolarDict(polar, foilName)
-#     CLmax = Airfoil.getCLmax(foilPolar)
-#     LDmax = Airfoil.getLDmax(foilPolar)
-#     CDmin = Airfoil.getCDmin(foilPolar)
-#     LDmaxLOC = Airfoil.getLDmaxLOC(foilPolar)
-#     CDminLOC = Airfoil.getCDminLOC(foilPolar)
-#
-#     fitness = LDmax
-#
-#     print(f"FITNESS: {fitness}\n\n")
-#
-#     if not math.isnan(fitness):
-#         return fitness
-#     else:
-#         return 0
-#
-# # controlPoints = [
-# #     1, 0.001,         # trailing edge (top)
-# #     0.76, 0.08,
-# #     0.52, 0.125,
-# #     0.25, 0.12,
-# #     0.1, 0.08,
-# #     0, 0.03,          # leading edge (top)
-# #     0, -0.03,         # leading edge (bottom)
-# #     0.15, -0.08,
-# #     0.37, -0.01,
-# #     0.69, 0.04,
-# #     1, -0.001         # trailing edge (bottom)
-# # ]
-#
-# gene_space = [
-#     [1], {'low': 0, 'high': 0.01},                              # Trailing Edge (TOP)
-#
-#     {'low': 0.76, 'high': 1}, {'low': 0.05, 'high': 0.2},
-#     {'low': 0.52, 'high': 0.76}, {'low': 0.05, 'high': 0.2},
-#     {'low': 0.25, 'high': 0.52}, {'low': 0.05, 'high': 0.2},
-#     {'low': 0.1, 'high': 0.25}, {'low': 0.05, 'high': 0.2},
-#
-#     [0], {'low': 0.01, 'high': 0.1},                            # Leading Edge (TOP)
-#     [0], {'low': -0.1, 'high': -0.01},                          # Leading Edge (BOTTOM)
-#
-#     {'low': 0.15, 'high': 0.37}, {'low': -0.2, 'high': -0.05},
-#     {'low': 0.37, 'high': 0.69}, {'low': -0.2, 'high': -0.05},
-#     {'low': 0.69, 'high': 1}, {'low': -0.2, 'high': -0.05},
-#
-#     [1], {'low': -0.01, 'high': 0},                             # Trailing Edge (BOTTOM)
-# ]
-#
-# num_generations = 50
-# num_parents_mating = 4
-# num_genes = 22
-# parent_selection_type = "sss"
-# keep_parents = 2
-# crossover_type = "single_point"
-# mutation_type = "random"
-# mutation_percent_genes = 10
-#
-# ga_instance = pygad.GA(num_generations=num_generations,
-#                            num_parents_mating=num_parents_mating,
-#                            fitness_func=fitnessFunction,
-#                            num_genes=num_genes,
-#                            sol_per_pop=20,
-#                            parent_selection_type=parent_selection_type,
-#                            keep_parents=keep_parents,
-#                            crossover_type=crossover_type,
-#                            mutation_type=mutation_type,
-#                            mutation_percent_genes=mutation_percent_genes,
-#                            gene_space=gene_space,
-#                            save_solutions=True)
-#
-# ga_instance.run()
-# ga_instance.save("Bezier Test")
-# ga_instance.plot_fitness()
-# solution, solution_fitness, solution_idx = ga_instance.best_solution()
-# print("Parameters of the best solution : {solution}".format(solution=solution))
-# print("Fitness value of the best solution = {solution_fitness}".format(solution_fitness=solution_fitness))
-# print("Index of the best solution : {solution_idx}".format(solution_idx=solution_idx))
-# GATools.animateGA('Bezier Test', 'bezierLDmax', 'BEZIER')
+    with evaluator:
+        fitness = evaluator
+        if args.surrogate:
+            # Surrogate-assisted evaluation, only the most promising ~40 % of each generation reaches XFOIL
+            from Surrogate import SurrogateEvaluator
+            fitness = SurrogateEvaluator(evaluator, gene_space)
+        GATools.runGA(gene_space, fitness, args.name, **options)
+
+    if args.animate:
+        GATools.animateGA(args.name, f"{args.name} Anim", args.method, historyDir=args.history)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Airfoil optimisation with XFOIL and a genetic algorithm")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    optimizeParser = commands.add_parser('optimize', help="run the L/D max GA")
+    optimizeParser.add_argument('name', nargs='?', default='New XFOIL test', help="GA name, used for the pygad save file")
+    optimizeParser.add_argument('--method', choices=('PARSEC', 'BEZIER'), default='PARSEC', help="airfoil parametrization")
+    optimizeParser.add_argument('--generations', type=int, default=100)
+    optimizeParser.add_argument('--population', type=int, default=50)
+    optimizeParser.add_argument('--workers', type=int, default=None, help="evaluation processes (default one per core)")
+    optimizeParser.add_argument('--serial', action='store_true', help="evaluate the solutions one at a time in this process")
+    optimizeParser.add_argument('--islands', type=int, help="evolve this many populations in parallel, with migration (name is the run directory)")
+    optimizeParser.add_argument('--topology', choices=('ring', 'full'), default='ring', help="island migration topology")
+    optimizeParser.add_argument('--migrate-every', type=int, default=5, help="generations between island migrations")
+    optimizeParser.add_argument('--migrants', type=int, default=2, help="individuals sent to each neighbouring island")
+    optimizeParser.add_argument('--migration-timeout', type=float, help="seconds an island waits for migrants (default twice its generation time)")
+    optimizeParser.add_argument('--serve', metavar='HOST:PORT', help="evaluate on remote workers connecting to this address (e.g. 0.0.0.0:50000)")
+    optimizeParser.add_argument('--authkey', help="secret key for --serve workers (default $AIRFOIL_AUTHKEY, else a generated one)")
+    optimizeParser.add_argument('--surrogate', action='store_true', help="send only surrogate-selected candidates to XFOIL")
+    optimizeParser.add_argument('--multi-fidelity', type=float, metavar='FRACTION',
+                                help="solve every candidate at low resolution and this share of each generation at full fidelity")
+    optimizeParser.add_argument('--cache', default='polarCache.sqlite', help="polar cache file ('' to run without one)")
+    optimizeParser.add_argument('--history', help="directory to stream the run history and checkpoints to")
+    optimizeParser.add_argument('--resume', action='store_true', help="continue from the last checkpoint in --history")
+    optimizeParser.add_argument('--stall', type=int, help="stop after this many generations without improvement")
+    optimizeParser.add_argument('--refine', choices=('L-BFGS-B', 'SLSQP'), help="polish the best shape with a gradient-based optimiser")
+    optimizeParser.add_argument('--refine-evaluations', type=int, default=300, help="solver budget of --refine")
+    optimizeParser.add_argument('--metrics', help="per-generation instrumentation file (.jsonl or .csv)")
+    optimizeParser.add_argument('--profile', type=int, help="generation to run under cProfile, pool workers included (with --metrics)")
+    optimizeParser.add_argument('--animate', action='store_true', help="render the animation when the run finishes")
+    optimizeParser.add_argument('--verbose', '-v', action='store_true', help="print the per-generation evaluation, screening and deduplication lines")
+
+    animateParser = commands.add_parser('animate', help="render a GA run to a GIF or MP4")
+    animateParser.add_argument('name', help="GA name (pygad save file)")
+    animateParser.add_argument('output', help="output file name, without extension")
+    animateParser.add_argument('--method', choices=('PARSEC', 'BEZIER'), default='PARSEC')
+    animateParser.add_argument('--history', help="take the solutions from this history directory")
+    animateParser.add_argument('--frames', choices=('all', 'best', 'every'), default='all')
+    animateParser.add_argument('--every', type=int, default=10, help="solution stride for --frames every")
+    animateParser.add_argument('--workers', type=int, default=None, help="rendering processes (default one per core)")
+    animateParser.add_argument('--format', choices=('gif', 'mp4'), default='gif')
+
+    exportParser = commands.add_parser('export-dat', help="write the best solution of a GA run to a .dat file")
+    exportParser.add_argument('name', help="GA name (pygad save file)")
+    exportParser.add_argument('foilName', help=".dat file name, without extension")
+    exportParser.add_argument('--method', choices=('PARSEC', 'BEZIER'), default='PARSEC')
+
+    jobsParser = commands.add_parser('jobs', help="run the optimisation studies of a job spec (see Jobs.py)")
+    jobsParser.add_argument('spec', help="job spec, .json or .toml")
+    jobsParser.add_argument('--cores', type=int, default=None, help="core budget shared by the studies (default the spec's, else every core)")
+    jobsParser.add_argument('--poll', type=float, default=10, help="seconds between progress reports")
+
+    workerParser = commands.add_parser('worker', help="solve XFOIL runs for an 'optimize --serve' coordinator")
+    workerParser.add_argument('address', metavar='HOST:PORT', help="coordinator address")
+    workerParser.add_argument('--processes', type=int, default=None, help="worker processes on this machine (default one per core)")
+    workerParser.add_argument('--authkey', help="the coordinator's key (default $AIRFOIL_AUTHKEY)")
+
+    commands.add_parser('bench', help="hot-path benchmarks (takes the options of benchmarks/bench.py)")
+
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != 'bench':
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.command == 'optimize':
+        optimize(args)
+    elif args.command == 'animate':
+        GATools.animateGA(args.name, args.output, args.method, historyDir=args.history, frames=args.frames,
+                          every=args.every, nWorkers=args.workers, fileFormat=args.format)
+    elif args.command == 'export-dat':
+        GATools.createDAT(args.name, args.method, args.foilName)
+    elif args.command == 'jobs':
+        from Jobs import Scheduler, loadSpec
+        status = Scheduler(loadSpec(args.spec), cores=args.cores, pollInterval=args.poll).run()
+        return 0 if all(job['state'] == 'done' for job in status.values()) else 1
+    elif args.command == 'worker':
+        from Distributed import runWorkers, parseAddress, DEFAULT_AUTHKEY
+        authkey = args.authkey or DEFAULT_AUTHKEY
+        if not authkey:
+            sys.exit("worker needs the coordinator's --authkey (or $AIRFOIL_AUTHKEY)")
+        runWorkers(parseAddress(args.address), authkey, args.processes)
+    elif args.command == 'bench':
+        from benchmarks.bench import main as bench
+        return bench(extra)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FAKE_XFOIL = os.path.join(ROOT, 'benchmarks', 'fakeXfoil.py')
+
+
+@pytest.fixture
+def foilDir(tmp_path, monkeypatch):
+    # Scratch directory holding a NACA-like foil.dat, with the fake xfoil's knobs reset
+    for name in ('FAKE_XFOIL_LATENCY', 'FAKE_XFOIL_POINT_LATENCY', 'FAKE_XFOIL_MIN_ALPHA', 'FAKE_XFOIL_MAX_POLARS'):
+        monkeypatch.delenv(name, raising=False)
+    x = 0.5 * (1 - np.cos(np.linspace(0, np.pi, 40)))
+    y = 0.6 * (0.2969*np.sqrt(x) - 0.126*x - 0.3516*x**2 + 0.2843*x**3 - 0.1015*x**4)
+    with open(tmp_path / 'foil.dat', 'w') as f:
+        f.write("foil\n")
+        for xi, yi in zip(np.concatenate((x[::-1], x[1:])), np.concatenate((y[::-1], -y[1:]))):
+            f.write(f"{xi:.5f} {yi:.5f}\n")
+    return tmp_path
@@ -0,0 +1,41 @@
+import numpy as np
+
+from BEZIER.Bezier import BEZIER_GENE_SPACE, BEZIERbatch, BEZIERfoil, listToCP, quadraticBezier
+
+
+def randomGenes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    genes = np.empty((n, len(BEZIER_GENE_SPACE)))
+    for j, space in enumerate(BEZIER_GENE_SPACE):
+        genes[:, j] = space[0] if isinstance(space, list) else space['low'] + (space['high'] - space['low']) * rng.random(n)
+    return genes
+
+
+def scalarFoil(controlPoints, numPoints):
+    # One quadratic segment at a time, between control-point midpoints (the list-based construction)
+    t = np.arange(numPoints) / numPoints
+    mid = [(controlPoints[i] + controlPoints[i + 1]) / 2 for i in range(len(controlPoints) - 1)]
+    segments = [[controlPoints[0], controlPoints[1], mid[1]]]
+    segments += [[mid[i], controlPoints[i + 1], mid[i + 1]] for i in range(1, len(controlPoints) - 3)]
+    segments.append([mid[-2], controlPoints[-2], controlPoints[-1]])
+    curve = [point for segment in segments for point in zip(*quadraticBezier(t, segment))] + [tuple(controlPoints[-1])]
+    return np.array(curve).T
+
+
+def test_batch_matches_the_segment_construction():
+    genes = randomGenes(10)
+    for numPoints in (4, 16):
+        X, Y = BEZIERbatch(genes, numPoints)
+        assert X.shape == Y.shape == (10, 9 * numPoints + 1)
+        for i, foilGenes in enumerate(genes):
+            XRef, YRef = scalarFoil(listToCP(foilGenes), numPoints)
+            assert np.allclose(X[i], XRef) and np.allclose(Y[i], YRef)
+
+
+def test_BEZIERfoil_takes_pairs_or_genes():
+    genes = randomGenes(1, seed=1)[0]
+    X, Y = BEZIERfoil(genes, 16)
+    XPairs, YPairs = BEZIERfoil(listToCP(genes).tolist(), 16)
+    assert np.array_equal(X, XPairs) and np.array_equal(Y, YPairs)
+    # The curve ends on the trailing edge control points
+    assert (X[0], Y[0]) == tuple(genes[:2]) and (X[-1], Y[-1]) == tuple(genes[-2:])
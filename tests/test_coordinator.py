@@ -0,0 +1,63 @@
+import threading
+import time
+
+from Distributed import Coordinator
+
+
+def test_tasks_are_leased_in_order():
+    coordinator = Coordinator()
+    worker = coordinator.register('w')
+    taskIds = coordinator.submit(['t0', 't1'])
+    assert coordinator.getTask(worker, timeout=0) == (taskIds[0], 't0')
+    assert coordinator.getTask(worker, timeout=0) == (taskIds[1], 't1')
+    assert coordinator.getTask(worker, timeout=0) is None
+    assert coordinator.status() == {'workers': 1, 'pending': 0, 'leased': 2, 'requeued': 0}
+
+
+def test_leave_requeues_to_the_front():
+    coordinator = Coordinator()
+    first, second = coordinator.register('a'), coordinator.register('b')
+    taskIds = coordinator.submit(['t0', 't1', 't2'])
+    coordinator.getTask(first, timeout=0)
+    coordinator.leave(first)
+    assert coordinator.getTask(second, timeout=0) == (taskIds[0], 't0')
+    assert coordinator.getTask(first, timeout=0) is None
+    assert coordinator.heartbeat(first) is False
+    assert coordinator.status()['requeued'] == 1
+
+
+def test_reap_drops_silent_workers():
+    coordinator = Coordinator(leaseTimeout=0.1)
+    lost, alive = coordinator.register('lost'), coordinator.register('alive')
+    taskIds = coordinator.submit(['t0'])
+    coordinator.getTask(lost, timeout=0)
+    time.sleep(0.2)
+    assert coordinator.heartbeat(alive)
+    coordinator.reap()
+    assert coordinator.status()['workers'] == 1
+    assert coordinator.getTask(alive, timeout=0) == (taskIds[0], 't0')
+
+    # A late result from the lost worker still counts, and the re-leased copy is not handed out twice
+    coordinator.putResult(lost, taskIds[0], 'late')
+    coordinator.putResult(alive, taskIds[0], 'again')
+    assert coordinator.collect(taskIds) == ['late']
+
+
+def test_collect_waits_and_returns_in_order():
+    coordinator = Coordinator(leaseTimeout=5)
+    taskIds = coordinator.submit([1, 2, 3])
+
+    def work():
+        worker = coordinator.register('w')
+        while True:
+            leased = coordinator.getTask(worker, timeout=0.5)
+            if leased is None:
+                return
+            taskId, task = leased
+            coordinator.putResult(worker, taskId, task * 10)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    assert coordinator.collect(taskIds) == [10, 20, 30]
+    thread.join()
+    assert coordinator.tasks == {} and coordinator.results == {}
@@ -0,0 +1,66 @@
+import numpy as np
+
+from Evaluator import Deduplicator, geometryKeys
+
+
+def test_geometryKeys_match_written_precision():
+    X = np.array([[0.0, 0.5, 1.0], [0.0, 0.5, 1.0], [0.0, 0.5, 1.0]])
+    Y = np.array([[0.0, 0.1, 0.0], [-0.0, 0.1 + 1e-8, 0.0], [0.0, 0.2, 0.0]])
+    keys = geometryKeys(X, Y)
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+
+
+def test_plan_within_batch_and_earlier():
+    dedup = Deduplicator()
+    solve, known, repeats = dedup.plan(['a', 'b', 'a', 'c'], range(4))
+    assert solve == [0, 1, 3]
+    assert known == []
+    assert repeats == [(2, 0)]
+
+    dedup.remember('a', 1.5)
+    solve, known, repeats = dedup.plan(['a', 'd', 'd'], range(3))
+    assert solve == [1]
+    assert known == [(0, 1.5)]
+    assert repeats == [(2, 1)]
+    assert dedup.history[-1] == {'candidates': 3, 'withinBatch': 1, 'earlier': 1}
+    assert dedup.report().startswith("DEDUPLICATION: 2/3 duplicates")
+
+
+def test_index_drops_least_recently_used():
+    dedup = Deduplicator(maxEntries=2)
+    dedup.remember('a', 1)
+    dedup.remember('b', 2)
+    assert dedup.lookup('a') == 1
+    dedup.remember('c', 3)
+    assert dedup.lookup('b') is None
+    assert dedup.lookup('a') == 1 and dedup.lookup('c') == 3
+
+
+def test_pickled_index_is_empty():
+    import pickle
+    dedup = Deduplicator()
+    dedup.remember('a', 1)
+    assert pickle.loads(pickle.dumps(dedup)).lookup('a') is None
+
+
+def test_failed_shapes_are_solved_again():
+    from Evaluator import SerialEvaluator
+
+    calls = []
+
+    def flaky(solution, foilName):
+        # Times out on its first run
+        calls.append(foilName)
+        return 0.0 if len(calls) == 1 else 2.0
+
+    evaluator = SerialEvaluator(flaky, geometry=lambda genes: (genes[:, :2], genes[:, 2:]))
+    solutions = np.array([[0.0, 0.5, 0.1, 0.2], [0.0, 0.5, 0.1, 0.2]])
+    fitness, _ = evaluator.evaluate(solutions, ['a', 'b'])
+    assert list(fitness) == [0.0, 0.0] and len(calls) == 1
+
+    fitness, _ = evaluator.evaluate(solutions, ['c', 'd'])
+    assert list(fitness) == [2.0, 2.0] and len(calls) == 2
+
+    fitness, _ = evaluator.evaluate(solutions, ['e', 'f'])
+    assert list(fitness) == [2.0, 2.0] and len(calls) == 2
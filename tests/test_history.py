@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pytest
+
+import GATools
+from Evaluator import SerialEvaluator
+from History import RunHistory, chunkFiles, loadCheckpoint, loadHistory
+
+GENE_SPACE = [{'low': 0, 'high': 1}] * 3
+
+
+def sphere(solution, foilName, workDir=None):
+    return 1 / (1 + np.sum((np.asarray(solution) - 0.5)**2)), {'distance': float(np.sum(np.abs(solution)))}
+
+
+class Interrupt(Exception):
+    pass
+
+
+def crashAt(generation):
+    def onGeneration(ga_instance):
+        if ga_instance.generations_completed == generation:
+            raise Interrupt()
+    return onGeneration
+
+
+def run(directory, resume=False, onGeneration=None):
+    return GATools.runGA(GENE_SPACE, SerialEvaluator(sphere), os.path.join(directory, 'run'), numGenerations=10,
+                         solPerPop=6, onGeneration=onGeneration, resume=resume, plot=False,
+                         history=RunHistory(os.path.join(directory, 'history'), checkpointEvery=3))
+
+
+def test_history_is_streamed_in_chunks(tmp_path):
+    run(str(tmp_path))
+    history = loadHistory(str(tmp_path / 'history'))
+    assert list(history['generation']) == list(range(11))
+    assert history['genes'].shape == (11, 6, 3)
+    assert history['fitness'].shape == history['distance'].shape == (11, 6)
+    assert len(chunkFiles(str(tmp_path / 'history'))) == 4
+    checkpoint = loadCheckpoint(str(tmp_path / 'history'))
+    assert checkpoint['finished'] and checkpoint['generation'] == 10
+
+
+def test_resume_after_a_crash(tmp_path):
+    with pytest.raises(Interrupt):
+        run(str(tmp_path), onGeneration=crashAt(7))
+    checkpoint = loadCheckpoint(str(tmp_path / 'history'))
+    assert not checkpoint['finished'] and checkpoint['generation'] == 5
+
+    ga_instance = run(str(tmp_path), resume=True)
+    assert ga_instance.generations_completed == 10
+    history = loadHistory(str(tmp_path / 'history'))
+    # Generations past the checkpoint are recorded once, by the resumed run
+    assert list(history['generation']) == list(range(11))
+    assert np.array_equal(history['genes'][5], checkpoint['population'])
+    assert not [name for name in os.listdir(tmp_path / 'history') if name.endswith('.tmp')]
+
+    # A finished run is not run again
+    assert run(str(tmp_path), resume=True) is None
+
+
+def test_without_resume_the_history_starts_over(tmp_path):
+    with pytest.raises(Interrupt):
+        run(str(tmp_path), onGeneration=crashAt(7))
+    run(str(tmp_path))
+    assert list(loadHistory(str(tmp_path / 'history'))['generation']) == list(range(11))
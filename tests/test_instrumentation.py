@@ -0,0 +1,55 @@
+import json
+import os
+import pstats
+
+import numpy as np
+import pytest
+
+import GATools
+import Instrumentation
+from Evaluator import PoolEvaluator
+
+GENE_SPACE = [{'low': 0, 'high': 1}] * 3
+
+
+def distinctiveWork(solution):
+    with Instrumentation.stage('solve'):
+        return 1 / (1 + np.sum((np.asarray(solution) - 0.5)**2))
+
+
+def candidate(solution, foilName, workDir=None):
+    Instrumentation.count('evaluations')
+    return distinctiveWork(solution)
+
+
+@pytest.fixture
+def instrumented(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    Instrumentation.disable()
+    Instrumentation.profileGeneration = None
+    Instrumentation.drain()
+
+
+def test_stage_and_count_are_no_ops_while_disabled():
+    Instrumentation.disable()
+    with Instrumentation.stage('solve'):
+        Instrumentation.count('evaluations')
+    assert Instrumentation.drain() == {'stages': {}, 'counters': {}}
+
+
+def test_profiled_generation_covers_the_pool_workers(instrumented):
+    Instrumentation.enable('metrics.jsonl', profile=2)
+    with PoolEvaluator(candidate, nWorkers=2) as evaluator:
+        GATools.runGA(GENE_SPACE, evaluator, 'run', numGenerations=3, solPerPop=6,
+                      onGeneration=Instrumentation.onGeneration, plot=False)
+
+    with open('metrics.jsonl') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['generation'] for row in rows] == [1, 2, 3]
+    # The worker totals come back to this process
+    assert all(row['evaluations'] > 0 and row['solveCalls'] == row['evaluations'] for row in rows)
+
+    assert sorted(name for name in os.listdir('.') if name.endswith('.prof')) == ['profile_gen2.prof']
+    functions = {function for _, _, function in pstats.Stats('profile_gen2.prof').stats}
+    assert 'distinctiveWork' in functions
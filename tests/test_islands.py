@@ -0,0 +1,71 @@
+import queue
+
+import numpy as np
+import pytest
+
+import GATools
+from Evaluator import SerialEvaluator
+from History import RunHistory
+from Islands import Migration, neighbours
+
+GENE_SPACE = [{'low': 0, 'high': 1}] * 3
+
+
+def sphere(solution, foilName, workDir=None):
+    return 1 / (1 + np.sum((np.asarray(solution) - 0.5)**2))
+
+
+class Interrupt(Exception):
+    pass
+
+
+def interruptAt(generation):
+    def onGeneration(ga_instance):
+        if ga_instance.generations_completed == generation:
+            raise Interrupt()
+    return onGeneration
+
+
+def test_neighbours():
+    assert neighbours(0, 3, 'ring') == [1]
+    assert neighbours(2, 3, 'ring') == [0]
+    assert neighbours(1, 3, 'full') == [0, 2]
+    assert neighbours(0, 1, 'ring') == []
+    with pytest.raises(ValueError):
+        neighbours(0, 3, 'star')
+
+
+def runIsland(tmp_path, onGeneration, resume):
+    return GATools.runGA(GENE_SPACE, SerialEvaluator(sphere), str(tmp_path / 'island'), numGenerations=10, solPerPop=8,
+                         onGeneration=onGeneration, history=RunHistory(str(tmp_path / 'history'), checkpointEvery=5),
+                         resume=resume, plot=False)
+
+
+def test_migration_continues_after_resume(tmp_path):
+    # Island 0 of two, its neighbour's migrants already waiting in its inbox
+    inboxes = [queue.Queue(), queue.Queue()]
+    for generation in range(2, 10, 2):
+        inboxes[0].put((1, generation, np.full((2, 3), 0.5), np.array([1.0, 1.0])))
+
+    with pytest.raises(Interrupt):
+        runIsland(tmp_path, interruptAt(7), resume=False)
+
+    migration = Migration(0, inboxes, migrateEvery=2, timeout=1)
+    ga_instance = runIsland(tmp_path, migration, resume=True)
+    assert ga_instance.generations_completed == 10
+
+    sent = []
+    while not inboxes[1].empty():
+        sent.append(inboxes[1].get()[1])
+    # Resumed from the checkpoint at generation 5; nothing is sent at the last generation
+    assert sent == [6, 8]
+    assert migration.received > 0
+    assert np.max(ga_instance.last_generation_fitness) == 1.0
+
+
+def test_migration_skips_the_last_generation(tmp_path):
+    inboxes = [queue.Queue(), queue.Queue()]
+    migration = Migration(0, inboxes, migrateEvery=5, timeout=0.1)
+    GATools.runGA(GENE_SPACE, SerialEvaluator(sphere), str(tmp_path / 'island'), numGenerations=10, solPerPop=8,
+                  onGeneration=migration, plot=False)
+    assert inboxes[1].qsize() == 1
@@ -0,0 +1,60 @@
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from conftest import FAKE_XFOIL
+from Jobs import JOB_DEFAULTS, LDatCL, resolveJobs, runStudy
+from xfoil import AirfoilPolar
+
+
+def test_resolveJobs_fills_defaults_and_checks_objectives():
+    jobs = resolveJobs({'defaults': {'Re': 2e6}, 'jobs': [{'name': 'a'}, {'name': 'b', 'parametrization': 'BEZIER'}]})
+    assert jobs[0]['Re'] == 2e6 and jobs[0]['objective'] == JOB_DEFAULTS['objective']
+    assert len(jobs[0]['gene_space']) == 11 and len(jobs[1]['gene_space']) == 22
+    with pytest.raises(ValueError):
+        resolveJobs({'jobs': [{'name': 'a', 'objective': 'LDatCL'}]})
+
+
+def test_LDatCL_interpolates_the_pre_stall_branch():
+    polar = AirfoilPolar.fromArray(np.array([[0, 0.2, 0.01, 0, 0, 0, 0],
+                                             [2, 0.4, 0.01, 0, 0, 0, 0],
+                                             [4, 0.3, 0.02, 0, 0, 0, 0]], dtype=float))
+    assert np.isclose(LDatCL(polar, 0.3), 30)
+    assert np.isnan(LDatCL(polar, 0.5))
+    assert np.isnan(LDatCL(None, 0.3))
+
+
+def studyIn(directory, job):
+    # runStudy redirects its output, so it runs in its own process as under the Scheduler
+    os.chdir(directory)
+    runStudy(job, os.path.join(directory, job['name']), 1, os.path.join(directory, 'cache.sqlite'))
+
+
+def runStudyProcess(directory, job):
+    process = multiprocessing.Process(target=studyIn, args=(str(directory), job))
+    process.start()
+    process.join(120)
+    assert process.exitcode == 0
+    with open(directory / job['name'] / 'result.json') as f:
+        return json.load(f)
+
+
+def test_runStudy_writes_the_result_even_if_the_best_foil_fails(tmp_path, monkeypatch):
+    monkeypatch.delenv('FAKE_XFOIL_LATENCY', raising=False)
+    os.symlink(FAKE_XFOIL, tmp_path / 'xfoil')
+    job = resolveJobs({'jobs': [{'name': 'study', 'generations': 2, 'population': 6, 'alpha': [0, 4, 1]}]})[0]
+    result = runStudyProcess(tmp_path, job)
+    assert result['bestFitness'] > 0
+    assert result['metrics']['LDmax'] > 0
+    assert 'error' not in result
+
+    # A finished study run again solves its best foil again, here with no solver to start
+    os.remove(tmp_path / 'xfoil')
+    os.remove(tmp_path / 'cache.sqlite')
+    result = runStudyProcess(tmp_path, {**job, 'resume': True})
+    assert result['bestFitness'] > 0
+    assert np.isnan(result['metrics']['LDmax'])
+    assert 'error' in result
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from Evaluator import SerialEvaluator
+from LocalSearch import Refinement, refine
+
+GENE_SPACE = [{'low': 0, 'high': 1}, {'low': 0, 'high': 1}, [0.3]]
+
+
+def peak(solution, foilName, workDir=None):
+    return 10 - 20 * ((solution[0] - 0.6)**2 + (solution[1] - 0.3)**2)
+
+
+def failsRight(solution, foilName, workDir=None):
+    # No converged polar past x = 0.7
+    return 0.0 if solution[0] > 0.7 else peak(solution, foilName)
+
+
+@pytest.mark.parametrize('method', ['L-BFGS-B', 'SLSQP'])
+def test_refine_climbs_to_the_peak(method):
+    start = np.array([0.2, 0.7, 0.3])
+    genes, fitness, evaluations = refine(SerialEvaluator(peak), GENE_SPACE, start, peak(start, ''), method,
+                                         maxEvaluations=200)
+    assert np.allclose(genes[:2], [0.6, 0.3], atol=0.02)
+    assert genes[2] == 0.3
+    assert fitness > peak(start, '')
+    assert evaluations <= 200
+
+
+def test_budget_is_respected():
+    refinement = Refinement(SerialEvaluator(peak), GENE_SPACE, maxEvaluations=10)
+    genes, fitness = refinement.run([0.1, 0.9, 0.3], method='L-BFGS-B')
+    assert refinement.evaluations <= 10
+    assert fitness == max(refinement.seen.values())
+
+
+def test_failed_steps_are_retried_on_the_other_side():
+    refinement = Refinement(SerialEvaluator(failsRight), GENE_SPACE, step=0.01, maxEvaluations=20)
+    value, gradient = refinement.objective(np.array([0.695, 0.5]), np.array([0.0, 0.0, 0.3]))
+    assert value < 0
+    # The forward step in x fails, so x's slope comes from the backward step (fitness rises
+    # towards x = 0.6, so the slope of -fitness is positive)
+    assert gradient[0] > 0
+    assert refinement.evaluations == 4
+
+
+def test_never_worse_than_the_start():
+    start = np.array([0.6, 0.3, 0.3])
+    genes, fitness, _ = refine(SerialEvaluator(failsRight), GENE_SPACE, start, peak(start, ''), maxEvaluations=30)
+    assert fitness >= peak(start, '')
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        Refinement(SerialEvaluator(peak), GENE_SPACE).run([0.5, 0.5, 0.3], method='Nelder-Mead')
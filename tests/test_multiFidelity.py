@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from Evaluator import SerialEvaluator
+from MultiFidelity import MultiFidelityEvaluator
+
+
+def fullFitness(solution, foilName, workDir=None):
+    # Fails (fitness 0) on solution[1] > 0.9
+    value = 0.0 if solution[1] > 0.9 else 2 * solution[0] + 1
+    return value, {'LDmax': value}
+
+
+def cheapFitness(solution, foilName, workDir=None):
+    return solution[0] + 0.1, {'LDmax': solution[0] + 0.1}
+
+
+def makeEvaluator(**options):
+    return MultiFidelityEvaluator(SerialEvaluator(cheapFitness), SerialEvaluator(fullFitness), **options)
+
+
+def batch(population, generation=1):
+    return SimpleNamespace(population=population, generations_completed=generation)
+
+
+def test_calibration_maps_cheap_onto_full():
+    rng = np.random.default_rng(0)
+    evaluator = makeEvaluator(fullFraction=0.5)
+    population = np.column_stack((rng.random(10), 0.5 * rng.random(10)))
+    fitness = np.array(evaluator(batch(population), population, None))
+
+    slope, intercept = evaluator.calibration()
+    assert np.isclose(slope, 2) and np.isclose(intercept, 0.8)
+    # The best half is solved at full fidelity, the rest calibrated and capped below them
+    ranked = np.argsort(population[:, 0])[::-1]
+    assert np.allclose(fitness[ranked[:5]], 2 * population[ranked[:5], 0] + 1)
+    assert np.all(fitness[ranked[5:]] <= fitness[ranked[:5]].min())
+    assert np.isclose(evaluator.history[-1]['rankCorrelation'], 1)
+
+
+def test_failed_full_runs_keep_the_previous_cap():
+    evaluator = makeEvaluator(fullFraction=0.5)
+    population = np.column_stack((np.linspace(0.1, 0.8, 8), np.full(8, 0.5)))
+    evaluator(batch(population), population, None)
+    cap = evaluator.cap
+
+    # Every promoted candidate fails at full fidelity
+    population = np.column_stack((np.linspace(0.1, 0.8, 8), [0.5] * 4 + [0.95] * 4))
+    fitness = np.array(evaluator(batch(population, 2), population, None))
+    assert evaluator.cap == cap
+    assert np.all(fitness[4:] == 0)
+    assert np.all((fitness[:4] > 0) & (fitness[:4] <= cap))
+    assert len(evaluator.cheapFitness) == 4
+    assert np.isnan(evaluator.history[-1]['rankCorrelation'])
+
+
+def test_summary_prefers_full_fidelity_metrics():
+    evaluator = makeEvaluator(fullFraction=0.25, minFull=1)
+    population = np.column_stack((np.linspace(0.1, 0.8, 4), np.full(4, 0.5)))
+    ga_instance = batch(population)
+    evaluator(ga_instance, population, None)
+    metrics = evaluator.summary(ga_instance)
+    assert list(metrics['fullFidelity']) == [0, 0, 0, 1]
+    assert np.isclose(metrics['LDmax'][3], 2 * 0.8 + 1)
+    assert np.isclose(metrics['LDmax'][0], 0.2)
+
+    # Solved at full fidelity before, only cheaply now that a better shape is promoted: its stale
+    # full-fidelity metrics are dropped
+    population = np.vstack((population[3], [[0.9, 0.5], [0.2, 0.5], [0.3, 0.5]]))
+    ga_instance = batch(population, 2)
+    evaluator(ga_instance, population, None)
+    assert list(evaluator.summary(ga_instance)['fullFidelity']) == [0, 1, 0, 0]
+    assert tuple(population[0]) not in evaluator.full.metrics
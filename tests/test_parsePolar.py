@@ -0,0 +1,54 @@
+import numpy as np
+
+from xfoil import parsePolar
+
+
+HEADER = """
+       XFOIL         Version 6.99
+
+ Calculated polar for: test
+
+ 1 1 Reynolds number fixed          Mach number fixed
+
+   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr
+  ------ -------- --------- --------- -------- -------- --------
+"""
+
+
+def writePolar(path, body):
+    with open(path, 'w') as f:
+        f.write(HEADER + body)
+    return str(path)
+
+
+def test_parsePolar_reads_rows(tmp_path):
+    polar = parsePolar(writePolar(tmp_path / 'p.dat',
+                                  "   0.000   0.2500   0.00600   0.00200  -0.0500   0.6000   0.7000\n"
+                                  "   2.000   0.4700   0.00650   0.00220  -0.0500   0.5300   0.7500\n"))
+    assert len(polar) == 2
+    assert np.allclose(polar.alpha, [0, 2])
+    assert np.allclose(polar.CL, [0.25, 0.47])
+    assert np.isclose(polar.LDmax, 0.47 / 0.0065)
+    assert polar.LDmaxAlpha == 2
+
+
+def test_parsePolar_drops_partial_last_line(tmp_path):
+    polar = parsePolar(writePolar(tmp_path / 'p.dat',
+                                  "   0.000   0.2500   0.00600   0.00200  -0.0500   0.6000   0.7000\n"
+                                  "   2.000   0.4700   0.006"))
+    assert len(polar) == 1
+
+
+def test_parsePolar_skips_overflowed_fields(tmp_path):
+    polar = parsePolar(writePolar(tmp_path / 'p.dat',
+                                  "   0.000   0.2500   0.00600   0.00200  -0.0500   0.6000   0.7000\n"
+                                  "   2.000 ********   0.00650   0.00220  -0.0500   0.5300   0.7500\n"))
+    assert len(polar) == 1
+
+
+def test_parsePolar_without_header_is_empty(tmp_path):
+    path = tmp_path / 'p.dat'
+    path.write_text("\n XFOIL\n")
+    polar = parsePolar(str(path))
+    assert len(polar) == 0
+    assert np.isnan(polar.LDmax)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from PARSEC.Parsec import PARSEC_GENE_SPACE, PARSECbatch, PARSECfoil, apress, asuct, cosineSpacing
+
+
+def randomGenes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    low = np.array([space['low'] for space in PARSEC_GENE_SPACE])
+    high = np.array([space['high'] for space in PARSEC_GENE_SPACE])
+    return low + (high - low) * rng.random((n, len(PARSEC_GENE_SPACE)))
+
+
+def scalarFoil(genes, xArr):
+    # Surfaces from the per-foil Csuction/Cpressure systems
+    powers = (np.arange(6) + 1) / 2
+    upper = (asuct(genes)[:, None] * xArr**powers[:, None]).sum(axis=0)
+    lower = (apress(genes)[:, None] * xArr**powers[:, None]).sum(axis=0)
+    return np.concatenate((np.flip(xArr), xArr)), np.concatenate((np.flip(upper), lower))
+
+
+def test_batch_matches_the_scalar_systems():
+    genes = randomGenes(20)
+    for xArr in (np.linspace(0, 1, 75), cosineSpacing(40)):
+        X, Y = PARSECbatch(genes, xArr)
+        assert X.shape == Y.shape == (20, 2 * len(xArr))
+        for i, foilGenes in enumerate(genes):
+            XRef, YRef = scalarFoil(foilGenes, xArr)
+            assert np.allclose(X[i], XRef)
+            assert np.allclose(Y[i], YRef, atol=1e-12)
+
+
+def test_PARSECfoil_is_one_batch_row():
+    genes = randomGenes(3, seed=1)
+    X, Y = PARSECbatch(genes)
+    XFoil, YFoil = PARSECfoil(genes[1])
+    assert np.array_equal(X[1], XFoil) and np.array_equal(Y[1], YFoil)
+
+
+def test_constraints_hold():
+    # Trailing edge offset/thickness and crest heights as specified by the genes
+    genes = randomGenes(5, seed=2)
+    X, Y = PARSECbatch(genes, np.linspace(0, 1, 201))
+    assert np.allclose(Y[:, 0], genes[:, 7] + genes[:, 8] / 2)
+    assert np.allclose(Y[:, -1], genes[:, 7] - genes[:, 8] / 2)
+    assert np.allclose(Y[:, 200], 0) and np.allclose(Y[:, 201], 0)
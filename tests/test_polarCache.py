@@ -0,0 +1,90 @@
+import sqlite3
+
+import numpy as np
+
+from PolarCache import PolarCache, polarKey
+from xfoil import AirfoilPolar
+
+
+def makePolar(CL=0.5):
+    return AirfoilPolar.fromArray(np.array([[0.0, CL, 0.006, 0.002, -0.05, 0.6, 0.7],
+                                            [2.0, CL + 0.2, 0.007, 0.002, -0.05, 0.5, 0.8]]))
+
+
+def test_polarKey_folds_rounding_and_sign():
+    X, Y = np.array([0.0, 0.5, 1.0]), np.array([0.0, 0.1, 0.0])
+    assert polarKey(X, Y, 1e6, True, -5, 15, 1) == polarKey(X + 1e-8, np.array([-0.0, 0.1, -0.0]), 1e6, True, -5, 15, 1)
+    assert polarKey(X, Y, 1e6, True, -5, 15, 1) != polarKey(X, Y, 2e6, True, -5, 15, 1)
+
+
+def test_get_put_memory_and_disk(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = PolarCache(path)
+    assert cache.get('a') == (False, None)
+    cache.put('a', makePolar())
+    hit, polar = cache.get('a')
+    assert hit and np.allclose(polar.CL, [0.5, 0.7])
+    cache.close()
+
+    # A fresh cache only has the disk store
+    cache = PolarCache(path)
+    hit, polar = cache.get('a')
+    assert hit and np.allclose(polar.CL, [0.5, 0.7])
+    cache.get('a')
+    assert cache.stats()['diskHits'] == 1 and cache.stats()['memoryHits'] == 1
+    cache.close()
+
+
+def test_memory_lru_is_bounded(tmp_path):
+    cache = PolarCache(str(tmp_path / 'cache.sqlite'), memoryEntries=2)
+    for key in 'abc':
+        cache.put(key, makePolar())
+    assert list(cache.memory) == ['b', 'c']
+    assert cache.get('a')[0]
+    cache.close()
+
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    cache = PolarCache(str(tmp_path / 'cache.sqlite'), memoryEntries=1, maxEntries=10)
+    for i in range(10):
+        cache.put(f"k{i}", makePolar())
+    cache.connect().execute("UPDATE polars SET lastUsed = lastUsed + 100 WHERE key = 'k0'")
+    cache.put('k10', makePolar())
+    assert cache.evictions == 2
+    assert cache.rows == 9
+    assert cache.get('k0')[0]
+    assert not cache.get('k1')[0]
+    cache.close()
+
+
+def test_failures_are_cached_on_disk_until_they_expire(tmp_path):
+    cache = PolarCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('bad', None)
+    assert cache.get('bad') == (True, None)
+    assert 'bad' not in cache.memory
+
+    cache.connect().execute("UPDATE polars SET failedAt = failedAt - 7200 WHERE key = 'bad'")
+    assert cache.get('bad') == (False, None)
+    cache.close()
+
+
+def test_failures_not_cached_without_ttl(tmp_path):
+    cache = PolarCache(str(tmp_path / 'cache.sqlite'), failureTTL=None)
+    cache.put('bad', None)
+    assert cache.get('bad') == (False, None)
+    cache.close()
+
+
+def test_old_schema_drops_failures(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE polars (key TEXT PRIMARY KEY, data BLOB, lastUsed REAL)")
+    connection.execute("INSERT INTO polars VALUES ('bad', NULL, 0)")
+    connection.commit()
+    connection.close()
+
+    cache = PolarCache(path)
+    assert cache.get('bad') == (False, None)
+    cache.put('good', makePolar())
+    assert PolarCache(path).get('good')[0]
+    cache.close()
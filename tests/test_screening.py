@@ -0,0 +1,85 @@
+import numpy as np
+
+from PARSEC.Parsec import PARSECbatch, cosineSpacing
+from Screening import Screener, batchInterp, leadingEdgeRadius, screenGeometry, selfIntersecting, splitSurfaces
+
+GOOD = np.array([0.015, 0.4, 0.07, -0.4, 0.3, -0.06, 0.3, 0.01, 0.002, -2, 2])
+
+
+def ellipse(a=1.0, b=0.1, n=81):
+    # Closed ellipse over x in [0, 1], upper surface first; leading-edge radius b**2/(a/2)
+    theta = np.linspace(0, 2 * np.pi, n)
+    return 0.5 + 0.5 * a * np.cos(theta), b * np.sin(theta)
+
+
+def test_batchInterp_matches_np_interp():
+    rng = np.random.default_rng(0)
+    xp = np.sort(rng.random((5, 12)), axis=1)
+    fp = rng.random((5, 12))
+    xq = rng.random((5, 30)) * 1.4 - 0.2
+    expected = np.array([np.interp(q, x, f) for q, x, f in zip(xq, xp, fp)])
+    assert np.allclose(batchInterp(xq, xp, fp), expected)
+
+
+def test_splitSurfaces_and_radius():
+    X, Y = ellipse()
+    X, Y = X[None], Y[None]
+    xGrid, upper, lower, monotonic = splitSurfaces(X, Y)
+    assert monotonic[0]
+    assert np.allclose(upper[0], -lower[0], atol=1e-3)
+    assert np.isclose((upper - lower).max(), 0.2, atol=1e-3)
+    assert np.isclose(leadingEdgeRadius(X, Y)[0], 0.02, rtol=0.1)
+
+
+def test_valid_foils_pass():
+    X, Y = PARSECbatch(np.tile(GOOD, (3, 1)), cosineSpacing(60))
+    valid, failures = screenGeometry(X, Y, rLE=np.full(3, GOOD[0]))
+    assert valid.all()
+    assert not any(failed.any() for failed in failures.values())
+
+
+def test_broken_foils_fail_their_checks():
+    X, Y = PARSECbatch(np.tile(GOOD, (4, 1)), cosineSpacing(60))
+    Y[0, 5] = np.nan
+    # Lower surface pulled above the upper one mid-chord
+    Y[1, 60 + 30:60 + 35] = 0.2
+    # Open trailing edge
+    Y[2, 0] += 0.05
+
+    valid, failures = screenGeometry(X, Y)
+    assert list(valid) == [False, False, False, True]
+    assert failures['nonFinite'][0]
+    assert failures['negativeThickness'][1] and failures['selfIntersection'][1]
+    assert failures['trailingEdge'][2]
+
+
+def test_design_limits_are_opt_in():
+    X, Y = ellipse(b=0.2)
+    assert screenGeometry(X, Y)[0][0]
+    valid, failures = screenGeometry(X, Y, maxThickness=0.3, maxLERadius=0.05)
+    assert not valid[0]
+    assert failures['thickness'][0] and failures['leadingEdge'][0]
+
+
+def test_leading_edge_radius_against_the_genes():
+    X, Y = PARSECbatch(GOOD[None], cosineSpacing(60))
+    assert screenGeometry(X, Y, rLE=[GOOD[0]])[0][0]
+    assert not screenGeometry(X, Y, rLE=[GOOD[0] * 10])[0][0]
+
+
+def test_selfIntersecting_ignores_the_trailing_edge_join():
+    X, Y = ellipse()
+    assert not selfIntersecting(X[None], Y[None])[0]
+    figureEight = (X[None], (Y * np.sign(X - 0.5))[None])
+    assert selfIntersecting(*figureEight)[0]
+
+
+def test_screener_counts_and_reports():
+    X, Y = PARSECbatch(np.tile(GOOD, (4, 1)), cosineSpacing(60))
+    Y[0, 0] += 0.05
+    screener = Screener(penalty=-1, rLEGene=0)
+    valid = screener.screen(X, Y, np.tile(GOOD, (4, 1)))
+    assert list(valid) == [False, True, True, True]
+    assert (screener.checked, screener.rejected) == (4, 1)
+    assert screener.report().startswith("SCREENING: 1/4 candidates rejected (25%)")
+    assert "trailingEdge: 1 (25%)" in screener.report()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from conftest import FAKE_XFOIL
+from xfoil import XFOILSession
+
+
+def test_session_answers_through_the_sentinel(foilDir):
+    with XFOILSession(FAKE_XFOIL, workDir=str(foilDir), timeout=10) as session:
+        first = session.runPolar('foil.dat', 1e6, "ASEQ 0 4 1")
+        second = session.runPolar('foil.dat', 2e6, "ASEQ 0 2 1")
+        pid = session.process.pid
+    assert np.allclose(first.alpha, [0, 1, 2, 3, 4])
+    assert np.allclose(second.alpha, [0, 1, 2])
+    assert session.process is None
+    # Polar files are cleaned up after each request
+    assert not [name for name in foilDir.iterdir() if name.name.startswith(f"session{pid}")]
+
+
+def test_session_times_out_kills_and_restarts(foilDir, monkeypatch):
+    monkeypatch.setenv('FAKE_XFOIL_POINT_LATENCY', '0.5')
+    session = XFOILSession(FAKE_XFOIL, workDir=str(foilDir), timeout=1)
+    try:
+        assert session.runPolar('foil.dat', 1e6, "ASEQ 0 10 1") is None
+        assert session.process is None
+
+        monkeypatch.setenv('FAKE_XFOIL_POINT_LATENCY', '0')
+        polar = session.runPolar('foil.dat', 1e6, "ASEQ 0 2 1")
+        assert polar is not None and len(polar) == 3
+    finally:
+        session.close()
+
+
+def test_session_recycles_after_maxRequests(foilDir):
+    with XFOILSession(FAKE_XFOIL, workDir=str(foilDir), maxRequests=2) as session:
+        session.runPolar('foil.dat', 1e6, "A 1")
+        pid = session.process.pid
+        session.runPolar('foil.dat', 1e6, "A 1")
+        assert session.process.pid == pid
+        session.runPolar('foil.dat', 1e6, "A 1")
+        assert session.process.pid != pid
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from Surrogate import GaussianProcess, SurrogateEvaluator, geneBounds, rankCorrelation
+
+GENE_SPACE = [{'low': 0, 'high': 1}, {'low': 0, 'high': 1}]
+
+
+def smooth(solutions):
+    return 1 + np.sin(3 * solutions[:, 0]) + solutions[:, 1]
+
+
+class FakeEvaluator:
+    # Batch evaluator failing (fitness 0) on genes[0] > 0.9
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, ga_instance, solutions, solutions_indices):
+        self.last = list(solutions_indices)
+        return list(np.where(solutions[:, 0] > 0.9, 0.0, smooth(solutions)))
+
+
+def test_gaussianProcess_interpolates():
+    rng = np.random.default_rng(0)
+    X = rng.random((40, 2))
+    model = GaussianProcess(noise=1e-6)
+    model.fit(X, smooth(X))
+    mean, std = model.predict(X[:5])
+    assert np.allclose(mean, smooth(X[:5]), atol=1e-3)
+    assert np.all(std < 1e-2)
+
+
+def test_helpers():
+    assert [list(bound) for bound in geneBounds([{'low': 1, 'high': 2}, [3, 0, 5]])] == [[1, 0], [2, 5]]
+    assert rankCorrelation([1, 2, 3], [10, 20, 30]) == 1
+    assert np.isnan(rankCorrelation([1], [1]))
+
+
+def test_failures_neither_train_nor_cap():
+    rng = np.random.default_rng(1)
+    evaluator = FakeEvaluator()
+    surrogate = SurrogateEvaluator(evaluator, GENE_SPACE, evaluateFraction=0.3, exploreFraction=0.1, minTrain=20)
+    ga_instance = SimpleNamespace(generations_completed=0)
+
+    solutions = 0.9 * rng.random((30, 2))
+    solutions[0, 0] = 0.95
+    surrogate(ga_instance, solutions, None)
+    assert len(surrogate.fitness) == 29 and np.all(surrogate.fitness > 0)
+
+    for generation in range(1, 4):
+        ga_instance.generations_completed = generation
+        solutions = 0.9 * rng.random((20, 2))
+        solutions[:2, 0] = 0.95
+        fitness = np.array(surrogate(ga_instance, solutions, None))
+        predicted = np.setdiff1d(np.arange(len(solutions)), evaluator.last)
+        assert len(predicted) == 12
+        # Predicted candidates stay positive, below the weakest successful solve of the batch
+        solved = np.array(fitness)[evaluator.last]
+        assert surrogate.cap == solved[solved > 0].min()
+        assert np.all(fitness[predicted] > 0)
+        assert np.all(fitness[predicted] <= surrogate.cap)
+    assert np.all(surrogate.fitness > 0)
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+
+import Airfoil
+import Instrumentation
+from conftest import FAKE_XFOIL
+from PARSEC.Parsec import PARSECfoil
+
+
+@pytest.fixture
+def foil(foilDir, monkeypatch):
+    # A PARSEC foil, run with the fake xfoil as ./xfoil
+    monkeypatch.chdir(foilDir)
+    os.symlink(FAKE_XFOIL, foilDir / 'xfoil')
+    return PARSECfoil(np.array([0.015, 0.4, 0.07, -0.4, 0.3, -0.06, 0.3, 0.01, 0.002, -2, 2]))
+
+
+@pytest.fixture
+def instrumented():
+    Instrumentation.enable(os.devnull)
+    Instrumentation.drain()
+    yield
+    Instrumentation.disable()
+    Instrumentation.drain()
+
+
+def test_adaptive_sweep_runs_one_process(foil, foilDir, instrumented):
+    X, Y = foil
+    full = Airfoil.runAirfoil(X, Y, 'full', 1e6, -4, 12, 1, workDir=str(foilDir))
+    Instrumentation.drain()
+
+    polar = Airfoil.runAirfoil(X, Y, 'adaptive', 1e6, -4, 12, 1, workDir=str(foilDir), adaptive=True)
+    snapshot = Instrumentation.drain()
+    assert snapshot['stages']['spawn'][1] == 1
+    assert snapshot['counters']['requestedPoints'] < len(full)
+    assert len(polar) < len(full)
+    # Refined down to half the step around the full sweep's best angle
+    assert polar.LDmax >= full.LDmax
+    assert abs(polar.LDmaxAlpha - full.LDmaxAlpha) <= 0.5
+    assert np.all(np.diff(polar.alpha) > 0)
+    assert sorted(os.listdir(foilDir)) == ['foil.dat', 'xfoil']
+
+
+def test_adaptive_sweep_keeps_the_solver_resolution(foil, foilDir):
+    X, Y = foil
+    polar = Airfoil.runAirfoil(X, Y, 'coarse', 1e6, -4, 12, 1, workDir=str(foilDir), adaptive=True, panels=80, maxIter=20)
+    assert polar is not None and np.isfinite(polar.LDmax)
+
+
+def test_conditions_run_in_one_process(foil, foilDir, instrumented, tmp_path):
+    from PolarCache import PolarCache
+
+    X, Y = foil
+    conditions = [(1e6, 0, 8, 1), (3e6, 0, 8, 2), (1e6, 0.2, 0.8, 0.2, 'cl')]
+    cache = PolarCache(str(tmp_path / 'cache.sqlite'))
+    polars = Airfoil.runAirfoilConditions(X, Y, 'multi', conditions, workDir=str(foilDir), cache=cache)
+    assert Instrumentation.drain()['stages']['spawn'][1] == 1
+    assert [len(polars[condition]) for condition in conditions] == [9, 5, 4]
+    # Each condition matches its own single run, and comes from the cache the next time
+    single = Airfoil.runAirfoil(X, Y, 'single', 3e6, 0, 8, 2, workDir=str(foilDir))
+    assert np.array_equal(polars[conditions[1]].data, single.data)
+    Instrumentation.drain()
+    again = Airfoil.runAirfoilConditions(X, Y, 'multi', conditions, workDir=str(foilDir), cache=cache)
+    assert 'spawn' not in Instrumentation.drain()['stages']
+    assert all(np.array_equal(again[condition].data, polars[condition].data) for condition in conditions)
+    cache.close()
+
+
+def test_session_frees_polar_slots(foilDir, monkeypatch):
+    # More polars than XFOIL can store, in one request and over many requests
+    from xfoil import XFOILSession
+
+    monkeypatch.setenv('FAKE_XFOIL_MAX_POLARS', '4')
+    with XFOILSession(FAKE_XFOIL, workDir=str(foilDir), maxRequests=100, maxPolars=3) as session:
+        polars = session.runConditions('foil.dat', [(1e6 + i, "ASEQ 0 2 1") for i in range(10)])
+        assert all(polar is not None and len(polar) == 3 for polar in polars)
+        for _ in range(5):
+            polars = session.runConditions('foil.dat', [(1e6, "ASEQ 0 2 1"), (2e6, "ASEQ 0 2 1")])
+            assert all(polar is not None and len(polar) == 3 for polar in polars)
+
+
+def test_splitHalves():
+    from xfoil import splitHalves
+
+    assert splitHalves(-5, 15, 1) == [(0, 15, 1), (-1, -5, -1)]
+    assert splitHalves(-4.5, 4.5, 1) == [(-0.5, 4.5, 1), (-1.5, -4.5, -1)]
+    assert splitHalves(2, 10, 1) == [(2, 10, 1)]
+
+
+def test_split_sweep_matches_the_full_sweep(foil, foilDir, monkeypatch):
+    from xfoil import XFOILSession
+
+    monkeypatch.setenv('FAKE_XFOIL_MIN_ALPHA', '-10')
+    X, Y = foil
+    full = Airfoil.runAirfoil(X, Y, 'full', 1e6, -5, 10, 1, workDir=str(foilDir))
+    split = Airfoil.runAirfoil(X, Y, 'split', 1e6, -5, 10, 1, workDir=str(foilDir), split=True)
+    assert np.array_equal(split.alpha, full.alpha)
+    assert np.allclose(split.data, full.data)
+
+    with XFOILSession(workDir=str(foilDir)) as session:
+        sessionSplit = Airfoil.runAirfoil(X, Y, 'split', 1e6, -5, 10, 1, session=session, split=True)
+    assert np.allclose(sessionSplit.data, full.data)
+    assert sorted(os.listdir(foilDir)) == ['foil.dat', 'xfoil']
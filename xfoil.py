@@ -6,100 +6,529 @@ Custom tools for running XFOIL
 """
 
 import subprocess
+import threading
+import queue
+import atexit
+import shutil
+import tempfile
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+import Instrumentation
+
 
 class AirfoilPolar:
+    # Polar columns backed by a single (n, 7) array. Derived metrics are computed on first
+    # use; empty polars (nothing converged) give NaN metrics.
+
+    __slots__ = ('data', '_CLCD')
+
+    COLUMNS = ('alpha', 'CL', 'CD', 'CDp', 'CM', 'Top_Xtr', 'Bot_Xtr')
+
     def __init__(self, alpha, CL, CD, CDp, CM, Top_Xtr, Bot_Xtr):
-        self.alpha = alpha
-        self.CL = CL
-        self.CD = CD
-        self.CDp = CDp
-        self.CM = CM
-        self.Top_Xtr = Top_Xtr
-        self.Bot_Xtr = Bot_Xtr
-        self.CLCD = list(np.array(CL)/np.array(CD))
+        self.data = np.column_stack((alpha, CL, CD, CDp, CM, Top_Xtr, Bot_Xtr)).astype(np.float64).reshape(-1, 7)
+        self._CLCD = None
+
+    @classmethod
+    def fromArray(cls, data):
+        polar = cls.__new__(cls)
+        polar.data = np.asarray(data, dtype=np.float64).reshape(-1, 7)
+        polar._CLCD = None
+        return polar
+
+    def __len__(self):
+        return len(self.data)
+
+    alpha = property(lambda self: self.data[:, 0])
+    CL = property(lambda self: self.data[:, 1])
+    CD = property(lambda self: self.data[:, 2])
+    CDp = property(lambda self: self.data[:, 3])
+    CM = property(lambda self: self.data[:, 4])
+    Top_Xtr = property(lambda self: self.data[:, 5])
+    Bot_Xtr = property(lambda self: self.data[:, 6])
+
+    @property
+    def CLCD(self):
+        if self._CLCD is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._CLCD = self.CL / self.CD
+        return self._CLCD
+
+    def _LDmaxIndex(self):
+        return None if np.isnan(self.CLCD).all() else np.nanargmax(self.CLCD)
+
+    @property
+    def CLmax(self):
+        return self.CL.max() if len(self.data) else np.nan
+
+    @property
+    def LDmax(self):
+        index = self._LDmaxIndex()
+        return np.nan if index is None else self.CLCD[index]
+
+    @property
+    def LDmaxAlpha(self):
+        # Angle of attack at L/D max
+        index = self._LDmaxIndex()
+        return np.nan if index is None else self.alpha[index]
+
+    @property
+    def LDmaxLOC(self):
+        # CL at L/D max
+        index = self._LDmaxIndex()
+        return np.nan if index is None else self.CL[index]
+
+    @property
+    def LDpeak(self):
+        # L/D max refined with a parabola through the best point and its neighbours
+        return self._LDpeak()[1]
+
+    @property
+    def LDpeakAlpha(self):
+        # Angle of attack of the refined L/D max
+        return self._LDpeak()[0]
+
+    def _LDpeak(self):
+        index = self._LDmaxIndex()
+        if index is None:
+            return np.nan, np.nan
+        if 0 < index < len(self.data) - 1:
+            alpha, CLCD = self.alpha[index - 1:index + 2], self.CLCD[index - 1:index + 2]
+            if np.isfinite(CLCD).all() and len(np.unique(alpha)) == 3:
+                a, b, c = np.polyfit(alpha, CLCD, 2)
+                if a < 0 and alpha.min() <= -b / (2*a) <= alpha.max():
+                    peakAlpha = -b / (2*a)
+                    return peakAlpha, c - b**2 / (4*a)
+        return self.alpha[index], self.CLCD[index]
+
+    @property
+    def CDmin(self):
+        return self.CD.min() if len(self.data) else np.nan
+
+    @property
+    def CDminLOC(self):
+        # CL at CD min
+        return self.CL[np.argmin(self.CD)] if len(self.data) else np.nan
 
 
 def parsePolar(filename):
+    # Reads the table below the dashed rule of an XFOIL polar file in one pass. A missing
+    # or partial header gives an empty polar; a partially written last line is dropped.
     with open(filename, 'r') as f:
-        lines = f.readlines()[12:]
+        text = f.read()
+
+    rule = text.find('------')
+    if rule < 0:
+        return AirfoilPolar.fromArray(np.empty((0, 7)))
+
+    nColumns = len(text[text.rfind('\n', 0, rule) + 1:].split('\n', 1)[0].split())
+    bodyStart = text.find('\n', rule) + 1
+    body = text[bodyStart:] if bodyStart else ''
+    if not body.endswith('\n'):
+        body = body[:body.rfind('\n') + 1]
+
+    try:
+        values = np.array(body.split(), dtype=np.float64)
+        nRows = len(values) // nColumns
+        data = values[:nRows * nColumns].reshape(nRows, nColumns)
+    except ValueError:
+        # Overflowed fields (e.g. "********"): keep only the rows that parse
+        rows = []
+        for line in body.splitlines():
+            try:
+                row = [float(part) for part in line.split()]
+            except ValueError:
+                continue
+            if len(row) == nColumns:
+                rows.append(row)
+        data = np.array(rows, dtype=np.float64).reshape(-1, nColumns)
 
-    alpha, CL, CD, CDp, CM, Top_Xtr, Bot_Xtr = [], [], [], [], [], [], []
-    for line in lines:
-        parts = line.split()
-        alpha.append(float(parts[0]))
-        CL.append(float(parts[1]))
-        CD.append(float(parts[2]))
-        CDp.append(float(parts[3]))
-        CM.append(float(parts[4]))
-        Top_Xtr.append(float(parts[5]))
-        Bot_Xtr.append(float(parts[6]))
+    return AirfoilPolar.fromArray(data[:, :7])
 
-    return AirfoilPolar(alpha, CL, CD, CDp, CM, Top_Xtr, Bot_Xtr)
 
+def mergePolars(polars):
+    # One polar from several runs over the same foil, sorted by alpha, repeated angles dropped
+    data = [polar.data for polar in polars if polar is not None]
+    if not data:
+        return None
+    data = np.concatenate(data)
+    _, first = np.unique(data[:, 0].round(4), return_index=True)
+    return AirfoilPolar.fromArray(data[first])
 
-def runXFOIL(routine, xfoilPath='./xfoil'):
-    process = subprocess.Popen(xfoilPath, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    stdout, stderr = process.communicate(routine, timeout=15)
 
-    if os.path.exists('polar.dat'):
-        polar = parsePolar('polar.dat')
-        os.remove('polar.dat')
-    else:
-        print(f"Error running XFOIL: {stderr}")
-        polar = None
+def adaptiveAlpha(runCommand, alphaStart, alphaEnd, alphaStep, coarseFactor=4, refineStall=False):
+    # Locates L/D max with a coarse ASEQ pass and then bisects around the best angle, halving
+    # the step each pass down to alphaStep/2 (typically ~12 points instead of the full sweep's 21)
+    #
+    # runCommand   : function (OPER command) -> AirfoilPolar or None, one request per pass (to one
+    #                XFOIL process, see alphaRange and XFOILSession.alphaRange)
+    # coarseFactor : coarse pass step, in multiples of alphaStep
+    # refineStall  : also bisect around CLmax
+    #
+    # Stops early once every bracketing angle has been tried or a pass converges nothing new.
+    # Returns the merged AirfoilPolar (LDpeak/LDpeakAlpha give the refined peak estimate)
+    step = coarseFactor * alphaStep
+    polar = mergePolars([runCommand(f"ASEQ {alphaStart} {alphaEnd} {step}")])
+    tried = set(np.round(np.arange(alphaStart, alphaEnd + step/2, step), 4))
+    Instrumentation.count('requestedPoints', len(tried))
 
-    if os.path.exists('polar.dump'):
-        os.remove('polar.dump')
+    while polar is not None and step > alphaStep / 2:
+        step /= 2
+        index = polar._LDmaxIndex()
+        if index is None:
+            break
+        centres = [polar.alpha[index]] + ([polar.alpha[np.argmax(polar.CL)]] if refineStall else [])
+
+        angles = []
+        for centre in centres:
+            for alpha in (round(centre - step, 4), round(centre + step, 4)):
+                if alphaStart <= alpha <= alphaEnd and alpha not in tried:
+                    tried.add(alpha)
+                    angles.append(alpha)
+        if not angles:
+            continue
+
+        # The pass starts from the best converged angle, so that the new angles around it are
+        # warm-started from its boundary layers rather than solved cold (the repeat is dropped)
+        commands = [f"A {polar.alpha[index]}"] + [f"A {alpha}" for alpha in angles]
+        Instrumentation.count('requestedPoints', len(commands))
+        converged = len(polar)
+        polar = mergePolars([polar, runCommand("\n".join(commands))])
+        if len(polar) == converged:
+            break
 
     return polar
 
 
-def alphaRange(airfoil, Re, alphaStart, alphaEnd, alphaStep):
-    routine = f"""LOAD {airfoil}
-                OPER
-                Visc {Re}
-                PACC
-                polar.dat
-                polar.dump
-                ASEQ {alphaStart} {alphaEnd} {alphaStep}
-                """
-    return runXFOIL(routine)
+def scratchBase():
+    # RAM-backed location for temporary XFOIL files when the system has one
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
 
 
-def CLRange(airfoil, Re, CLStart, CLEnd, CLStep):
-    routine = f"""LOAD {airfoil}
-                OPER
-                Visc {Re}
-                PACC
-                polar.dat
-                polar.dump
-                CSEQ {CLStart} {CLEnd} {CLStep}
-                """
-    return runXFOIL(routine)
+processScratch = {}
 
+def scratchDir():
+    # Scratch directory of the current process under scratchBase(), removed at exit
+    pid = os.getpid()
+    if pid not in processScratch:
+        processScratch[pid] = tempfile.mkdtemp(prefix=f"xfoil{pid}_", dir=scratchBase())
+        atexit.register(shutil.rmtree, processScratch[pid], True)
+    return processScratch[pid]
 
-def singleCL(airfoil, Re, CL):
-    routine = f"""LOAD {airfoil}
-                OPER
-                Visc {Re}
-                PACC
-                polar.dat
-                polar.dump
-                CL {CL}
-                """
-    return runXFOIL(routine)
 
+def runXFOIL(routine, xfoilPath='./xfoil', workDir=None, polarFile='polar.dat', dumpFile='polar.dump'):
+    # routine   : XFOIL command stream
+    # workDir   : directory XFOIL runs in (None for the current directory)
+    # polarFile : polar save file named in the routine's PACC block
+    # dumpFile  : polar dump file named in the routine's PACC block
+    return runXFOILPolars(routine, [(polarFile, dumpFile)], xfoilPath, workDir)[0]
 
-def singleAlpha(airfoil, Re, alpha):
+
+def runXFOILPolars(routine, polarFiles, xfoilPath='./xfoil', workDir=None):
+    # As runXFOIL, for a routine with one PACC block per (polarFile, dumpFile) pair in polarFiles
+    # Returns one AirfoilPolar (None if XFOIL wrote no polar) per pair
+    if workDir is not None and os.path.dirname(xfoilPath):
+        xfoilPath = os.path.abspath(xfoilPath)
+    paths = [os.path.join(workDir or '', fileName) for pair in polarFiles for fileName in pair]
+
+    with Instrumentation.stage('spawn'):
+        process = subprocess.Popen(xfoilPath, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=workDir)
+    try:
+        with Instrumentation.stage('solve'):
+            stdout, stderr = process.communicate(routine, timeout=15)
+    except subprocess.TimeoutExpired:
+        # Kill and reap the hung XFOIL so it does not keep spinning on a core
+        Instrumentation.count('timeouts')
+        process.kill()
+        process.communicate()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    polars = []
+    for polarPath in paths[::2]:
+        if os.path.exists(polarPath):
+            with Instrumentation.stage('parse'):
+                polars.append(parsePolar(polarPath))
+        else:
+            print(f"Error running XFOIL: {stderr}")
+            Instrumentation.count('parseFailures')
+            polars.append(None)
+
+    with Instrumentation.stage('cleanup'):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    return polars
+
+
+def polarRoutine(airfoil, Re, command, polarFile='polar.dat', dumpFile='polar.dump', panels=None, maxIter=None):
+    # Routine that loads a foil, accumulates a viscous polar and runs a single OPER command
+    # panels  : panel nodes to repanel the foil with (PPAR N), None for XFOIL's default
+    # maxIter : viscous iteration limit per point (ITER), None for XFOIL's default
+    paneling = f"PPAR\nN {panels}\n\n\n" if panels else ""
+    iterLimit = f"ITER {maxIter}\n" if maxIter else ""
     routine = f"""LOAD {airfoil}
-                OPER
-                Visc {Re}
+                {paneling}OPER
+                {iterLimit}Visc {Re}
                 PACC
-                polar.dat
-                polar.dump
-                A {alpha}
+                {polarFile}
+                {dumpFile}
+                {command}
                 """
-    return runXFOIL(routine)
+    return routine
+
+
+def conditionsRoutine(airfoil, conditions, polarFiles, viscous=False, panels=None, maxIter=None):
+    # Routine that loads a foil once and accumulates one viscous polar per condition
+    # conditions : list of (Re, OPER command)
+    # polarFiles : (polarFile, dumpFile) per condition
+    # viscous    : viscous mode is already on (XFOIL's VISC toggles it), as in a reused session
+    # panels, maxIter : solver resolution, as for polarRoutine
+    lines = [f"LOAD {airfoil}"]
+    if panels:
+        lines += ["PPAR", f"N {panels}", "", ""]
+    lines.append("OPER")
+    if maxIter:
+        lines.append(f"ITER {maxIter}")
+    for i, ((Re, command), (polarFile, dumpFile)) in enumerate(zip(conditions, polarFiles)):
+        if i == 0 and not viscous:
+            lines.append(f"Visc {Re}")
+        else:
+            # New Reynolds number, boundary layers reinitialised rather than carried over
+            lines += [f"RE {Re}", "INIT"]
+        lines += ["PACC", polarFile, dumpFile, command, "PACC"]
+    return "\n".join(lines) + "\n"
+
+
+def sweepCommand(iterative, iterStart, iterEnd, iterStep):
+    # OPER command for an 'alpha' (ASEQ) or 'cl' (CSEQ) sweep
+    if iterative == 'alpha':
+        return f"ASEQ {iterStart} {iterEnd} {iterStep}"
+    if iterative == 'cl':
+        return f"CSEQ {iterStart} {iterEnd} {iterStep}"
+    raise ValueError(f"Unknown sweep '{iterative}' (expected 'alpha' or 'cl')")
+
+
+def conditionPolars(airfoil, conditions, workDir=None, prefix='polar'):
+    # Runs every (Re, OPER command) condition in one XFOIL process on one loaded geometry
+    # Returns one AirfoilPolar (or None) per condition
+    polarFiles = [(f"{prefix}_{i}.dat", f"{prefix}_{i}.dump") for i in range(len(conditions))]
+    routine = conditionsRoutine(airfoil, conditions, polarFiles)
+    return runXFOILPolars(routine, polarFiles, workDir=workDir)
+
+
+def alphaRange(airfoil, Re, alphaStart, alphaEnd, alphaStep, workDir=None, polarFile='polar.dat', dumpFile='polar.dump',
+               adaptive=False, refineStall=False, panels=None, maxIter=None):
+    # adaptive    : coarse pass plus refinement around L/D max (see adaptiveAlpha) instead of the full sweep
+    # refineStall : with adaptive, refine around CLmax as well
+    # panels, maxIter : solver resolution, as for polarRoutine
+    if adaptive:
+        # Every pass goes to one XFOIL process kept open for this run, rather than one process per pass
+        with XFOILSession(workDir=workDir or os.getcwd(), panels=panels, maxIter=maxIter) as session:
+            return session.alphaRange(airfoil, Re, alphaStart, alphaEnd, alphaStep, adaptive=True, refineStall=refineStall)
+
+    routine = polarRoutine(airfoil, Re, f"ASEQ {alphaStart} {alphaEnd} {alphaStep}", polarFile, dumpFile, panels, maxIter)
+    return runXFOIL(routine, workDir=workDir, polarFile=polarFile, dumpFile=dumpFile)
+
+
+def splitHalves(alphaStart, alphaEnd, alphaStep):
+    # (start, end, step) ASEQ sweeps running outward from the grid angle nearest zero:
+    # up to alphaEnd, and down to alphaStart (only the first when the range does not straddle zero)
+    zero = alphaStart + round(-alphaStart / alphaStep) * alphaStep
+    if not alphaStart < zero < alphaEnd:
+        return [(alphaStart, alphaEnd, alphaStep)]
+    return [(zero, alphaEnd, alphaStep), (zero - alphaStep, alphaStart, -alphaStep)]
+
+
+def splitAlphaRange(airfoil, Re, alphaStart, alphaEnd, alphaStep, workDir=None, polarFile='polar.dat', dumpFile='polar.dump',
+                    panels=None, maxIter=None):
+    # Runs the halves from splitHalves in two concurrent XFOIL processes and merges them. Each half
+    # warm-starts from near zero, so the hard negative angles no longer drag the positive ones down
+    halves = splitHalves(alphaStart, alphaEnd, alphaStep)
+    with ThreadPoolExecutor(len(halves)) as executor:
+        futures = [executor.submit(alphaRange, airfoil, Re, *half, workDir, f"{i}_{polarFile}", f"{i}_{dumpFile}",
+                                   panels=panels, maxIter=maxIter)
+                   for i, half in enumerate(halves)]
+        return mergePolars([future.result() for future in futures])
+
+
+def CLRange(airfoil, Re, CLStart, CLEnd, CLStep, workDir=None, polarFile='polar.dat', dumpFile='polar.dump',
+            panels=None, maxIter=None):
+    routine = polarRoutine(airfoil, Re, f"CSEQ {CLStart} {CLEnd} {CLStep}", polarFile, dumpFile, panels, maxIter)
+    return runXFOIL(routine, workDir=workDir, polarFile=polarFile, dumpFile=dumpFile)
+
+
+def singleCL(airfoil, Re, CL, workDir=None, polarFile='polar.dat', dumpFile='polar.dump'):
+    routine = polarRoutine(airfoil, Re, f"CL {CL}", polarFile, dumpFile)
+    return runXFOIL(routine, workDir=workDir, polarFile=polarFile, dumpFile=dumpFile)
+
+
+def singleAlpha(airfoil, Re, alpha, workDir=None, polarFile='polar.dat', dumpFile='polar.dump'):
+    routine = polarRoutine(airfoil, Re, f"A {alpha}", polarFile, dumpFile)
+    return runXFOIL(routine, workDir=workDir, polarFile=polarFile, dumpFile=dumpFile)
+
+
+class XFOILSession:
+    # Keeps one XFOIL process open and streams polar requests into its stdin.
+    # Each request ends by returning to the top-level menu and sending an unknown
+    # command (SENTINEL); XFOIL echoes it back, which marks the end of that polar.
+    #
+    # XFOIL keeps every accumulated polar in memory and only has room for a few (NPX); once
+    # they are full PACC stops asking for file names, which would then be read as commands.
+    # Each request therefore deletes its polars (PDEL 0) before the sentinel, and a request
+    # with more conditions than maxPolars is sent as several.
+    #
+    # xfoilPath   : XFOIL executable
+    # workDir     : directory XFOIL runs in (None for the process scratchDir())
+    # timeout     : seconds allowed per request before the process is killed
+    # maxRequests : requests served before the process is recycled
+    # maxPolars   : polars accumulated per request at most (below XFOIL's NPX of 12)
+    # panels, maxIter : solver resolution for every request, as for polarRoutine
+
+    SENTINEL = 'XFSN'
+
+    def __init__(self, xfoilPath='./xfoil', workDir=None, timeout=15, maxRequests=10, maxPolars=8, panels=None, maxIter=None):
+        self.xfoilPath = os.path.abspath(xfoilPath) if os.path.dirname(xfoilPath) else xfoilPath
+        self.workDir = workDir or scratchDir()
+        self.timeout = timeout
+        self.maxRequests = maxRequests
+        self.maxPolars = maxPolars
+        self.panels = panels
+        self.maxIter = maxIter
+        self.process = None
+        self.output = None
+        self.requests = 0
+        self.viscous = False
+
+    def start(self):
+        env = dict(os.environ, GFORTRAN_UNBUFFERED_PRECONNECTED='y')
+        with Instrumentation.stage('spawn'):
+            self.process = subprocess.Popen(self.xfoilPath, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            text=True, bufsize=1, cwd=self.workDir, env=env)
+        self.output = queue.Queue()
+        threading.Thread(target=self._readOutput, args=(self.process.stdout, self.output), daemon=True).start()
+        self.requests = 0
+        self.viscous = False
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write("\nQUIT\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    @staticmethod
+    def _readOutput(stdout, output):
+        for line in stdout:
+            output.put(line)
+        output.put(None)
+
+    def runPolar(self, airfoil, Re, command):
+        # Returns the AirfoilPolar for a single OPER command, or None on failure
+        return self.runConditions(airfoil, [(Re, command)])[0]
+
+    def runConditions(self, airfoil, conditions):
+        # conditions : list of (Re, OPER command), all run on one LOAD of the foil
+        # Returns one AirfoilPolar (None on failure) per condition
+        if len(conditions) > self.maxPolars:
+            return [polar for start in range(0, len(conditions), self.maxPolars)
+                    for polar in self.runConditions(airfoil, conditions[start:start + self.maxPolars])]
+
+        if self.process is None or self.process.poll() is not None or self.requests >= self.maxRequests:
+            self.close()
+            self.start()
+
+        self.requests += 1
+        polarFiles = [(f"session{self.process.pid}_{self.requests}_{i}.pol", f"session{self.process.pid}_{self.requests}_{i}.dump")
+                      for i in range(len(conditions))]
+        paths = [os.path.join(self.workDir, fileName) for pair in polarFiles for fileName in pair]
+
+        routine = conditionsRoutine(airfoil, conditions, polarFiles, self.viscous, self.panels, self.maxIter) + \
+                  f"PDEL 0\n\n{self.SENTINEL}\n"
+        self.viscous = True
+
+        try:
+            with Instrumentation.stage('solve'):
+                self.process.stdin.write(routine)
+                self.process.stdin.flush()
+                finished = self._waitForSentinel()
+        except OSError:
+            finished = False
+
+        if not finished:
+            print(f"Error running XFOIL session: no response to {[command for Re, command in conditions]}")
+            Instrumentation.count('timeouts')
+            self.kill()
+
+        polars = []
+        for polarPath in paths[::2]:
+            if finished and os.path.exists(polarPath):
+                with Instrumentation.stage('parse'):
+                    polars.append(parsePolar(polarPath))
+            else:
+                if finished:
+                    Instrumentation.count('parseFailures')
+                polars.append(None)
+
+        with Instrumentation.stage('cleanup'):
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        return polars
+
+    def _waitForSentinel(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                line = self.output.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return False
+            if line is None:
+                return False
+            if self.SENTINEL in line:
+                return True
+
+    def alphaRange(self, airfoil, Re, alphaStart, alphaEnd, alphaStep, adaptive=False, refineStall=False, split=False):
+        if adaptive:
+            return adaptiveAlpha(lambda command: self.runPolar(airfoil, Re, command), alphaStart, alphaEnd, alphaStep,
+                                 refineStall=refineStall)
+        if split:
+            # One process here, so the halves run one after the other (each from reinitialised boundary layers)
+            halves = splitHalves(alphaStart, alphaEnd, alphaStep)
+            return mergePolars(self.runConditions(airfoil, [(Re, f"ASEQ {start} {end} {step}") for start, end, step in halves]))
+        return self.runPolar(airfoil, Re, f"ASEQ {alphaStart} {alphaEnd} {alphaStep}")
+
+    def CLRange(self, airfoil, Re, CLStart, CLEnd, CLStep):
+        return self.runPolar(airfoil, Re, f"CSEQ {CLStart} {CLEnd} {CLStep}")
+
+    def singleCL(self, airfoil, Re, CL):
+        return self.runPolar(airfoil, Re, f"CL {CL}")
+
+    def singleAlpha(self, airfoil, Re, alpha):
+        return self.runPolar(airfoil, Re, f"A {alpha}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
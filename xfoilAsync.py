@@ -0,0 +1,122 @@
+"""
+Asyncio tools for running XFOIL
+
+Runs many XFOIL calls concurrently, bounded by a semaphore. Every call runs in its own
+scratch directory under a per-call timeout and an optional global deadline. A hung XFOIL
+is killed and reaped, and a failed call returns an XFOILFailure instead of raising.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from xfoil import parsePolar, polarRoutine, scratchBase
+
+
+class XFOILFailure:
+    # reason : 'timeout' (per-call limit), 'deadline' (global deadline), 'no polar' (XFOIL
+    #          exited without writing a polar) or 'error' (XFOIL could not be started)
+    # detail : stderr or exception text
+
+    __slots__ = ('reason', 'detail')
+
+    def __init__(self, reason, detail=''):
+        self.reason = reason
+        self.detail = detail
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"XFOILFailure({self.reason!r})"
+
+
+class AsyncXFOILRunner:
+    # xfoilPath     : XFOIL executable
+    # maxConcurrent : XFOIL processes allowed at once (None for one per core)
+    # timeout       : seconds allowed per call
+    # scratchRoot   : parent directory for the per-call scratch directories (None for xfoil.scratchBase(), in RAM where available)
+
+    def __init__(self, xfoilPath='./xfoil', maxConcurrent=None, timeout=15, scratchRoot=None):
+        self.xfoilPath = os.path.abspath(xfoilPath) if os.path.dirname(xfoilPath) else xfoilPath
+        self.maxConcurrent = maxConcurrent or os.cpu_count()
+        self.timeout = timeout
+        self.scratchRoot = scratchRoot
+        self.deadline = None
+        self.semaphore = None
+        self.semaphoreLoop = None
+
+    def setDeadline(self, seconds):
+        # Global deadline for every call from now on (None to clear)
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def _limit(self):
+        loop = asyncio.get_running_loop()
+        if self.semaphoreLoop is not loop:
+            self.semaphore = asyncio.Semaphore(self.maxConcurrent)
+            self.semaphoreLoop = loop
+        return self.semaphore
+
+    async def runXFOIL(self, airfoil, Re, command):
+        # Returns an AirfoilPolar, or an XFOILFailure
+        async with self._limit():
+            timeout, reason = self.timeout, 'timeout'
+            if self.deadline is not None:
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    return XFOILFailure('deadline')
+                if remaining < timeout:
+                    timeout, reason = remaining, 'deadline'
+
+            with tempfile.TemporaryDirectory(prefix="xfoilasync_", dir=self.scratchRoot or scratchBase()) as workDir:
+                # Spawn errors are returned too: a raising call would abort every sibling in runAll
+                try:
+                    shutil.copy(airfoil, workDir)
+                    process = await asyncio.create_subprocess_exec(self.xfoilPath, stdin=asyncio.subprocess.PIPE,
+                                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                                   stderr=asyncio.subprocess.PIPE, cwd=workDir)
+                except OSError as ex:
+                    return XFOILFailure('error', str(ex))
+
+                routine = polarRoutine(os.path.basename(airfoil), Re, command)
+
+                try:
+                    _, stderr = await asyncio.wait_for(process.communicate(routine.encode()), timeout)
+                except asyncio.TimeoutError:
+                    return XFOILFailure(reason, f"no result after {timeout:.1f} s")
+                finally:
+                    if process.returncode is None:
+                        process.kill()
+                        await process.wait()
+
+                polarPath = os.path.join(workDir, 'polar.dat')
+                if not os.path.exists(polarPath):
+                    return XFOILFailure('no polar', stderr.decode(errors='replace'))
+                return parsePolar(polarPath)
+
+    async def alphaRange(self, airfoil, Re, alphaStart, alphaEnd, alphaStep):
+        return await self.runXFOIL(airfoil, Re, f"ASEQ {alphaStart} {alphaEnd} {alphaStep}")
+
+    async def CLRange(self, airfoil, Re, CLStart, CLEnd, CLStep):
+        return await self.runXFOIL(airfoil, Re, f"CSEQ {CLStart} {CLEnd} {CLStep}")
+
+    async def singleCL(self, airfoil, Re, CL):
+        return await self.runXFOIL(airfoil, Re, f"CL {CL}")
+
+    async def singleAlpha(self, airfoil, Re, alpha):
+        return await self.runXFOIL(airfoil, Re, f"A {alpha}")
+
+    def runAll(self, calls, deadline=None):
+        # calls    : list of (method name, args), e.g. [('alphaRange', ('foil.dat', 1e6, -5, 15, 1)), ...]
+        # deadline : seconds allowed for the whole batch
+        # Returns the results in call order
+        async def gatherCalls():
+            self.setDeadline(deadline)
+            try:
+                return await asyncio.gather(*(getattr(self, method)(*args) for method, args in calls))
+            finally:
+                self.setDeadline(None)
+
+        return asyncio.run(gatherCalls())